@@ -0,0 +1,129 @@
+"""
+Render time and bytes on the wire for the order and menu list endpoints.
+
+    python benchmarks/api_payloads.py --orders 1000 --db /tmp/chefchain-payloads.sqlite3
+
+Seeds one customer with ``--orders`` orders (1-4 lines each) and a menu
+of ``--menu-items`` dishes, then for ``/api/orders/?page_size=N`` and
+``/api/categories/``:
+
+* times rendering the response data with DRF's ``JSONRenderer`` and with
+  ``ORJSONRenderer``;
+* reports the body size uncompressed, gzipped and (with brotli installed)
+  brotli-compressed, as ``CompressionMiddleware`` would send it;
+* times the whole request with and without ``Accept-Encoding: gzip``.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chefchainProject.settings")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--orders", type=int, default=1000)
+parser.add_argument("--menu-items", type=int, default=200)
+parser.add_argument("--runs", type=int, default=30, help="timed renders/requests per case")
+parser.add_argument("--db", default="/tmp/chefchain-payloads.sqlite3")
+parser.add_argument("--reseed", action="store_true")
+args = parser.parse_args()
+
+import django
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = args.db
+settings.ALLOWED_HOSTS = ["testserver"]
+settings.DEBUG = False
+settings.THROTTLING = {"RATES": {}}
+django.setup()
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from chefchainapp import compression, menu_cache
+from chefchainapp.models import Category, MenuItem, Order, OrderItem, User
+from chefchainapp.renderers import ORJSONRenderer, orjson
+
+
+def seed():
+    print(f"Seeding {args.orders:,} orders into {args.db} ...")
+    customer = User.objects.create_user(username="payloads", password="payloads")
+    categories = Category.objects.bulk_create(
+        [Category(name=f"Category {n}", description=f"Dishes of kind {n}") for n in range(10)]
+    )
+    MenuItem.objects.bulk_create([
+        MenuItem(category=categories[n % 10], name=f"Dish {n}", description="Slow cooked, served with rice",
+                 price=f"{5 + n % 40}.50")
+        for n in range(args.menu_items)
+    ])
+    items = list(MenuItem.objects.values_list("id", "price"))
+    rng = random.Random(42)
+    orders = Order.objects.bulk_create(
+        [Order(customer=customer, status="delivered", order_type="dine_in") for _ in range(args.orders)]
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order_id=order.pk, item_id=item_id, quantity=rng.randint(1, 3), unit_price=price)
+        for order in orders
+        for item_id, price in rng.sample(items, rng.randint(1, 4))
+    ])
+    Order.objects.all().refresh_totals()
+
+
+def median_ms(func):
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    call_command("migrate", verbosity=0)
+    if not Order.objects.exists():
+        seed()
+
+    client = APIClient()
+    client.force_authenticate(User.objects.get(username="payloads"))
+    cases = [
+        (f"/api/orders/?page_size={args.orders}", reverse("order-list"), {"page_size": args.orders}),
+        ("/api/categories/", reverse("category-list"), None),
+    ]
+    options = {**compression.get_options(), "GZIP_MAX_RANDOM_BYTES": 0}
+    print(f"orjson {'installed' if orjson else 'not installed'}, "
+          f"brotli {'installed' if compression.brotli else 'not installed'}, median of {args.runs} runs")
+
+    for name, url, params in cases:
+        data = client.get(url, params).data
+        body = JSONRenderer().render(data)
+        default_ms = median_ms(lambda: JSONRenderer().render(data))
+        fast_ms = median_ms(lambda: ORJSONRenderer().render(data))
+        print(f"\n{name}")
+        print(f"  render  JSONRenderer {default_ms:8.2f} ms   ORJSONRenderer {fast_ms:8.2f} ms "
+              f"({default_ms / fast_ms:.1f}x)")
+
+        sizes = {"identity": len(body), "gzip": len(compression.compress(body, "gzip", options))}
+        if compression.brotli is not None:
+            sizes["br"] = len(compression.compress(body, "br", options))
+        print("  bytes   " + "   ".join(f"{encoding} {size:,}" for encoding, size in sizes.items()))
+
+        def request(**headers):
+            menu_cache.clear_menu_cache()
+            return client.get(url, params, **headers)
+
+        plain_ms = median_ms(request)
+        gzip_ms = median_ms(lambda: request(HTTP_ACCEPT_ENCODING="gzip"))
+        print(f"  request identity {plain_ms:8.2f} ms   gzip {gzip_ms:8.2f} ms "
+              f"({request(HTTP_ACCEPT_ENCODING='gzip')['Content-Length']} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Checkout throughput against a simulated Paystack gateway.
+
+    python benchmarks/checkout_throughput.py --workers 16 --checkouts 160 --latency 2
+
+Starts the fake Paystack server (chefchainapp/fake_paystack.py) and runs
+``--checkouts`` checkouts (initialize + verify) on a pool of ``--workers``
+threads, standing in for WSGI worker threads. Compares the old per-call
+``requests.get/post`` code with the pooled client, first with a healthy
+gateway answering after ``--latency`` seconds, then with a gateway that
+hangs for ``--hang`` seconds, where the old code has no timeout and the
+pooled client times out and opens its circuit breaker.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chefchainProject.settings")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--workers", type=int, default=16)
+parser.add_argument("--checkouts", type=int, default=160)
+parser.add_argument("--latency", type=float, default=2.0, help="gateway latency per call (seconds)")
+parser.add_argument("--hang", type=float, default=20.0, help="gateway latency during the outage runs")
+args = parser.parse_args()
+
+import django
+
+django.setup()
+
+import requests
+
+from chefchainapp.fake_paystack import FakePaystackServer
+from chefchainapp.paystack import Paystack, PaystackUnavailable
+
+SECRET_KEY = "sk_test_benchmark"
+references = count()
+
+
+class PerCallClient:
+    """The previous client: a new connection per call and no timeout."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.headers = {"Authorization": f"Bearer {SECRET_KEY}", "Content-Type": "application/json"}
+
+    def initialize_payment(self, email, amount, reference):
+        payload = {"email": email, "amount": int(amount * 100), "reference": reference}
+        response = requests.post(self.base_url + "/transaction/initialize", headers=self.headers, json=payload)
+        return response.status_code == 200, response.json()
+
+    def verify_payment(self, reference):
+        response = requests.get(f"{self.base_url}/transaction/verify/{reference}", headers=self.headers)
+        return response.status_code == 200, response.json()
+
+
+def checkout(client):
+    reference = f"bench-{next(references)}"
+    started = time.perf_counter()
+    try:
+        ok, _ = client.initialize_payment("ama@example.com", 25, reference)
+        if ok:
+            ok, _ = client.verify_payment(reference)
+    except PaystackUnavailable:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def run(label, gateway, client, checkouts):
+    gateway.connections = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        results = list(pool.map(lambda _: checkout(client), range(checkouts)))
+    elapsed = time.perf_counter() - started
+    latencies = [seconds for _, seconds in results]
+    succeeded = sum(ok for ok, _ in results)
+    print(
+        f"{label:44} {succeeded:>4}/{checkouts:<4} {elapsed:8.1f}s {checkouts / elapsed:9.2f}/s "
+        f"{statistics.median(latencies):8.2f}s {statistics.quantiles(latencies, n=100)[98]:8.2f}s "
+        f"{gateway.connections:>6}"
+    )
+
+
+def main():
+    print(f"{args.workers} workers, gateway latency {args.latency}s, outage hang {args.hang}s\n")
+    print(f"{'scenario':44} {'ok':>9} {'wall':>9} {'throughput':>11} {'p50':>9} {'p99':>9} {'conns':>6}")
+    with FakePaystackServer(latency=args.latency, secret_key=SECRET_KEY) as gateway:
+        run("healthy gateway, per-call connections", gateway, PerCallClient(gateway.url), args.checkouts)
+        pooled = Paystack(SECRET_KEY, BASE_URL=gateway.url, POOL_SIZE=args.workers)
+        run("healthy gateway, pooled client", gateway, pooled, args.checkouts)
+
+        # Outage: enough checkouts to keep every worker busy twice over.
+        gateway.latency = args.hang
+        outage = args.workers * 2
+        run("hanging gateway, per-call (no timeout)", gateway, PerCallClient(gateway.url), outage)
+        pooled = Paystack(SECRET_KEY, BASE_URL=gateway.url, POOL_SIZE=args.workers, TIMEOUT=(3.05, 3))
+        run("hanging gateway, pooled (3s timeout, breaker)", gateway, pooled, outage)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+CPU cost of serializing list pages: the ``FastListSerializer`` path against
+DRF's generic ``ListSerializer``.
+
+    python benchmarks/list_serializers.py --orders 1000 --db /tmp/chefchain-serializers.sqlite3
+
+Rows are loaded once (orders with their lines and menu items, the menu
+with categories), so only serialization is timed, not the queries. The
+outputs are checked to be identical before timing.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chefchainProject.settings")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--orders", type=int, default=1000)
+parser.add_argument("--menu-items", type=int, default=200)
+parser.add_argument("--runs", type=int, default=20)
+parser.add_argument("--db", default="/tmp/chefchain-serializers.sqlite3")
+parser.add_argument("--reseed", action="store_true")
+args = parser.parse_args()
+
+import django
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = args.db
+settings.ALLOWED_HOSTS = ["testserver"]
+settings.DEBUG = False
+django.setup()
+
+from django.core.management import call_command
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.test import APIRequestFactory
+
+from chefchainapp.models import Category, MenuItem, Order, OrderItem, User
+from chefchainapp.serializers import CategorySerializer, FastListSerializer, MenuItemSerializer, OrderSerializer
+
+
+def seed():
+    print(f"Seeding {args.orders:,} orders into {args.db} ...")
+    customer = User.objects.create_user(username="serializers", password="serializers")
+    categories = Category.objects.bulk_create([Category(name=f"Category {n}") for n in range(10)])
+    MenuItem.objects.bulk_create([
+        MenuItem(category=categories[n % 10], name=f"Dish {n}", price=f"{5 + n % 40}.50")
+        for n in range(args.menu_items)
+    ])
+    items = list(MenuItem.objects.values_list("id", "price"))
+    rng = random.Random(42)
+    orders = Order.objects.bulk_create(
+        [Order(customer=customer, status="delivered") for _ in range(args.orders)]
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order_id=order.pk, item_id=item_id, quantity=rng.randint(1, 3), unit_price=price)
+        for order in orders
+        for item_id, price in rng.sample(items, rng.randint(1, 4))
+    ])
+    Order.objects.all().refresh_totals()
+
+
+def timed(serializer_class, rows, context):
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        serializer_class(rows, many=True, context=context).data
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def generic_path():
+    return mock.patch.object(FastListSerializer, "to_representation", serializers.ListSerializer.to_representation)
+
+
+def main():
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    call_command("migrate", verbosity=0)
+    if not Order.objects.exists():
+        seed()
+
+    context = {"request": APIRequestFactory().get("/api/")}
+    cases = [
+        ("orders", OrderSerializer, list(Order.objects.with_items().order_by("-created_at")[:args.orders])),
+        ("menu items", MenuItemSerializer, list(MenuItem.objects.select_related("category").order_by("id"))),
+        ("categories", CategorySerializer, list(Category.objects.prefetch_related(
+            Prefetch("menu_items", queryset=MenuItem.objects.order_by("id"))
+        ))),
+    ]
+    print(f"median of {args.runs} runs")
+    print(f"{'list':12} {'rows':>6} {'generic ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for name, serializer_class, rows in cases:
+        fast_data = serializer_class(rows, many=True, context=context).data
+        with generic_path():
+            assert serializer_class(rows, many=True, context=context).data == fast_data, f"{name} differ"
+            generic = timed(serializer_class, rows, context)
+        fast = timed(serializer_class, rows, context)
+        print(f"{name:12} {len(rows):6} {generic:11.2f} {fast:9.2f} {generic / fast:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
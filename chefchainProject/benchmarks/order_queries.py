@@ -0,0 +1,198 @@
+"""
+Query plans and latencies of the order/menu API endpoints on a large
+order history, with and without the hot-path indexes (migration 0011).
+
+    python benchmarks/order_queries.py --orders 1000000 --db /tmp/chefchain-bench.sqlite3
+
+The database file is seeded once and reused on later runs (pass --reseed
+to start over). Each endpoint is timed with the 0011 indexes dropped (the
+rest of the schema stays as it is) and again with them in place, and the
+SQLite query plan of every statement it runs is printed, so you can check
+that no hot query falls back to a full table scan.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chefchainProject.settings")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--orders", type=int, default=1_000_000)
+parser.add_argument("--customers", type=int, default=5_000)
+parser.add_argument("--menu-items", type=int, default=200)
+parser.add_argument("--runs", type=int, default=20, help="timed requests per endpoint")
+parser.add_argument("--db", default="/tmp/chefchain-bench.sqlite3")
+parser.add_argument("--reseed", action="store_true")
+args = parser.parse_args()
+
+import django
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = args.db
+settings.ALLOWED_HOSTS = ["testserver"]
+settings.DEBUG = False
+django.setup()
+
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, migrations
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chefchainapp import menu_cache
+from chefchainapp.models import Category, MenuItem, Order, OrderItem, User
+
+BATCH = 20_000
+# (model, index) added by migration 0011
+HOT_PATH_INDEXES = [
+    (apps.get_model("chefchainapp", operation.model_name), operation.index)
+    for operation in import_module("chefchainapp.migrations.0011_hot_path_indexes").Migration.operations
+    if isinstance(operation, migrations.AddIndex)
+]
+
+# Keep one connection across test-client requests.
+request_started.disconnect(close_old_connections)
+request_finished.disconnect(close_old_connections)
+
+
+def seed():
+    print(f"Seeding {args.orders:,} orders into {args.db} ...")
+    started = time.perf_counter()
+    # Keep the spread-out timestamps we assign instead of "now".
+    Order._meta.get_field("created_at").auto_now_add = False
+    Order._meta.get_field("updated_at").auto_now = False
+    User.objects.bulk_create(
+        [User(username=f"customer{n}", role="customer") for n in range(args.customers)],
+        batch_size=BATCH,
+    )
+    customer_ids = list(User.objects.values_list("id", flat=True))
+    categories = Category.objects.bulk_create([Category(name=f"Category {n}") for n in range(10)])
+    MenuItem.objects.bulk_create([
+        MenuItem(category=categories[n % 10], name=f"Dish {n}", price=5 + n % 40, available=n % 7 != 0)
+        for n in range(args.menu_items)
+    ])
+    items = list(MenuItem.objects.values_list("id", "price"))
+
+    rng = random.Random(42)
+    start = timezone.now() - timedelta(days=365)
+    step = timedelta(days=365) / args.orders
+    statuses = ["delivered"] * 90 + ["confirmed", "preparing", "ready"] * 3 + ["pending"]
+    pending = set()
+    created = 0
+    while created < args.orders:
+        orders = []
+        for n in range(created, min(created + BATCH, args.orders)):
+            customer = rng.choice(customer_ids)
+            status = rng.choice(statuses)
+            if status == "pending":
+                if customer in pending:
+                    status = "delivered"
+                pending.add(customer)
+            at = start + step * n
+            orders.append(Order(customer_id=customer, status=status, order_type="dine_in",
+                                created_at=at, updated_at=at))
+        orders = Order.objects.bulk_create(orders)
+        lines = []
+        for order in orders:
+            for item_id, price in rng.sample(items, rng.randint(1, 3)):
+                lines.append(OrderItem(order_id=order.pk, item_id=item_id,
+                                       quantity=rng.randint(1, 3), unit_price=price))
+        OrderItem.objects.bulk_create(lines, batch_size=BATCH)
+        created += len(orders)
+        print(f"  {created:,} orders", end="\r", flush=True)
+    Order.objects.all().refresh_totals()
+    Order._meta.get_field("created_at").auto_now_add = True
+    Order._meta.get_field("updated_at").auto_now = True
+    print(f"\nSeeded in {time.perf_counter() - started:.1f}s")
+
+
+def endpoints():
+    customer = User.objects.filter(order__status="pending").first()
+    order = Order.objects.filter(customer=customer).exclude(status="pending").order_by("-created_at").first()
+    category = Category.objects.order_by("id").first()
+    return customer, [
+        ("GET /orders/", "get", reverse("order-list"), None),
+        ("GET /orders/?page_size=50", "get", reverse("order-list"), {"page_size": 50}),
+        ("GET /orders/history/", "get", reverse("order-history"), None),
+        ("GET /orders/history/<id>/", "get", reverse("order-detail", args=[order.pk]), None),
+        ("GET /cart/", "get", reverse("cart-detail"), None),
+        ("POST /cart/add/", "post", reverse("cart-add"), {"item": MenuItem.objects.filter(available=True).first().pk}),
+        ("GET /menu/?category=", "get", reverse("menu-list"), {"category": category.pk}),
+    ]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def measure(label):
+    print(f"\n=== {label} ===")
+    customer, cases = endpoints()
+    client = APIClient()
+    client.force_authenticate(customer)
+    results = {}
+    for name, method, url, data in cases:
+        call = getattr(client, method)
+        menu_cache.clear_menu_cache()
+        with CaptureQueriesContext(connection) as context:
+            call(url, data)
+        queries = context.captured_queries
+        timings = []
+        for _ in range(args.runs):
+            menu_cache.clear_menu_cache()
+            started = time.perf_counter()
+            call(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+        print(f"\n{name}: median {results[name]:.2f} ms, p90 {statistics.quantiles(timings, n=10)[-1]:.2f} ms, "
+              f"{len(queries)} queries")
+        for query in queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE")):
+                continue
+            print(f"  {sql[:110]}{'...' if len(sql) > 110 else ''}")
+            for step in explain(sql):
+                print(f"    -> {step}")
+    return results
+
+
+def main():
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    call_command("migrate", verbosity=0)
+    if not Order.objects.exists():
+        seed()
+
+    # Only the 0011 indexes: migrating back would also undo every later column
+    with connection.schema_editor() as editor:
+        for model, index in HOT_PATH_INDEXES:
+            editor.remove_index(model, index)
+    try:
+        before = measure("without hot-path indexes (0011)")
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in HOT_PATH_INDEXES:
+                editor.add_index(model, index)
+    after = measure("with hot-path indexes (0011)")
+
+    print("\n=== summary (median ms) ===")
+    print(f"{'endpoint':34} {'before':>10} {'after':>10} {'speedup':>8}")
+    for name in before:
+        print(f"{name:34} {before[name]:10.2f} {after[name]:10.2f} {before[name] / after[name]:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Time the prep-time analytics report (chefchainapp/analytics.py) over a
+year of orders.
+
+    python benchmarks/prep_time_report.py --orders 300000 --db /tmp/chefchain-analytics.sqlite3
+
+Seeds ``--orders`` delivered orders spread over the last 365 days, each
+with its confirmed/preparing/ready/delivered events, once (pass --reseed
+to start over), then times ``prep_time_report`` over the whole year and
+over the last 30 days.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chefchainProject.settings")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--orders", type=int, default=300_000)
+parser.add_argument("--menu-items", type=int, default=200)
+parser.add_argument("--runs", type=int, default=3)
+parser.add_argument("--db", default="/tmp/chefchain-analytics.sqlite3")
+parser.add_argument("--reseed", action="store_true")
+args = parser.parse_args()
+
+import django
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = args.db
+django.setup()
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from chefchainapp import analytics
+from chefchainapp.models import Category, MenuItem, Order, OrderEvent, OrderItem, User
+
+BATCH = 20_000
+
+
+def seed():
+    print(f"Seeding {args.orders:,} orders into {args.db} ...")
+    started = time.perf_counter()
+    Order._meta.get_field("created_at").auto_now_add = False
+    Order._meta.get_field("updated_at").auto_now = False
+    customer = User.objects.create(username="customer", role="customer")
+    category = Category.objects.create(name="Mains")
+    MenuItem.objects.bulk_create([
+        MenuItem(category=category, name=f"Dish {n}", price=5 + n % 40) for n in range(args.menu_items)
+    ])
+    items = list(MenuItem.objects.values_list("id", "price"))
+    # Some dishes take longer: each adds its own minutes to an order's prep time.
+    extra = {item_id: random.Random(item_id).uniform(0, 10) for item_id, _ in items}
+
+    rng = random.Random(42)
+    start = timezone.now() - timedelta(days=365)
+    step = timedelta(days=365) / args.orders
+    created = 0
+    while created < args.orders:
+        orders = []
+        for n in range(created, min(created + BATCH, args.orders)):
+            at = start + step * n
+            orders.append(Order(customer=customer, status="delivered", created_at=at, updated_at=at))
+        orders = Order.objects.bulk_create(orders)
+        lines, events = [], []
+        for order in orders:
+            chosen = rng.sample(items, rng.randint(1, 3))
+            for item_id, price in chosen:
+                lines.append(OrderItem(order_id=order.pk, item_id=item_id, quantity=rng.randint(1, 3), unit_price=price))
+            prep = rng.uniform(5, 20) + sum(extra[item_id] for item_id, _ in chosen)
+            at = order.created_at
+            for status, minutes in (("confirmed", 0), ("preparing", 2), ("ready", prep), ("delivered", prep + rng.uniform(3, 30))):
+                events.append(OrderEvent(order_id=order.pk, to_status=status, created_at=at + timedelta(minutes=minutes)))
+        OrderItem.objects.bulk_create(lines, batch_size=BATCH)
+        OrderEvent.objects.bulk_create(events, batch_size=BATCH)
+        created += len(orders)
+        print(f"  {created:,} orders", end="\r", flush=True)
+    Order._meta.get_field("created_at").auto_now_add = True
+    Order._meta.get_field("updated_at").auto_now = True
+    print(f"\nSeeded in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    if args.reseed and os.path.exists(args.db):
+        os.remove(args.db)
+    call_command("migrate", verbosity=0)
+    if not Order.objects.exists():
+        seed()
+
+    print(f"NumPy: {'yes' if analytics.np is not None else 'no (pure-Python percentiles)'}\n")
+    for label, days in (("last 365 days", 366), ("last 30 days", 30)):
+        start, end = analytics.date_range(days=days)
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            report = analytics.prep_time_report(start, end)
+            timings.append(time.perf_counter() - started)
+        prep = report["stages"]["confirm_to_ready"]
+        print(
+            f"{label:14} {report['orders']:>9,} orders  best {min(timings):6.2f}s  "
+            f"prep p50/p90/p99 {prep['p50'] / 60:.1f}/{prep['p90'] / 60:.1f}/{prep['p99'] / 60:.1f} min"
+        )
+
+
+if __name__ == "__main__":
+    main()
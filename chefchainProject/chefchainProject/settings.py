@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config
 from datetime import timedelta
 
@@ -20,6 +21,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 PAYSTACK_SECRET_KEY = "sk_test_2ba1f4a1975ae43085307d4f7441a10440e8ec63"
 PAYSTACK_PUBLIC_KEY = "pk_test_52c55ad47c788f26e3b859362da880a39ca0ca93"
+# Paystack client (see chefchainapp/paystack.py). For local load runs, start
+# `manage.py fake_paystack` and set PAYSTACK_BASE_URL=http://127.0.0.1:8010
+PAYSTACK = {
+    'BASE_URL': config('PAYSTACK_BASE_URL', default='https://api.paystack.co'),
+    'TIMEOUT': (3.05, 10),  # connect, read (seconds)
+    'RETRIES': 2,           # extra attempts on 5xx / network errors
+    'BACKOFF': 0.3,
+    'POOL_SIZE': 20,        # keep-alive connections per process
+    'CIRCUIT_BREAKER': {'FAILURES': 5, 'RESET_TIMEOUT': 30},
+}
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -51,6 +62,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # gzip/brotli for API responses (see chefchainapp/compression.py)
+    'chefchainapp.compression.CompressionMiddleware',
+    # Static and media files, before sessions/auth do any work (see
+    # chefchainapp/static_files.py)
+    'chefchainapp.static_files.FileServingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +105,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # cart updates queue up instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # A file (not in-memory) test database, so the live-server
+            # concurrency tests get one connection per request thread.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -128,7 +155,7 @@ USE_TZ = True
 # REST Framework configuration with JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'chefchainapp.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         
     ],
@@ -136,11 +163,81 @@ REST_FRAMEWORK = {
         # 'rest_framework.permissions.IsAuthenticated',
         "rest_framework.permissions.AllowAny",  # public unless overridden
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        # orjson-backed with FAST_JSON=True (see chefchainapp/renderers.py)
+        'chefchainapp.renderers.ORJSONRenderer' if config('FAST_JSON', default=False, cast=bool)
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 1000
+    'PAGE_SIZE': 1000,
+    # Reverse proxies in front of the app. Throttles key clients by IP, taken
+    # from X-Forwarded-For only this many hops deep; with 0 it's REMOTE_ADDR
+    # and a client can't pick a fresh IP per request by sending the header.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 AUTH_USER_MODEL = 'chefchainapp.User'
 
+# Caches. The public menu is cached under its own alias (see
+# chefchainapp/menu_cache.py). It must be shared by every worker process,
+# since its version key is what invalidates the menu after an edit; the
+# default is a directory on local disk, which covers the workers of one
+# host. Across hosts use Redis, say:
+#   MENU_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   MENU_CACHE_LOCATION=redis://127.0.0.1:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'menu': {
+        'BACKEND': config('MENU_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('MENU_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'chefchain_menu_cache')),
+    },
+    # When users last changed, so every worker rejects stale tokens; shared
+    # like the menu cache
+    'auth': {
+        'BACKEND': config('AUTH_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('AUTH_CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'chefchain_auth_cache')),
+    },
+}
+MENU_CACHE_ALIAS = 'menu'
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+# Each process also keeps the menu in memory, re-reading the shared version
+# at most this often (seconds); edits show up on other workers within it
+MENU_CACHE_REVALIDATE = 2
+# With a per-process (locmem) menu cache, versions and responses only live
+# this long, so other workers pick up edits within it
+MENU_CACHE_LOCAL_TIMEOUT = 30
+
+# Live order feed pushed to kitchen/rider screens (see chefchainapp/feed.py).
+# The in-memory layer serves a single process; swap BACKEND to share it.
+ORDER_FEED = {
+    'BACKEND': 'chefchainapp.feed.InMemoryChannelLayer',
+    'OPTIONS': {'buffer_size': 500},
+}
+
+# Users are cached per process after authenticating (see
+# chefchainapp/authentication.py); saving a user invalidates them.
+AUTH_USER_CACHE = {
+    'SIZE': 1024,  # users kept per process
+    'TTL': 60,  # seconds before a cached user is looked up again
+    'CACHE': 'auth',  # records user changes for every process
+}
+
+# Rate limits and load shedding for public and auth endpoints (see
+# chefchainapp/throttling.py). Buckets live in process memory unless
+# THROTTLE_STORE=database, which shares them between processes.
+THROTTLING = {
+    'STORE': config('THROTTLE_STORE', default='local'),
+    'RATES': {
+        'login': '10/min',  # per IP
+        'register': '20/hour',  # per IP
+        'menu': '120/min',  # per user, or IP when signed out
+    },
+    'CONCURRENCY': {'auth': 4},  # password hashes run at once per process
+    'CONCURRENCY_WAIT': 0.1,  # seconds to wait for a slot before a 503
+}
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),      # Access token expires in 1 day
@@ -178,6 +275,28 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed names plus .gz/.br copies of text
+# assets; FileServingMiddleware serves them with immutable cache headers.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'chefchainapp.static_files.CompressedManifestStaticFilesStorage',
+    },
+}
+# Responses of at least MIN_SIZE bytes are gzip/brotli compressed when the
+# client accepts it (see chefchainapp/compression.py).
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'BROTLI_QUALITY': 5,  # 0-11; per-request compression favours speed
+}
+
+FILE_SERVING = {
+    'MEDIA': True,  # serve uploads from MEDIA_ROOT too
+    'MAX_AGE': 60,  # seconds, for files without a content hash in their name
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
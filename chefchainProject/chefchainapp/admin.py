@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import feed, transitions
 from .models import *
 from django.contrib.auth.admin import UserAdmin
 # Register your models here.
@@ -58,30 +59,58 @@ class OrderItemInline(admin.TabularInline):
     extra = 1
 
 
+class OrderEventInline(admin.TabularInline):
+    model = OrderEvent
+    extra = 0
+    can_delete = False
+    readonly_fields = ("from_status", "to_status", "actor", "created_at")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ("id", "customer", "order_type", "status", "table_number", "created_at")
+    list_display = ("id", "customer", "order_type", "status", "table_number", "subtotal", "paid_at", "created_at")
     list_filter = ("status", "order_type")
-    search_fields = ("customer__username", "table_number")
-    inlines = [OrderItemInline]
+    search_fields = ("customer__username", "table_number", "payment_reference")
+    inlines = [OrderItemInline, OrderEventInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        order.refresh_totals()
+        # Edits on the form skip the state machine, but are still logged,
+        # once the inline lines are saved so the rollups count them.
+        if "status" in form.changed_data:
+            transitions.record(order, form.initial.get("status", ""), request.user)
+            feed.publish_order_updated([order.pk], status=order.status)
 
     # --- Custom Actions ---
-    actions = ["mark_as_preparing", "mark_as_completed", "mark_as_cancelled"]
+    actions = ["mark_as_preparing", "mark_as_ready", "mark_as_delivered", "mark_as_cancelled"]
+
+    def set_status(self, request, queryset, status):
+        result = transitions.transition(list(queryset.values_list("id", flat=True)), status, request.user)
+        message = f"{len(result.moved)} order(s) marked as {status}."
+        if result.skipped:
+            message += f" {len(result.skipped)} skipped: their status can't change to {status}."
+        self.message_user(request, message)
 
     def mark_as_preparing(self, request, queryset):
-        updated = queryset.update(status="Preparing")
-        self.message_user(request, f"{updated} order(s) marked as Preparing.")
+        self.set_status(request, queryset, "preparing")
 
-    def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status="Completed")
-        self.message_user(request, f"{updated} order(s) marked as Completed.")
+    def mark_as_ready(self, request, queryset):
+        self.set_status(request, queryset, "ready")
+
+    def mark_as_delivered(self, request, queryset):
+        self.set_status(request, queryset, "delivered")
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status="Cancelled")
-        self.message_user(request, f"{updated} order(s) marked as Cancelled.")
+        self.set_status(request, queryset, "cancelled")
 
     mark_as_preparing.short_description = "Mark selected orders as Preparing"
-    mark_as_completed.short_description = "Mark selected orders as Completed"
+    mark_as_ready.short_description = "Mark selected orders as Ready"
+    mark_as_delivered.short_description = "Mark selected orders as Delivered"
     mark_as_cancelled.short_description = "Mark selected orders as Cancelled"
 
 
@@ -91,5 +120,34 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ("item",)
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "wait_ms", "duration_ms")
+    list_filter = ("status", "name")
+    readonly_fields = ("last_error",)
+
+
+@admin.register(DailyItemSales)
+class DailyItemSalesAdmin(admin.ModelAdmin):
+    list_display = ("day", "item", "order_type", "orders", "quantity", "revenue")
+    list_filter = ("order_type", "item")
+    date_hierarchy = "day"
+    list_select_related = ("item",)
+
+
+@admin.register(HourlyStatusCount)
+class HourlyStatusCountAdmin(admin.ModelAdmin):
+    list_display = ("hour", "status", "orders", "revenue")
+    list_filter = ("status",)
+    date_hierarchy = "hour"
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "event", "reference", "order", "received_at")
+    list_filter = ("event",)
+    search_fields = ("reference",)
+
+
 
 admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
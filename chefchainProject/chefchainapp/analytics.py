@@ -0,0 +1,225 @@
+"""
+Prep-time and throughput analytics over the order event log.
+
+Every status change is in ``OrderEvent`` (see transitions.py), so an order's
+timeline is the first time it entered each status. ``prep_time_report``
+pivots those timelines in one grouped query, one row per order with each
+status time as epoch seconds computed by the database, and streams the rows
+in chunks into compact float arrays. Percentiles are then taken with NumPy
+when it is installed, or by sorting otherwise; either way a year of orders
+takes seconds, not a scan per order.
+
+Durations are in seconds. Orders count towards the range in which they
+were confirmed.
+"""
+import math
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import FloatField, Func, Min, Q
+from django.utils import timezone
+
+from .models import MenuItem, OrderEvent, OrderItem
+
+try:
+    import numpy as np
+except ImportError:  # optional: percentiles fall back to pure Python
+    np = None
+
+# stage name -> (from status, to status)
+STAGES = {
+    "confirm_to_ready": ("confirmed", "ready"),
+    "ready_to_delivered": ("ready", "delivered"),
+    "confirm_to_delivered": ("confirmed", "delivered"),
+}
+PERCENTILES = (50, 90, 99)
+# Reported to the millisecond (SQLite's julianday() is good to ~10 microseconds)
+PRECISION = 3
+CHUNK_SIZE = 5000
+DEFAULT_DAYS = 30
+
+
+def day_range(start=None, end=None, days=DEFAULT_DAYS):
+    """
+    ``(first day, last day)`` from ISO dates (either may be a ``date``, a
+    string or None), defaulting to the last ``days`` days including today.
+    Raises ``ValueError`` for a malformed or empty range.
+    """
+    def parse(value):
+        return value if isinstance(value, date) or value is None else date.fromisoformat(value)
+
+    end = parse(end) or timezone.localdate()
+    start = parse(start) or end - timedelta(days=days - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start, end
+
+
+def date_range(start=None, end=None, days=DEFAULT_DAYS):
+    """``day_range()`` as ``[start, end)`` aware datetimes, running to the end
+    of the last day."""
+    start, end = day_range(start, end, days)
+    to_datetime = lambda day: timezone.make_aware(datetime.combine(day, time.min))
+    return to_datetime(start), to_datetime(end + timedelta(days=1))
+
+
+def percentiles(values, points=PERCENTILES):
+    """Linearly interpolated percentiles (NumPy's default method)."""
+    if not len(values):
+        return {f"p{point}": None for point in points}
+    if np is not None:
+        results = np.percentile(np.asarray(values, dtype=float), points)
+        return {f"p{point}": round(float(result), PRECISION) for point, result in zip(points, results)}
+    ordered = sorted(values)
+    results = {}
+    for point in points:
+        rank = (len(ordered) - 1) * point / 100
+        low, high = math.floor(rank), math.ceil(rank)
+        results[f"p{point}"] = round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), PRECISION)
+    return results
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), PRECISION) if len(values) else None,
+        **percentiles(values),
+    }
+
+
+class EpochSeconds(Func):
+    """Seconds since the Unix epoch, computed in SQL so durations are plain
+    float arithmetic instead of a datetime parsed per row in Python."""
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="EXTRACT(EPOCH FROM %(expressions)s)::float")
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)")
+
+
+def confirmed_order_ids(start, end):
+    return OrderEvent.objects.filter(
+        to_status="confirmed", created_at__gte=start, created_at__lt=end
+    ).values("order_id")
+
+
+_local_hours = {}
+
+
+def local_hour(seconds):
+    # UTC offsets are whole quarter hours, so one lookup per quarter hour will do.
+    bucket = int(seconds // 900)
+    if bucket not in _local_hours:
+        _local_hours[bucket] = timezone.localtime(datetime.fromtimestamp(bucket * 900, dt_timezone.utc)).hour
+    return _local_hours[bucket]
+
+
+def order_timelines(start, end):
+    """
+    ``(order_id, local hour confirmed, {stage: seconds or None})`` for every
+    order confirmed in ``[start, end)``, from one grouped query.
+    """
+    statuses = ("confirmed", "ready", "delivered")
+    rows = (
+        OrderEvent.objects.filter(order_id__in=confirmed_order_ids(start, end))
+        .values("order_id")
+        .annotate(**{
+            status: Min(EpochSeconds("created_at"), filter=Q(to_status=status)) for status in statuses
+        })
+        .values_list("order_id", *statuses)
+        .order_by()
+    )
+    for order_id, confirmed, ready, delivered in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield order_id, local_hour(confirmed), {
+            "confirm_to_ready": ready - confirmed if ready is not None else None,
+            "ready_to_delivered": delivered - ready if delivered is not None and ready is not None else None,
+            "confirm_to_delivered": delivered - confirmed if delivered is not None else None,
+        }
+
+
+def prep_time_report(start, end, top_items=20):
+    """Stage percentiles, throughput by hour of day, and the dishes whose
+    orders take longest to prepare, for orders confirmed in ``[start, end)``."""
+    stages = {stage: array("d") for stage in STAGES}
+    hours = defaultdict(lambda: array("d"))
+    hour_counts = [0] * 24
+    prep_by_order = {}
+
+    for order_id, hour, durations in order_timelines(start, end):
+        hour_counts[hour] += 1
+        for stage, seconds in durations.items():
+            if seconds is not None:
+                stages[stage].append(seconds)
+        prep = durations["confirm_to_ready"]
+        if prep is not None:
+            hours[hour].append(prep)
+            prep_by_order[order_id] = prep
+
+    days = max((end - start) / timedelta(days=1), 1)
+    by_hour = [
+        {
+            "hour": hour,
+            "orders": hour_counts[hour],
+            "orders_per_day": hour_counts[hour] / days,
+            "confirm_to_ready": percentiles(hours[hour], (50, 90)),
+        }
+        for hour in range(24)
+    ]
+
+    return {
+        "start": start,
+        "end": end,
+        "orders": sum(hour_counts),
+        "stages": {stage: summarize(values) for stage, values in stages.items()},
+        "by_hour": by_hour,
+        "items": item_contributions(start, end, prep_by_order, top_items),
+    }
+
+
+def item_contributions(start, end, prep_by_order, limit):
+    """
+    For each menu item: how many orders had it, their mean confirm->ready
+    time, and ``slowdown`` (that mean minus the overall mean) times those
+    orders, i.e. the extra kitchen seconds its orders account for. Sorted
+    by slowdown, biggest first.
+    """
+    if not prep_by_order:
+        return []
+    overall = sum(prep_by_order.values()) / len(prep_by_order)
+    totals = defaultdict(lambda: [0, 0, 0.0])  # orders, quantity, prep seconds
+
+    lines = (
+        OrderItem.objects.filter(order_id__in=confirmed_order_ids(start, end))
+        .values_list("order_id", "item_id", "quantity")
+        .order_by()
+    )
+    for order_id, item_id, quantity in lines.iterator(chunk_size=CHUNK_SIZE):
+        prep = prep_by_order.get(order_id)
+        if prep is not None:
+            entry = totals[item_id]
+            entry[0] += 1
+            entry[1] += quantity
+            entry[2] += prep
+
+    items = []
+    for item_id, (orders, quantity, prep) in totals.items():
+        mean = prep / orders
+        items.append({
+            "item_id": item_id,
+            "orders": orders,
+            "quantity": quantity,
+            "mean_confirm_to_ready": round(mean, PRECISION),
+            "slowdown": round((mean - overall) * orders, PRECISION),
+        })
+    items.sort(key=lambda item: item["slowdown"], reverse=True)
+    items = items[:limit]
+    names = dict(MenuItem.objects.filter(pk__in=[item["item_id"] for item in items]).values_list("id", "name"))
+    for item in items:
+        item["name"] = names.get(item["item_id"])
+    return items
@@ -0,0 +1,178 @@
+"""
+JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` (the default) keeps recently seen users in a
+small per-process LRU, so repeat requests skip the ``User`` lookup.
+``TokenUserAuthentication``, for read-only views, doesn't load the user at
+all: it builds a ``ClaimsUser`` from the id, role and staff flags that
+``CustomTokenSerializer`` puts in the access token.
+
+Saving or deleting a user (signals.py) drops it from this process's cache
+and records the time in the cache named by ``AUTH_USER_CACHE['CACHE']``;
+tokens issued before that, and users cached before it, are looked up
+again, so a role change or deactivation applies on the next request in
+every process sharing that cache. If it is a per-process (locmem) cache,
+other processes only catch up after ``AUTH_USER_CACHE['TTL']`` seconds:
+cached users expire after it, and a token's claims are only trusted for
+that long after it was issued (the user is then loaded, and cached, like
+anywhere else).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULTS = {"SIZE": 1024, "TTL": 60, "CACHE": "default"}
+CHANGED_KEY = "auth:user-changed:{}"
+# Claims a token needs for a ClaimsUser (older tokens don't have them)
+CLAIMS = ("role", "is_staff", "iat")
+
+
+def get_changes_cache():
+    """The cache holding when each user last changed."""
+    return caches[{**DEFAULTS, **getattr(settings, "AUTH_USER_CACHE", {})}["CACHE"]]
+
+
+def changes_are_shared():
+    """Whether other processes see ``user_changed``; if not, token claims
+    are only trusted for the user cache's TTL."""
+    return not isinstance(get_changes_cache(), LocMemCache)
+
+
+def user_changed(user_id):
+    """Invalidate cached copies of a user and tokens issued before now."""
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    get_changes_cache().set(CHANGED_KEY.format(user_id), time.time(), timeout=timeout)
+    get_user_cache().discard(user_id)
+
+
+def changed_since(user_id, timestamp):
+    changed = get_changes_cache().get(CHANGED_KEY.format(user_id))
+    return changed is not None and changed >= timestamp
+
+
+class UserCache:
+    """Users by id, least recently used dropped first, each kept for at
+    most ``ttl`` seconds. Hands out copies, so requests can't share state."""
+
+    def __init__(self, size=DEFAULTS["SIZE"], ttl=DEFAULTS["TTL"]):
+        self.size = size
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+        if entry is None:
+            return None
+        loaded_at, user = entry
+        if time.time() - loaded_at > self.ttl or changed_since(user_id, loaded_at):
+            self.discard(user_id)
+            return None
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = (time.time(), copy.copy(user))
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.size:
+                self._users.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._users)
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                options = {**DEFAULTS, **getattr(settings, "AUTH_USER_CACHE", {})}
+                _user_cache = UserCache(options["SIZE"], options["TTL"])
+    return _user_cache
+
+
+def reset_user_cache():
+    global _user_cache
+    _user_cache = None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """simplejwt's authentication with the user lookup cached."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = get_user_cache().get(user_id) if user_id is not None else None
+        if user is None:
+            # Raises for unknown and inactive users, so only valid ones are cached
+            user = super().get_user(validated_token)
+            get_user_cache().set(user_id, user)
+        return user
+
+
+class ClaimsUser(TokenUser):
+    """A user backed by its access token's claims; enough for permission
+    checks and filtering by ``user.id``, but not a ``User`` row."""
+
+    @property
+    def role(self):
+        return self.token["role"]
+
+    @property
+    def email(self):
+        return self.token.get("email", "")
+
+
+class TokenUserAuthentication(CachedJWTAuthentication):
+    """For read-only views: the user comes from the token, without a query,
+    unless the token predates a change to the user or lacks the claims (or,
+    with per-process change records, is older than the user cache's TTL)."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if (
+            user_id is not None
+            and all(claim in validated_token for claim in CLAIMS)
+            and (changes_are_shared() or time.time() - validated_token["iat"] <= get_user_cache().ttl)
+            and not changed_since(user_id, validated_token["iat"])
+        ):
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+
+class QueryParamJWTAuthentication(TokenUserAuthentication):
+    """
+    JWT authentication that also accepts the access token as ``?token=``.
+    Browsers can't set headers on an ``EventSource``, so the live order
+    feed needs this; everything else should keep using the header.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is not None:
+            return super().authenticate(request)
+
+        raw_token = request.query_params.get("token")
+        if not raw_token:
+            return None
+
+        validated_token = self.get_validated_token(raw_token.encode())
+        return self.get_user(validated_token), validated_token
@@ -0,0 +1,86 @@
+"""
+Cart (pending order) mutations.
+
+A customer has at most one pending order and an order at most one line per
+menu item; both are enforced by unique constraints. Every mutation runs in a
+transaction that first locks the customer's cart row, so concurrent taps
+from the same customer are applied one after the other, and quantities are
+incremented with ``F()`` expressions rather than read-modify-write.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Order, OrderItem
+
+
+def get_cart(customer, lock=False):
+    """Return the customer's pending order, creating it if needed. With
+    ``lock=True`` (inside a transaction) the row stays locked until commit."""
+    orders = Order.objects.filter(customer=customer, status="pending")
+    if lock:
+        orders = orders.select_for_update()
+    order = orders.first()
+    if order is not None:
+        return order
+    try:
+        with transaction.atomic():
+            return Order.objects.create(customer=customer, status="pending")
+    except IntegrityError:
+        # Another request created it first.
+        return orders.get()
+
+
+def merge_lines(order, lines):
+    """
+    Add ``(menu_item, quantity)`` pairs to ``order`` with one ``bulk_create``
+    for new lines and one ``bulk_update`` for lines it already has.
+    The caller is responsible for locking the order and refreshing totals.
+    """
+    quantities = {}
+    menu_items = {}
+    for menu_item, quantity in lines:
+        quantities[menu_item.pk] = quantities.get(menu_item.pk, 0) + quantity
+        menu_items[menu_item.pk] = menu_item
+
+    existing = list(OrderItem.objects.filter(order=order, item_id__in=quantities))
+    for line in existing:
+        line.quantity = F("quantity") + quantities.pop(line.item_id)
+    OrderItem.objects.bulk_update(existing, ["quantity"])
+    # bulk_create skips save(), so snapshot the price here
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, item=menu_items[pk], quantity=quantity, unit_price=menu_items[pk].price)
+        for pk, quantity in quantities.items()
+    )
+
+
+def add_items(customer, lines):
+    """Add ``(menu_item, quantity)`` pairs to the customer's cart in one transaction."""
+    with transaction.atomic():
+        order = get_cart(customer, lock=True)
+        merge_lines(order, lines)
+        order.refresh_totals()
+    return order
+
+
+def add_item(customer, menu_item, quantity):
+    return add_items(customer, [(menu_item, quantity)])
+
+
+def set_quantity(customer, line_id, quantity):
+    """Set a cart line's quantity, removing it when ``quantity <= 0``.
+    Raises ``OrderItem.DoesNotExist`` if the line isn't in the customer's cart."""
+    with transaction.atomic():
+        order = (
+            Order.objects.select_for_update()
+            .filter(customer=customer, status="pending")
+            .first()
+        )
+        lines = OrderItem.objects.filter(pk=line_id, order=order)
+        if quantity <= 0:
+            changed = lines.delete()[0]
+        else:
+            changed = lines.update(quantity=quantity)
+        if not changed:
+            raise OrderItem.DoesNotExist
+        order.refresh_totals()
+    return order
@@ -0,0 +1,94 @@
+"""
+Negotiated response compression.
+
+``CompressionMiddleware`` compresses text responses (JSON, HTML, CSV...)
+of at least ``COMPRESSION['MIN_SIZE']`` bytes with brotli when the client
+accepts it and the package is installed, otherwise gzip. Order and menu
+payloads are repetitive nested JSON, so they typically shrink 5-10x.
+
+Responses that are streamed (exports, the live order feed, files) or
+already encoded (the menu snapshot, precompressed static files) are left
+alone. Like Django's ``GZipMiddleware``, gzip output gets a few random
+bytes in its header to blunt BREACH-style attacks on compressed secrets.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+DEFAULTS = {
+    "MIN_SIZE": 1024,
+    "GZIP_MAX_RANDOM_BYTES": 100,
+    # Fast settings: compression runs per request
+    "BROTLI_QUALITY": 5,
+}
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml",
+                      "application/x-ndjson", "image/svg+xml")
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "COMPRESSION", {})}
+
+
+def choose_encoding(request):
+    """``"br"``, ``"gzip"`` or None from the request's Accept-Encoding."""
+    accepted = {}
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, options):
+    if encoding == "br":
+        return brotli.compress(content, quality=options["BROTLI_QUALITY"])
+    return compress_string(content, max_random_bytes=options["GZIP_MAX_RANDOM_BYTES"])
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        options = get_options()
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < options["MIN_SIZE"]
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        # The response depends on Accept-Encoding even if not compressed now
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compress(response.content, encoding, options)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        # The compressed bytes differ from what a strong ETag described
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
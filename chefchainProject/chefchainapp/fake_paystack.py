@@ -0,0 +1,175 @@
+"""
+A local stand-in for the Paystack API, for tests and load runs.
+
+It serves the endpoints the client uses (transaction initialize and verify)
+over real HTTP/1.1 keep-alive connections, can delay every response to
+simulate gateway latency, and can be told to fail the next N requests with
+a 5xx:
+
+    server = FakePaystackServer(latency=2.0).start()
+    client = Paystack(BASE_URL=server.url)
+    ...
+    server.stop()
+
+Run it standalone with ``manage.py fake_paystack --port 8010 --latency 2``
+and set ``PAYSTACK_BASE_URL=http://127.0.0.1:8010``. ``signed_event`` builds
+the webhook delivery Paystack would send for one of its transactions.
+"""
+import hashlib
+import hmac
+import json
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+VERIFY_PATH = re.compile(r"^/transaction/verify/(?P<reference>[^/]+)$")
+
+
+class FakePaystackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.fake.opened_connection()
+
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def handle_api(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, payload = fake.respond(method, urlsplit(self.path).path, self.headers.get("Authorization"), body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timed out) first
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePaystackServer:
+    """
+    ``transactions`` maps reference -> transaction dict; initialized
+    transactions get ``transaction_status`` (``"success"`` by default, as if
+    the customer paid straight away).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, secret_key=None, transaction_status="success"):
+        self.latency = latency
+        self.secret_key = secret_key
+        self.transaction_status = transaction_status
+        self.transactions = {}
+        self.requests = 0
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), FakePaystackHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, count, status=503):
+        """Answer the next ``count`` requests with HTTP ``status``."""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def opened_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def respond(self, method, path, authorization, body):
+        with self._lock:
+            self.requests += 1
+            failure = self._failures.pop(0) if self._failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            return failure, {"status": False, "message": "Gateway error"}
+        if not authorization or (self.secret_key and authorization != f"Bearer {self.secret_key}"):
+            return 401, {"status": False, "message": "Invalid key"}
+
+        if method == "POST" and path == "/transaction/initialize":
+            return self.initialize(body)
+        match = VERIFY_PATH.match(path)
+        if method == "GET" and match:
+            return self.verify(match["reference"])
+        return 404, {"status": False, "message": "Not found"}
+
+    def initialize(self, body):
+        if not body.get("email") or not body.get("amount"):
+            return 400, {"status": False, "message": "Email and amount are required"}
+        reference = body.get("reference") or secrets.token_hex(8)
+        with self._lock:
+            if reference in self.transactions:
+                return 400, {"status": False, "message": "Duplicate Transaction Reference"}
+            access_code = secrets.token_hex(8)
+            self.transactions[reference] = {
+                "id": len(self.transactions) + 1,
+                "reference": reference,
+                "amount": int(body["amount"]),
+                "currency": "NGN",
+                "status": self.transaction_status,
+                "gateway_response": "Successful" if self.transaction_status == "success" else "Declined",
+                "customer": {"email": body["email"]},
+                "metadata": body.get("metadata") or {},
+            }
+        return 200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{self.url}/checkout/{access_code}",
+                "access_code": access_code,
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        transaction = self.transactions.get(reference)
+        if transaction is None:
+            return 400, {"status": False, "message": "Transaction reference not found"}
+        return 200, {"status": True, "message": "Verification successful", "data": dict(transaction)}
+
+    def signed_event(self, event, reference):
+        """``(body, signature)`` of a webhook delivery for a transaction, signed
+        the way Paystack signs them."""
+        body = json.dumps({"event": event, "data": self.transactions[reference]}).encode()
+        signature = hmac.new((self.secret_key or "").encode(), body, hashlib.sha512).hexdigest()
+        return body, signature
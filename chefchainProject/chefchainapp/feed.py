@@ -0,0 +1,133 @@
+"""
+Live order feed for the kitchen and rider screens.
+
+Views publish small order deltas ("order.created", "order.updated") to a
+channel layer, and ``OrderStreamView`` pushes them to connected screens as
+Server-Sent Events. Every event carries an increasing id, so a screen that
+reconnects with ``Last-Event-ID`` only receives what it missed.
+
+The default layer keeps a bounded buffer in process memory, which is all a
+single ASGI worker (or the test suite) needs. Point ``ORDER_FEED["BACKEND"]``
+at another class with the same ``publish``/``events_after``/``wait`` methods
+to share the feed between processes.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class FeedEvent:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        """Format the event as an SSE message."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class InMemoryChannelLayer:
+    """Ring buffer of the most recent events, shared by the threads and the
+    event loop of one process."""
+
+    def __init__(self, buffer_size=500):
+        self._events = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._async_waiters = set()
+
+    def publish(self, event_type, payload):
+        data = json.dumps(payload, cls=JSONEncoder, separators=(",", ":"))
+        with self._condition:
+            self._last_id += 1
+            event = FeedEvent(self._last_id, event_type, data)
+            self._events.append(event)
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return event
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def events_after(self, last_id):
+        """Events newer than ``last_id``, or ``None`` when some of them have
+        already dropped out of the buffer, or ``last_id`` is from before a
+        restart (ids started over), and the client must refetch."""
+        with self._condition:
+            if last_id > self._last_id or (self._events and last_id < self._events[0].id - 1):
+                return None
+            return [event for event in self._events if event.id > last_id]
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than ``last_id`` exists or ``timeout``
+        seconds pass."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+
+    async def await_event(self, last_id, timeout):
+        """Async counterpart of :meth:`wait` that doesn't hold a thread."""
+        waiter = asyncio.Event()
+        entry = (asyncio.get_running_loop(), waiter)
+        with self._condition:
+            if self._last_id > last_id:
+                return
+            self._async_waiters.add(entry)
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(entry)
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                config = getattr(settings, "ORDER_FEED", {})
+                backend = import_string(
+                    config.get("BACKEND", "chefchainapp.feed.InMemoryChannelLayer")
+                )
+                _layer = backend(**config.get("OPTIONS", {}))
+    return _layer
+
+
+def reset_channel_layer():
+    """Drop the current layer so the next call builds a fresh one (tests)."""
+    global _layer
+    _layer = None
+
+
+def publish(event_type, payload):
+    """Publish once the surrounding transaction commits, so screens never
+    see an order that was rolled back."""
+    transaction.on_commit(lambda: get_channel_layer().publish(event_type, payload))
+
+
+def publish_order_created(order):
+    from .serializers import OrderSerializer
+
+    publish("order.created", OrderSerializer(order).data)
+
+
+def publish_order_updated(order_ids, **changes):
+    for order_id in order_ids:
+        publish("order.updated", {"id": order_id, **changes})
@@ -0,0 +1,142 @@
+"""
+Responsive variants of menu item photos.
+
+Uploads are stored as they arrive, often multi-megabyte camera photos, so
+each one is also rendered at a few widths (``VARIANTS``) as WebP and JPEG,
+auto-rotated and stripped of EXIF/GPS and colour profile metadata. Variant
+file names carry a hash of their content, so they can be served with a
+far-future ``Cache-Control: immutable``; a new photo gets new names.
+
+Saving a ``MenuItem`` with a new image queues ``process_menu_item_image``
+(signals.py), which renders the variants on a job worker rather than the
+request thread and records them in ``MenuItem.image_variants``:
+
+    {"source": "menu_images/jollof.jpg",
+     "thumb": {"width": 160, "height": 120, "webp": "menu_images/variants/...", "jpeg": "..."},
+     ...}
+
+``render_variants()`` only needs the image bytes, so
+``manage.py process_menu_images`` can backfill on a process pool.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import jobs
+from .menu_cache import bump_menu_version
+from .models import Job, MenuItem
+
+# name -> maximum width in pixels, smallest first (photos aren't upscaled)
+VARIANTS = {"thumb": 160, "card": 480, "full": 1200}
+# format -> (extension, Pillow save options)
+FORMATS = {
+    "webp": ("webp", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+VARIANT_DIR = "menu_images/variants"
+HASH_LENGTH = 12
+
+
+def render_variants(data):
+    """
+    ``{variant: {"width", "height", format: bytes}}`` for an image's bytes.
+    Plain data in and out, so it can run in another process.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten transparent areas onto white
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+
+    rendered = {}
+    for name, max_width in VARIANTS.items():
+        if image.width > max_width:
+            size = (max_width, max(1, round(image.height * max_width / image.width)))
+            resized = image.resize(size, Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+        # Drop everything but the pixels (EXIF, GPS, ICC, comments)
+        resized.info = {}
+        rendered[name] = {"width": resized.width, "height": resized.height}
+        for fmt, (_, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **options)
+            rendered[name][fmt] = buffer.getvalue()
+    return rendered
+
+
+def variant_name(source, width, fmt, content):
+    # Variants that come out the same (small photos) share a file
+    stem = os.path.splitext(os.path.basename(source))[0]
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{VARIANT_DIR}/{stem}.{width}w.{digest}.{FORMATS[fmt][0]}"
+
+
+def store_variants(source, rendered, storage=default_storage):
+    """Save rendered variants (existing files have the same content, so are
+    kept) and return their description for ``MenuItem.image_variants``."""
+    variants = {"source": source}
+    for name, entry in rendered.items():
+        variants[name] = {"width": entry["width"], "height": entry["height"]}
+        for fmt in FORMATS:
+            path = variant_name(source, entry["width"], fmt, entry[fmt])
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(entry[fmt]))
+            variants[name][fmt] = path
+    return variants
+
+
+def needs_processing(item):
+    current = item.image_variants or {}
+    return (item.image.name or None) != current.get("source")
+
+
+def queue_processing(item):
+    """Queue ``process_menu_item_image`` unless it's already waiting to run."""
+    name = process_menu_item_image.job_name
+    if not Job.objects.filter(name=name, status="queued", kwargs={"item_id": item.pk}).exists():
+        jobs.enqueue(process_menu_item_image, item_id=item.pk)
+
+
+def save_variants(item_id, source, variants):
+    """
+    Record ``variants`` for the item if its image is still ``source``.
+    Written with ``update()``, so the save signals (and another round of
+    processing) don't fire. Returns whether the item was updated.
+
+    Replaced variant files are left in place: pages and caches may still
+    point at them, and another item may share the same photo.
+    """
+    same_image = Q(image=source) if source else Q(image="") | Q(image__isnull=True)
+    updated = MenuItem.objects.filter(same_image, pk=item_id).update(image_variants=variants)
+    if updated:
+        transaction.on_commit(bump_menu_version)
+    return bool(updated)
+
+
+def process_item(item):
+    """Render and record the variants of one item's current image."""
+    source = item.image.name or None
+    if source is None:
+        return save_variants(item.pk, None, {})
+    with item.image.open("rb") as image:
+        data = image.read()
+    return save_variants(item.pk, source, store_variants(source, render_variants(data)))
+
+
+@jobs.task(max_attempts=3)
+def process_menu_item_image(item_id):
+    item = MenuItem.objects.filter(pk=item_id).first()
+    if item is not None and needs_processing(item):
+        process_item(item)
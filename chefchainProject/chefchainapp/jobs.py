@@ -0,0 +1,184 @@
+"""
+Database-backed background jobs.
+
+Slow side effects are queued as ``Job`` rows and run by
+``manage.py run_workers --concurrency N``, so the request that caused them
+can return straight away. There is no broker: workers claim due jobs with a
+conditional UPDATE (and ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it), so any number of worker processes can share the
+table on SQLite or Postgres.
+
+    @jobs.task(max_attempts=5)
+    def send_receipt(order_id):
+        ...
+
+    jobs.enqueue(send_receipt, order_id=order.pk)
+
+A job enqueued inside a transaction commits or rolls back with it. Failed
+attempts are retried with exponential backoff, and every attempt records
+how long the job waited for a worker and how long it ran. Workers refresh
+the heartbeat of the jobs they run, so a long job is never mistaken for
+one whose worker died; those are retried as a failed attempt.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(func=None, *, name=None, max_attempts=3):
+    """Register a function as a job. Its name defaults to its import path,
+    which is how a worker finds it again."""
+
+    def register(func):
+        func.job_name = name or f"{func.__module__}.{func.__qualname__}"
+        func.max_attempts = max_attempts
+        _registry[func.job_name] = func
+        return func
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    if name not in _registry:
+        import_string(name)  # importing the module registers it
+    return _registry[name]
+
+
+def enqueue(func, delay=None, **kwargs):
+    """Queue ``func(**kwargs)``, to run no sooner than ``delay`` from now.
+    ``kwargs`` must be JSON serializable."""
+    run_after = timezone.now() + (delay or timedelta(0))
+    return Job.objects.create(
+        name=func.job_name, kwargs=kwargs, max_attempts=func.max_attempts, run_after=run_after
+    )
+
+
+class Worker:
+    """
+    Claims due jobs and runs them on a pool of ``concurrency`` threads,
+    refreshing their heartbeat every ``heartbeat_interval``. Running jobs
+    without a heartbeat for ``stale_after`` (their worker died) count as a
+    failed attempt: they go back in the queue, or fail once out of attempts.
+    """
+
+    def __init__(self, concurrency=4, poll_interval=1.0, backoff=5.0, stale_after=timedelta(minutes=10),
+                 heartbeat_interval=timedelta(seconds=30)):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.backoff = backoff
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.last_heartbeat = None
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.stopping = threading.Event()
+
+    def claim(self, limit):
+        now = timezone.now()
+        with transaction.atomic():
+            due = Job.objects.filter(status="queued", run_after__lte=now).order_by("run_after", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            ids = list(due.values_list("id", flat=True)[:limit])
+            if not ids:
+                return []
+            # The status condition makes the claim safe without row locks:
+            # a job another worker took in the meantime isn't updated.
+            Job.objects.filter(pk__in=ids, status="queued").update(
+                status="running", locked_by=self.id, started_at=now, heartbeat_at=now, attempts=F("attempts") + 1
+            )
+            return list(Job.objects.filter(pk__in=ids, status="running", locked_by=self.id))
+
+    def heartbeat(self, force=False):
+        """Mark this worker's jobs as still running, at most once per
+        ``heartbeat_interval``."""
+        now = timezone.now()
+        if force or self.last_heartbeat is None or now - self.last_heartbeat >= self.heartbeat_interval:
+            Job.objects.filter(status="running", locked_by=self.id).update(heartbeat_at=now)
+            self.last_heartbeat = now
+
+    def requeue_stale(self):
+        """Retry (or fail, out of attempts) jobs whose worker stopped
+        sending heartbeats. Returns how many were put back in the queue."""
+        now = timezone.now()
+        stale = Job.objects.filter(status="running", heartbeat_at__lt=now - self.stale_after)
+        error = f"Worker stopped sending heartbeats for {self.stale_after}"
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status="failed", locked_by="", last_error=error, finished_at=now
+        )
+        return stale.filter(attempts__lt=F("max_attempts")).update(status="queued", locked_by="", last_error=error)
+
+    def run_job(self, job):
+        started = timezone.now()
+        changes = {
+            "locked_by": "",
+            "wait_ms": max(0, int((job.started_at - job.run_after).total_seconds() * 1000)),
+        }
+        try:
+            get_task(job.name)(**job.kwargs)
+        except Exception:
+            logger.exception("Job %s (%s) failed on attempt %s", job.pk, job.name, job.attempts)
+            changes["last_error"] = traceback.format_exc()
+            if job.attempts < job.max_attempts:
+                changes["status"] = "queued"
+                changes["run_after"] = timezone.now() + timedelta(seconds=self.backoff * 2 ** (job.attempts - 1))
+            else:
+                changes["status"] = "failed"
+        else:
+            changes["status"] = "done"
+        finally:
+            finished = timezone.now()
+            changes["finished_at"] = finished
+            changes["duration_ms"] = int((finished - started).total_seconds() * 1000)
+            Job.objects.filter(pk=job.pk, locked_by=self.id).update(**changes)
+            close_old_connections()
+        return changes["status"]
+
+    def run(self, once=False):
+        """Work until ``stop()`` is called, or with ``once=True`` until no
+        job is due. Returns the number of jobs run."""
+        processed = 0
+        running = set()
+        self.requeue_stale()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(running)
+                jobs = self.claim(free) if free else []
+                for job in jobs:
+                    running.add(pool.submit(self.run_job, job))
+                processed += len(jobs)
+                if once and not jobs and not running:
+                    break
+                if not jobs:
+                    if running:
+                        wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    else:
+                        self.stopping.wait(self.poll_interval)
+                        self.requeue_stale()
+                running = {future for future in running if not future.done()}
+                if running:
+                    self.heartbeat()
+            # Let claimed jobs finish before exiting.
+            while running:
+                wait(running, timeout=self.poll_interval)
+                running = {future for future in running if not future.done()}
+                self.heartbeat()
+        return processed
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from chefchainapp.models import MenuItem, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "Snapshot missing line item prices and recompute stored order totals."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            priced = OrderItem.objects.filter(unit_price__isnull=True).update(
+                unit_price=models.Subquery(
+                    MenuItem.objects.filter(pk=models.OuterRef("item_id")).values("price")[:1]
+                )
+            )
+            orders = Order.objects.all().refresh_totals()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshotted {priced} line item price(s), refreshed {orders} order total(s)."
+        ))
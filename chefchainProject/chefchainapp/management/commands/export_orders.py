@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chefchainapp.analytics import DEFAULT_DAYS, date_range
+from chefchainapp.exports import STREAMS, export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream orders and their line items as CSV or NDJSON, to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(STREAMS), default="csv")
+        parser.add_argument("--start", help="first day (YYYY-MM-DD)")
+        parser.add_argument("--end", help="last day, inclusive (YYYY-MM-DD, default today)")
+        parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="range length when --start is omitted")
+        parser.add_argument("--status", action="append", help="only orders in this status (repeatable)")
+        parser.add_argument("--output", "-o", help="file to write (default stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = date_range(options["start"], options["end"], options["days"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        chunks = STREAMS[options["format"]](export_rows(start, end, statuses=options["status"]))
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chefchainapp.fake_paystack import FakePaystackServer
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Paystack API for development and load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8010)
+        parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+
+    def handle(self, *args, **options):
+        server = FakePaystackServer(
+            options["host"], options["port"], latency=options["latency"],
+            secret_key=settings.PAYSTACK_SECRET_KEY,
+        )
+        self.stdout.write(f"Fake Paystack listening on {server.url} (latency {options['latency']}s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+from chefchainapp.models import Job
+
+
+class Command(BaseCommand):
+    help = "Show per-job counts and timings (queue wait and run time) for recent jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=24)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options["hours"])
+        rows = (
+            Job.objects.filter(created_at__gte=since)
+            .values("name")
+            .annotate(
+                queued=Count("id", filter=Q(status="queued")),
+                running=Count("id", filter=Q(status="running")),
+                done=Count("id", filter=Q(status="done")),
+                failed=Count("id", filter=Q(status="failed")),
+                avg_wait=Avg("wait_ms"),
+                max_wait=Max("wait_ms"),
+                avg_run=Avg("duration_ms"),
+                max_run=Max("duration_ms"),
+            )
+            .order_by("name")
+        )
+        self.stdout.write(
+            f"{'job':50} {'queued':>7} {'running':>7} {'done':>7} {'failed':>7} "
+            f"{'wait avg/max ms':>17} {'run avg/max ms':>17}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:50} {row['queued']:7} {row['running']:7} {row['done']:7} {row['failed']:7} "
+                f"{row['avg_wait'] or 0:8.0f}/{row['max_wait'] or 0:<8} {row['avg_run'] or 0:8.0f}/{row['max_run'] or 0:<8}"
+            )
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from chefchainapp.analytics import DEFAULT_DAYS, date_range, day_range, prep_time_report
+
+
+def minutes(seconds):
+    return f"{seconds / 60:7.1f}" if seconds is not None else f"{'-':>7}"
+
+
+class Command(BaseCommand):
+    help = "Prep-time percentiles, orders per hour and the slowest dishes for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="first day (YYYY-MM-DD)")
+        parser.add_argument("--end", help="last day, inclusive (YYYY-MM-DD, default today)")
+        parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="range length when --start is omitted")
+        parser.add_argument("--items", type=int, default=10, help="how many dishes to list")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            first_day, last_day = day_range(options["start"], options["end"], options["days"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        start, end = date_range(first_day, last_day)
+        report = prep_time_report(start, end, top_items=options["items"])
+        if options["json"]:
+            self.stdout.write(json.dumps(report, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        self.stdout.write(f"{report['orders']} order(s) confirmed {first_day:%Y-%m-%d} to {last_day:%Y-%m-%d}\n")
+        self.stdout.write(f"{'stage (minutes)':22} {'count':>7} {'mean':>7} {'p50':>7} {'p90':>7} {'p99':>7}")
+        for stage, summary in report["stages"].items():
+            self.stdout.write(
+                f"{stage:22} {summary['count']:7} {minutes(summary['mean'])} "
+                f"{minutes(summary['p50'])} {minutes(summary['p90'])} {minutes(summary['p99'])}"
+            )
+
+        self.stdout.write(f"\n{'hour':4} {'orders':>7} {'per day':>8} {'prep p50':>9} {'prep p90':>9}")
+        for row in report["by_hour"]:
+            if row["orders"]:
+                prep = row["confirm_to_ready"]
+                self.stdout.write(
+                    f"{row['hour']:02}   {row['orders']:7} {row['orders_per_day']:8.1f}"
+                    f"  {minutes(prep['p50'])}   {minutes(prep['p90'])}"
+                )
+
+        self.stdout.write(f"\n{'dish':30} {'orders':>7} {'qty':>7} {'prep avg':>9} {'extra min':>10}")
+        for item in report["items"]:
+            self.stdout.write(
+                f"{item['name'][:30]:30} {item['orders']:7} {item['quantity']:7}"
+                f"  {minutes(item['mean_confirm_to_ready'])} {item['slowdown'] / 60:10.1f}"
+            )
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from chefchainapp.images import needs_processing, render_variants, save_variants, store_variants
+from chefchainapp.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = "Generate the resized variants of menu item photos that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                            help="worker processes resizing images (1 resizes in this process)")
+        parser.add_argument("--force", action="store_true", help="regenerate variants that are already up to date")
+
+    def handle(self, *args, **options):
+        items = [
+            item for item in MenuItem.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+            if options["force"] or needs_processing(item)
+        ]
+        done = failed = 0
+
+        def finish(item, source, rendered):
+            nonlocal done
+            if save_variants(item.pk, source, store_variants(source, rendered)):
+                done += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {item.pk} {source}")
+
+        def fail(item, exc):
+            nonlocal failed
+            failed += 1
+            self.stderr.write(f"Could not process {item.image.name} (item {item.pk}): {exc}")
+
+        def read(item):
+            with item.image.open("rb") as image:
+                return image.read()
+
+        processes = max(1, options["processes"] or 1)
+        if processes == 1:
+            for item in items:
+                try:
+                    finish(item, item.image.name, render_variants(read(item)))
+                except Exception as exc:
+                    fail(item, exc)
+        else:
+            with ProcessPoolExecutor(processes) as pool:
+                # Only a couple of images per process are read ahead, so
+                # memory doesn't grow with the size of the menu.
+                pending = {}
+                queue = iter(items)
+                while True:
+                    for item in queue:
+                        try:
+                            pending[pool.submit(render_variants, read(item))] = item
+                        except Exception as exc:
+                            fail(item, exc)
+                        if len(pending) >= processes * 2:
+                            break
+                    if not pending:
+                        break
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        item = pending.pop(future)
+                        try:
+                            finish(item, item.image.name, future.result())
+                        except Exception as exc:
+                            fail(item, exc)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} image(s), {failed} failed."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from chefchainapp.menu_cache import bump_menu_version
+from chefchainapp.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the menu item search index from the database."
+
+    def handle(self, *args, **options):
+        # Cached search responses may be stale too.
+        bump_menu_version()
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt menu search index ({type(backend).__name__})."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chefchainapp.rollups import CHUNK_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales and hourly status rollup tables from order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                            help="orders (and events) aggregated per pass")
+
+    def handle(self, *args, **options):
+        def progress(table, last_id):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {table} up to id {last_id}")
+
+        sales, hourly = rebuild(chunk_size=options["chunk_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {sales} daily sales row(s) and {hourly} hourly status row(s)."
+        ))
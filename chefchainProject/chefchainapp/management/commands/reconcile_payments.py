@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from chefchainapp.payments import reconcile, unconfirmed_orders
+
+
+class Command(BaseCommand):
+    help = "Verify unconfirmed Paystack payments and mark the paid orders (catches missed webhooks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-age", type=int, default=120,
+                            help="skip payments started less than this many seconds ago")
+        parser.add_argument("--max-age", type=int, default=2 * 24 * 60 * 60,
+                            help="give up on payments started longer ago than this (seconds)")
+        parser.add_argument("--limit", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        orders = list(unconfirmed_orders(
+            timedelta(seconds=options["min_age"]), timedelta(seconds=options["max_age"])
+        )[:options["limit"]])
+        confirmed, unreachable = reconcile(orders, concurrency=options["concurrency"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(orders)} payment(s): {confirmed} confirmed, {unreachable} unreachable."
+        ))
@@ -0,0 +1,24 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from chefchainapp.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (see chefchainapp/jobs.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="jobs run at once (threads)")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between polls when idle")
+        parser.add_argument("--once", action="store_true", help="exit when no job is due")
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=options["concurrency"], poll_interval=options["poll_interval"])
+        if not options["once"]:
+            # Finish the jobs in hand on Ctrl-C / SIGTERM, then exit.
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: worker.stop())
+            self.stdout.write(f"Worker {worker.id} running {options['concurrency']} job(s) at a time")
+        processed = worker.run(once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} job(s)."))
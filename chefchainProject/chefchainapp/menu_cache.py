@@ -0,0 +1,283 @@
+"""
+Versioned cache for the public menu endpoints.
+
+Menu responses are cached under the current *menu version*, which is bumped
+whenever a ``MenuItem`` or ``Category`` is saved or deleted (see signals.py).
+Bumping the version makes every cached page unreachable at once, so there is
+nothing to purge. The version also drives the ETag/Last-Modified headers,
+letting browsers revalidate with a 304 instead of downloading the menu again.
+
+The cache alias is set by ``MENU_CACHE_ALIAS``; any Django cache backend
+shared by the worker processes works (file based, memcached, redis...).
+With the per-process local memory backend a version bump is only seen by
+the process that made it, so there versions and responses expire after
+``MENU_CACHE_LOCAL_TIMEOUT`` seconds instead.
+
+In front of it, each process keeps the version and the responses built
+under it in memory (``LocalMenuCache``), so a warm request touches neither
+the database nor the shared cache. The shared version is re-read at most
+every ``MENU_CACHE_REVALIDATE`` seconds; bumps made by this process apply
+at once.
+"""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+try:
+    import brotli
+except ImportError:  # optional: snapshots are served gzip/identity only
+    brotli = None
+
+VERSION_KEY = "menu:version"
+
+
+def get_cache():
+    return caches[getattr(settings, "MENU_CACHE_ALIAS", "default")]
+
+
+def get_timeouts():
+    """``(version timeout, response timeout)`` for the configured cache."""
+    if isinstance(get_cache(), LocMemCache):
+        timeout = getattr(settings, "MENU_CACHE_LOCAL_TIMEOUT", 30)
+        return timeout, timeout
+    return None, getattr(settings, "MENU_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+class LocalMenuCache:
+    """This process's copy of the menu version, with the responses cached
+    under it (at most ``size``, dropped when the version changes)."""
+
+    def __init__(self, size=256):
+        self.size = size
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._entries = OrderedDict()
+
+    def get_version(self, max_age):
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < max_age:
+                return self._version
+        return None
+
+    def set_version(self, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._entries.clear()
+
+
+_local = LocalMenuCache()
+
+
+def clear_menu_cache():
+    """Empty the shared menu cache and this process's copy (tests, benchmarks)."""
+    get_cache().clear()
+    _local.clear()
+
+
+def _new_version():
+    now = time.time_ns()
+    return f"{now:x}", now // 1_000_000_000
+
+
+def get_menu_version():
+    """Return ``(version, last_modified)``, creating a version if the cache
+    has none yet (first request, or the cache was flushed)."""
+    current = _local.get_version(getattr(settings, "MENU_CACHE_REVALIDATE", 2))
+    if current is None:
+        cache = get_cache()
+        current = cache.get(VERSION_KEY)
+        if current is None:
+            cache.add(VERSION_KEY, _new_version(), timeout=get_timeouts()[0])
+            current = cache.get(VERSION_KEY)
+        _local.set_version(current)
+    return current
+
+
+def bump_menu_version():
+    version = _new_version()
+    get_cache().set(VERSION_KEY, version, timeout=get_timeouts()[0])
+    _local.set_version(version)
+
+
+def get_cached(key, build):
+    """``build()``'s result for ``key``: from this process, else the shared
+    cache, else built and stored in both. ``build()`` may return None to
+    skip caching."""
+    value = _local.get(key)
+    if value is None:
+        cache = get_cache()
+        value = cache.get(key)
+        if value is None:
+            value = build()
+            if value is None:
+                return None
+            cache.set(key, value, get_timeouts()[1])
+        _local.set(key, value)
+    return value
+
+
+def cached_menu_response(request, build_response):
+    """
+    Serve a menu GET from the cache, calling ``build_response()`` only on a
+    miss, and answer conditional requests with 304 Not Modified.
+    """
+    version, last_modified = get_menu_version()
+    media_type = getattr(request, "accepted_media_type", "")
+    # The host too: responses carry absolute image URLs
+    digest = hashlib.sha1(f"{request.get_host()}|{request.get_full_path()}|{media_type}".encode()).hexdigest()[:16]
+    etag = f'"{version}-{digest}"'
+
+    if _not_modified(request, etag, last_modified):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        uncached = []
+
+        def build():
+            response = build_response()
+            if response.status_code != status.HTTP_200_OK:
+                uncached.append(response)
+                return None
+            return response.data
+
+        data = get_cached(f"menu:{version}:{digest}", build)
+        if data is None:
+            return uncached[0]
+        response = Response(data)
+
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # Weak comparison: CompressionMiddleware marks compressed responses' tags weak
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or if_none_match.strip() == "*"
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+class MenuCacheMixin:
+    """Cache ``list``/``retrieve`` of a menu view under the menu version."""
+
+    def list(self, request, *args, **kwargs):
+        return cached_menu_response(request, lambda: super(MenuCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_menu_response(request, lambda: super(MenuCacheMixin, self).retrieve(request, *args, **kwargs))
+
+
+# ----------------------------
+# Full menu snapshot
+# ----------------------------
+def build_menu_snapshot(request, version):
+    """Serialize every category that has available items, with those items,
+    and return the JSON body pre-compressed for each supported encoding.
+    The categories come from the same joined query as the items."""
+    from .models import MenuItem
+    from .serializers import MenuItemSerializer
+
+    items = list(MenuItem.objects.filter(available=True).select_related("category").order_by("id"))
+    item_data = MenuItemSerializer(items, many=True, context={"request": request}).data
+    grouped = {}
+    categories = {}
+    for item, data in zip(items, item_data):
+        grouped.setdefault(item.category_id, []).append(data)
+        if item.category_id is not None:
+            categories[item.category_id] = item.category
+
+    # Same shape as CategorySerializer, without its per-row overhead.
+    categories = [
+        {
+            "id": category.pk,
+            "name": category.name,
+            "description": category.description,
+            "items": grouped[category.pk],
+        }
+        for category in sorted(categories.values(), key=lambda category: category.pk)
+    ]
+
+    body = JSONRenderer().render({
+        "version": version,
+        "categories": categories,
+        "uncategorized": grouped.get(None, []),
+    })
+    encodings = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body)
+    return encodings
+
+
+def get_menu_snapshot(request, version):
+    return get_cached(
+        f"menu:snapshot:{version}:{request.get_host()}", lambda: build_menu_snapshot(request, version)
+    )
+
+
+def _choose_encoding(request, available):
+    accepted = {
+        token.split(";")[0].strip().lower()
+        for token in request.headers.get("Accept-Encoding", "").split(",")
+    }
+    for encoding in ("br", "gzip"):
+        if encoding in available and encoding in accepted:
+            return encoding
+    return "identity"
+
+
+def menu_snapshot_response(request):
+    """Serve the pre-serialized, pre-compressed menu snapshot."""
+    version, last_modified = get_menu_version()
+    encodings = get_menu_snapshot(request, version)
+    encoding = _choose_encoding(request, encodings)
+    etag = f'"{version}-snapshot-{encoding}"'
+
+    if _not_modified(request, etag, last_modified):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(encodings[encoding], content_type="application/json")
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    _set_validators(response, etag, last_modified)
+    return response
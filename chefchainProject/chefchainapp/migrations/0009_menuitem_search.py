@@ -0,0 +1,43 @@
+from django.db import migrations
+
+FTS_TABLE = 'chefchainapp_menuitem_search'
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+        return cursor.fetchone() is not None
+
+
+def create_search_table(apps, schema_editor):
+    # Other databases use the in-process trigram index (chefchainapp/search.py).
+    if not has_fts5(schema_editor.connection):
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, description, category, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) "
+        "SELECT m.id, m.name, COALESCE(m.description, ''), COALESCE(c.name, '') "
+        "FROM chefchainapp_menuitem m LEFT JOIN chefchainapp_category c ON c.id = m.category_id"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if has_fts5(schema_editor.connection):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chefchainapp', '0008_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
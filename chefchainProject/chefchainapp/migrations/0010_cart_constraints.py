@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:29
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Fold duplicate pending orders and duplicate order lines together so
+    the unique constraints below can be created."""
+    Order = apps.get_model('chefchainapp', 'Order')
+    OrderItem = apps.get_model('chefchainapp', 'OrderItem')
+    touched = set()
+
+    duplicated = (
+        Order.objects.filter(status='pending').values('customer')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('customer', flat=True)
+    )
+    for customer_id in list(duplicated):
+        keep, *extra = Order.objects.filter(customer_id=customer_id, status='pending').order_by('created_at', 'id')
+        OrderItem.objects.filter(order__in=extra).update(order=keep)
+        Order.objects.filter(pk__in=[order.pk for order in extra]).delete()
+        touched.add(keep.pk)
+
+    duplicated = (
+        OrderItem.objects.values('order', 'item')
+        .annotate(n=Count('id'), total=Sum('quantity')).filter(n__gt=1)
+    )
+    for row in list(duplicated):
+        keep, *extra = OrderItem.objects.filter(order_id=row['order'], item_id=row['item']).order_by('id')
+        OrderItem.objects.filter(pk=keep.pk).update(quantity=row['total'])
+        OrderItem.objects.filter(pk__in=[line.pk for line in extra]).delete()
+        touched.add(row['order'])
+
+    for order in Order.objects.filter(pk__in=touched):
+        lines = OrderItem.objects.filter(order=order)
+        order.item_count = lines.aggregate(n=Sum('quantity'))['n'] or 0
+        order.subtotal = sum((line.quantity * (line.unit_price or 0) for line in lines), 0)
+        order.save(update_fields=['item_count', 'subtotal'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chefchainapp', '0009_menuitem_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('customer',), name='one_pending_order_per_customer'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'item'), name='one_line_per_item_per_order'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fix_admin_statuses(apps, schema_editor):
+    """The old admin actions wrote values that aren't valid statuses."""
+    Order = apps.get_model('chefchainapp', 'Order')
+    for old, new in [('Preparing', 'preparing'), ('Completed', 'delivered'), ('Cancelled', 'cancelled')]:
+        Order.objects.filter(status=old).update(status=new)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chefchainapp', '0015_kitchen_queue_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='chefchainapp.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'created_at'], name='orderevent_order_idx'), models.Index(fields=['to_status', 'created_at'], name='orderevent_status_idx')],
+            },
+        ),
+        migrations.RunPython(fix_admin_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:46
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    # The best estimate for payments already in flight
+    Order = apps.get_model('chefchainapp', 'Order')
+    Order.objects.filter(payment_reference__isnull=False).update(payment_started_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chefchainapp', '0019_menuitem_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_started_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, User
 
 
@@ -31,13 +35,57 @@ class MenuItem(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=8, default=1 , decimal_places=2)
     image = models.ImageField(upload_to="menu_images/", blank=True, null=True)
+    # Resized copies of the image, filled in by a background job (images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     available = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Public menu: available items, optionally by category
+            models.Index(fields=["available", "category"], name="menuitem_available_cat_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load the customer and every line item with its menu item up front,
+        so serializing a page of orders costs a fixed number of queries."""
+        return self.select_related("customer").prefetch_related(
+            models.Prefetch(
+                "order_items",
+                queryset=OrderItem.objects.select_related("item__category").order_by("id"),
+            )
+        )
+
+    def active(self):
+        """Orders the kitchen is working on."""
+        return self.filter(status__in=Order.ACTIVE_STATUSES)
+
+    def refresh_totals(self):
+        """Recompute the stored subtotal and item count of every order in
+        the queryset from its line items, in a single UPDATE."""
+        lines = OrderItem.objects.filter(order=models.OuterRef("pk")).values("order")
+        line_total = models.ExpressionWrapper(
+            models.F("quantity") * models.F("unit_price"),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+        return self.update(
+            subtotal=Coalesce(
+                models.Subquery(lines.annotate(total=models.Sum(line_total)).values("total")),
+                models.Value(Decimal("0.00")),
+            ),
+            item_count=Coalesce(
+                models.Subquery(lines.annotate(count=models.Sum("quantity")).values("count")),
+                models.Value(0),
+            ),
+            updated_at=timezone.now(),
+        )
+
+
 class Order(models.Model):
     ORDER_TYPE_CHOICES = [
         ('dine_in', 'Dine In'),
@@ -51,23 +99,206 @@ class Order(models.Model):
         ('preparing', 'Preparing'),
         ('ready', 'Ready'),
         ('delivered', 'Delivered'),
+        ('cancelled', 'Cancelled'),
     ]
+    # Allowed changes between these are in transitions.py
+    # Statuses shown on the kitchen display
+    ACTIVE_STATUSES = ('confirmed', 'preparing', 'ready')
     
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     table_number = models.CharField(max_length=10, null=True, blank=True)
     order_type = models.CharField(max_length=20, choices=ORDER_TYPE_CHOICES, default='dine_in')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    payment_reference = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    # When the latest payment attempt started (updated_at moves with every edit)
+    payment_started_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Cart lookups and order history: filter by customer and status
+            models.Index(fields=["customer", "status"], name="order_customer_status_idx"),
+            # Order history, newest first
+            models.Index(fields=["customer", "-created_at", "-id"], name="order_customer_created_idx"),
+            # Kitchen list: newest first, paged by (created_at, id)
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            # ?since= sync pages by (updated_at, id)
+            models.Index(fields=["updated_at", "id"], name="order_updated_idx"),
+            # Kitchen queue: open orders by status, oldest first
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+        ]
+        constraints = [
+            # A customer's cart is their single pending order. This is also
+            # the partial index (WHERE status = 'pending') behind cart lookups.
+            models.UniqueConstraint(
+                fields=["customer"],
+                condition=models.Q(status="pending"),
+                name="one_pending_order_per_customer",
+            ),
+        ]
+
+    def refresh_totals(self):
+        Order.objects.filter(pk=self.pk).refresh_totals()
+        self.refresh_from_db(fields=["subtotal", "item_count"])
 
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="order_items", on_delete=models.CASCADE)
     item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Price of the menu item when it was added, so later menu edits
+    # don't change what past orders cost.
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order", "item"], name="one_line_per_item_per_order"),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.item.name}"
 
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.item.price
+        super().save(*args, **kwargs)
+
     def get_total_price(self):
-        return self.quantity * self.item.price
+        price = self.unit_price if self.unit_price is not None else self.item.price
+        return self.quantity * price
+
+
+
+class OrderEvent(models.Model):
+    """Append-only log of order status changes (see transitions.py)."""
+    order = models.ForeignKey(Order, related_name="events", on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, null=True, blank=True, related_name="+", on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # One order's history
+            models.Index(fields=["order", "created_at"], name="orderevent_order_idx"),
+            # Changes into a status over a time window (prep-time metrics)
+            models.Index(fields=["to_status", "created_at"], name="orderevent_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Order events are append-only")
+        super().save(*args, **kwargs)
+
+
+class PaymentEvent(models.Model):
+    """A Paystack event (webhook delivery or reconciliation result), stored
+    once per reference and event type however often it is delivered."""
+    reference = models.CharField(max_length=100)
+    event = models.CharField(max_length=50)
+    order = models.ForeignKey(Order, related_name="payment_events", null=True, blank=True, on_delete=models.SET_NULL)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["reference", "event"], name="one_payment_event_per_reference"),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.reference}"
 
+
+class Job(models.Model):
+    """A queued background task (see jobs.py)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a stale one means it died
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    # Timing of the last attempt: time spent due but waiting for a worker,
+    # and time spent running.
+    wait_ms = models.PositiveIntegerField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll for due jobs in run_after order
+            models.Index(fields=["status", "run_after"], name="job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class DailyItemSales(models.Model):
+    """Sales of one menu item on one day for one order type, kept up to
+    date as orders are confirmed or cancelled (see rollups.py)."""
+    day = models.DateField()
+    item = models.ForeignKey(MenuItem, related_name="daily_sales", on_delete=models.CASCADE)
+    order_type = models.CharField(max_length=20, choices=Order.ORDER_TYPE_CHOICES)
+    orders = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily item sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "item", "order_type"], name="one_sales_row_per_day_item_type"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.item_id} {self.order_type}: {self.quantity}"
+
+
+class HourlyStatusCount(models.Model):
+    """Orders that moved into a status during one hour, and their value
+    (see rollups.py)."""
+    hour = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hour", "status"], name="one_count_per_hour_status"),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.status}: {self.orders}"
+
+
+class RateLimitBucket(models.Model):
+    """A token bucket shared between processes by the ``database`` rate
+    limit store (see throttling.py)."""
+    key = models.CharField(max_length=255, unique=True)
+    tokens = models.FloatField()
+    # Unix time of the last refill
+    updated_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f}"
@@ -0,0 +1,111 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_sync_cursor(updated_at, seen=()):
+    """``updated_at`` is the newest change served; ``seen`` the
+    ``(pk, updated_at)`` of rows served in the overlap window before it."""
+    seen = ",".join(f"{pk}.{(updated_at - changed) // MICROSECOND}" for pk, changed in sorted(seen))
+    return urlsafe_b64encode(f"{updated_at.isoformat()}|{seen}".encode()).decode()
+
+
+def decode_sync_cursor(value):
+    try:
+        timestamp, seen = urlsafe_b64decode(value.encode()).decode().split("|")
+        updated_at = parse_datetime(timestamp)
+        if updated_at is not None:
+            seen = {
+                (int(pk), updated_at - int(offset) * MICROSECOND)
+                for pk, offset in (entry.split(".") for entry in seen.split(",") if entry)
+            }
+    except (TypeError, ValueError, UnicodeDecodeError):
+        updated_at = None
+    if updated_at is None:
+        raise NotFound("Invalid sync cursor.")
+    return updated_at, seen
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for order lists, newest first, so pages stay fast and
+    stable while new orders keep arriving.
+
+    Every page also carries a ``sync`` cursor. Passing it back as ``?since=``
+    switches to sync mode: only orders created or modified after the cursor
+    are returned, oldest change first, each page with the cursor to use next.
+
+    ``updated_at`` is set before the transaction commits, so a change can
+    become visible after later ones were already served. Sync pages therefore
+    look ``sync_overlap`` back from the cursor and skip the rows the cursor
+    records as served in that window.
+    """
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    sync_overlap = timedelta(seconds=5)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.since = request.query_params.get("since")
+        if self.since is None:
+            self.sync_cursor = self.get_sync_cursor(queryset)
+            return super().paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by("updated_at", "id")
+        watermark, seen = None, set()
+        if self.since:
+            watermark, seen = decode_sync_cursor(self.since)
+            queryset = queryset.filter(updated_at__gte=watermark - self.sync_overlap)
+        rows = queryset[:self.page_size + len(seen) + 1]
+        page = [row for row in rows if (row.pk, row.updated_at) not in seen]
+        self.has_more = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        if self.page:
+            seen |= {(row.pk, row.updated_at) for row in self.page}
+            last = self.page[-1].updated_at
+            watermark = last if watermark is None else max(watermark, last)
+            self.sync_cursor = self.make_sync_cursor(watermark, seen)
+        else:
+            self.sync_cursor = self.since
+        return self.page
+
+    def make_sync_cursor(self, watermark, seen):
+        start = watermark - self.sync_overlap
+        return encode_sync_cursor(watermark, {(pk, changed) for pk, changed in seen if changed >= start})
+
+    def get_sync_cursor(self, queryset):
+        # Taken before the page is read, so nothing changed after it is missed.
+        changes = queryset.prefetch_related(None).order_by("-updated_at", "-id").values_list("pk", "updated_at")
+        latest, seen = None, set()
+        for pk, changed in changes.iterator(chunk_size=100):
+            latest = latest or changed
+            if changed < latest - self.sync_overlap:
+                break
+            seen.add((pk, changed))
+        if latest is None:
+            return ""
+        return self.make_sync_cursor(latest, seen)
+
+    def get_paginated_response(self, data):
+        if self.since is None:
+            response = super().get_paginated_response(data)
+            response.data["sync"] = self.sync_cursor
+            return response
+        return Response(OrderedDict([
+            ("sync", self.sync_cursor),
+            ("has_more", self.has_more),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["sync"] = {"type": "string"}
+        return schema
@@ -0,0 +1,123 @@
+"""
+Payment confirmation.
+
+Orders are marked paid from what Paystack reports, not from the customer's
+browser: the webhook (``PaystackWebhookView``) records each signed event and
+confirms the order, and ``manage.py reconcile_payments`` verifies references
+that are still unconfirmed (a webhook that was lost or delayed). Both go
+through ``record_event``, which stores an event once per reference and type,
+so retried and duplicate deliveries change nothing. Each checkout also
+queues a ``follow_up_payment`` job, so a lost webhook is caught without
+waiting for the next reconcile run.
+"""
+import hashlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import feed, jobs
+from .models import Order, PaymentEvent
+from .paystack import PaystackUnavailable, get_paystack, to_kobo
+
+# How long a checkout waits for its webhook before it is verified directly
+FOLLOW_UP_DELAY = timedelta(minutes=2)
+
+
+def valid_signature(body, signature):
+    """Paystack signs the raw request body with HMAC-SHA512 of the secret key."""
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return bool(signature) and hmac.compare_digest(expected, signature)
+
+
+def order_for(data):
+    """The order a transaction pays for: by reference, or by the order id
+    sent as metadata (the customer may have started a newer attempt since)."""
+    order = Order.objects.filter(payment_reference=data.get("reference")).first()
+    if order is None:
+        order_id = (data.get("metadata") or {}).get("order_id")
+        order = Order.objects.filter(pk=order_id).first() if order_id else None
+    return order
+
+
+def record_event(event, data):
+    """
+    Store a Paystack event and apply it. Returns the new ``PaymentEvent``,
+    or ``None`` if this event was already recorded for the reference.
+    """
+    order = order_for(data)
+    try:
+        with transaction.atomic():
+            payment_event = PaymentEvent.objects.create(
+                reference=data.get("reference") or "", event=event or "", order=order, payload=data
+            )
+            if event == "charge.success":
+                confirm_payment(order, data)
+    except IntegrityError:
+        return None
+    return payment_event
+
+
+def confirm_payment(order, data):
+    """Mark ``order`` paid if the transaction succeeded for its full amount."""
+    if order is None or data.get("status") != "success" or data.get("amount") != to_kobo(order.subtotal):
+        return False
+    now = timezone.now()
+    if not Order.objects.filter(pk=order.pk, paid_at__isnull=True).update(paid_at=now, updated_at=now):
+        return False
+    feed.publish_order_updated([order.pk], paid_at=now)
+    return True
+
+
+def unconfirmed_orders(min_age, max_age):
+    """Orders with a payment started between ``max_age`` and ``min_age`` ago
+    (timedeltas) and not yet confirmed."""
+    now = timezone.now()
+    return Order.objects.filter(
+        payment_reference__isnull=False,
+        paid_at__isnull=True,
+        payment_started_at__lte=now - min_age,
+        payment_started_at__gte=now - max_age,
+    ).order_by("payment_started_at")
+
+
+def reconcile(orders, concurrency=8):
+    """
+    Verify each order's reference with Paystack, ``concurrency`` calls at a
+    time over the pooled client, and record the settled ones. Returns
+    ``(confirmed, unreachable)`` counts.
+    """
+    client = get_paystack()
+
+    def verify(order):
+        try:
+            return client.verify_payment(order.payment_reference)
+        except PaystackUnavailable:
+            return None
+
+    orders = list(orders)
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(verify, orders))
+
+    unreachable = 0
+    for order, result in zip(orders, results):
+        if result is None:
+            unreachable += 1
+        elif result[0] and result[1].get("status") in ("success", "failed"):
+            # Recorded like a webhook; a declined payment is kept as
+            # "charge.failed" so the status page can stop waiting.
+            record_event(f"charge.{result[1]['status']}", result[1])
+    confirmed = Order.objects.filter(pk__in=[order.pk for order in orders], paid_at__isnull=False).count()
+    return confirmed, unreachable
+
+
+@jobs.task(max_attempts=5)
+def follow_up_payment(order_id):
+    """Verify one checkout if its webhook hasn't confirmed it yet."""
+    orders = Order.objects.filter(pk=order_id, payment_reference__isnull=False, paid_at__isnull=True)
+    confirmed, unreachable = reconcile(orders, concurrency=1)
+    if unreachable:
+        raise PaystackUnavailable(f"Could not verify the payment for order {order_id}")
@@ -1,74 +1,267 @@
-# from django.conf import settings
-# import requests
+"""
+Paystack API client.
 
-# class Paystack:
-#     PAYSTACK_SK = settings.PAYSTACK_SECRET_KEY
-#     base_url = "https://api.paystack.co/"
+Every process shares one client (``get_paystack()``) and with it one pool of
+keep-alive connections to the gateway. Each call has connect/read timeouts;
+5xx responses and connection errors (not read timeouts) are retried a
+bounded number of times with exponential backoff; and a circuit breaker
+fails fast while the gateway is down, so a checkout peak doesn't tie up
+every worker waiting on timeouts.
 
-#     def verify_payment(self, ref, *args, **kwargs):
-#         path = f'transaction/verify/{ref}'
-#         headers = {
-#             "Authorization": f"Bearer {self.PAYSTACK_SK}",
-#             "Content-Type": "application/json",
-#         }
-#         url = self.base_url + path
-#         response = requests.get(url, headers=headers)
+``AsyncPaystack`` is the same client on httpx for asyncio code (httpx is an
+optional dependency). Settings are read from ``PAYSTACK`` in settings.py;
+point ``BASE_URL`` at the fake server in fake_paystack.py for tests and
+load runs.
+"""
+import asyncio
+import random
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
 
-#         if response.status_code == 200:
-#             response_data = response.json()
-#             return response_data['status'], response_data['data']
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-#         response_data = response.json()
+try:
+    import httpx
+except ImportError:  # optional: only AsyncPaystack needs it
+    httpx = None
 
-#         return response_data['status'], response_data['message']
+DEFAULTS = {
+    "BASE_URL": "https://api.paystack.co",
+    "TIMEOUT": (3.05, 10),
+    "RETRIES": 2,
+    "BACKOFF": 0.3,
+    "POOL_SIZE": 20,
+    "CIRCUIT_BREAKER": {"FAILURES": 5, "RESET_TIMEOUT": 30},
+}
 
 
-# paystack.py
-import requests
-from django.conf import settings
+class PaystackUnavailable(Exception):
+    """The gateway timed out, kept failing with 5xx, or the circuit is open."""
 
-class Paystack:
-    PAYSTACK_SECRET_KEY = settings.PAYSTACK_SECRET_KEY
-    base_url = "https://api.paystack.co"
-    
-    def verify_payment(self, reference, *args, **kwargs):
-        path = f"/transaction/verify/{reference}"
-        
-        headers = {
-            "Authorization": f"Bearer {self.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
-        url = self.base_url + path
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            return response_data['status'], response_data['data']
-        
-        response_data = response.json()
-        return False, response_data['message']
-    
-    def initialize_payment(self, email, amount, reference, callback_url=None):
-        path = "/transaction/initialize"
-        
-        headers = {
-            "Authorization": f"Bearer {self.PAYSTACK_SECRET_KEY}",
+
+def to_kobo(amount):
+    """Paystack amounts are integers in the currency's subunit."""
+    return int((Decimal(amount) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failures`` consecutive failed calls and rejects calls for
+    ``reset_timeout`` seconds. After that a single trial call is let through:
+    success closes the circuit again, failure re-opens it. Callers pass what
+    ``allow()`` returned to ``release()`` when the call ends, so a trial that
+    ended some other way (an unexpected exception) doesn't keep it shut.
+    """
+
+    def __init__(self, failures=5, reset_timeout=30):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._opened_at = None
+        self._trial = None
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """False to reject the call; otherwise a token for ``release()``."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial is not None or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = object()
+            return self._trial
+
+    def release(self, token):
+        with self._lock:
+            if self._trial is token:
+                self._trial = None
+
+    def record_success(self):
+        with self._lock:
+            self._failed = 0
+            self._opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failed += 1
+            if self._trial is not None or self._failed >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = None
+
+
+class BasePaystack:
+    """Request building, retry policy and response handling shared by the
+    sync and async clients."""
+
+    def __init__(self, secret_key=None, **options):
+        config = {**DEFAULTS, **getattr(settings, "PAYSTACK", {}), **options}
+        self.secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+        self.base_url = config["BASE_URL"].rstrip("/")
+        self.timeout = config["TIMEOUT"]
+        self.retries = config["RETRIES"]
+        self.backoff = config["BACKOFF"]
+        self.pool_size = config["POOL_SIZE"]
+        self.breaker = CircuitBreaker(
+            config["CIRCUIT_BREAKER"]["FAILURES"], config["CIRCUIT_BREAKER"]["RESET_TIMEOUT"]
+        )
+        self.headers = {
+            "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json",
         }
-        
-        payload = {
+
+    def _initialize_payload(self, email, amount, reference, callback_url, metadata):
+        return {
             "email": email,
-            "amount": int(amount * 100),  # Convert to kobo
+            "amount": to_kobo(amount),
             "reference": reference,
             "callback_url": callback_url,
+            "metadata": metadata or {},
         }
-        
-        url = self.base_url + path
-        response = requests.post(url, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            return response_data['status'], response_data['data']
-        
-        response_data = response.json()
-        return False, response_data['message']
\ No newline at end of file
+
+    def _delay(self, attempt):
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _before_call(self):
+        token = self.breaker.allow()
+        if not token:
+            raise PaystackUnavailable("Payment gateway circuit is open")
+        return token
+
+    @staticmethod
+    def _json(response):
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    @staticmethod
+    def _result(status_code, body):
+        """``(True, data)`` on success, ``(False, message)`` when Paystack
+        rejected the request."""
+        if status_code == 200 and body.get("status"):
+            return body["status"], body["data"]
+        return False, body.get("message", f"Paystack returned HTTP {status_code}")
+
+
+class Paystack(BasePaystack):
+    """Blocking client on a pooled ``requests.Session``."""
+
+    def __init__(self, secret_key=None, **options):
+        super().__init__(secret_key, **options)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, path, **kwargs):
+        token = self._before_call()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+                except requests.RequestException as exc:
+                    error = exc
+                    if isinstance(exc, requests.ReadTimeout):
+                        break  # slow rather than down; retrying would multiply the wait
+                else:
+                    if response.status_code < 500:
+                        self.breaker.record_success()
+                        return self._result(response.status_code, self._json(response))
+                    error = f"HTTP {response.status_code}"
+                if attempt < self.retries:
+                    time.sleep(self._delay(attempt))
+            self.breaker.record_failure()
+            raise PaystackUnavailable(f"Paystack {method} {path} failed: {error}")
+        finally:
+            self.breaker.release(token)
+
+    def verify_payment(self, reference, *args, **kwargs):
+        return self.request("GET", f"/transaction/verify/{reference}")
+
+    def initialize_payment(self, email, amount, reference, callback_url=None, metadata=None):
+        payload = self._initialize_payload(email, amount, reference, callback_url, metadata)
+        return self.request("POST", "/transaction/initialize", json=payload)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncPaystack(BasePaystack):
+    """asyncio client on a pooled ``httpx.AsyncClient``. Create it inside the
+    event loop that uses it."""
+
+    def __init__(self, secret_key=None, **options):
+        if httpx is None:
+            raise ImportError("AsyncPaystack requires httpx (pip install httpx)")
+        super().__init__(secret_key, **options)
+        connect, read = self.timeout if isinstance(self.timeout, (tuple, list)) else (self.timeout, self.timeout)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+        )
+
+    async def request(self, method, path, **kwargs):
+        token = self._before_call()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = await self.client.request(method, path, **kwargs)
+                except httpx.HTTPError as exc:
+                    error = exc
+                    if isinstance(exc, httpx.ReadTimeout):
+                        break
+                else:
+                    if response.status_code < 500:
+                        self.breaker.record_success()
+                        return self._result(response.status_code, self._json(response))
+                    error = f"HTTP {response.status_code}"
+                if attempt < self.retries:
+                    await asyncio.sleep(self._delay(attempt))
+            self.breaker.record_failure()
+            raise PaystackUnavailable(f"Paystack {method} {path} failed: {error}")
+        finally:
+            self.breaker.release(token)
+
+    async def verify_payment(self, reference, *args, **kwargs):
+        return await self.request("GET", f"/transaction/verify/{reference}")
+
+    async def initialize_payment(self, email, amount, reference, callback_url=None, metadata=None):
+        payload = self._initialize_payload(email, amount, reference, callback_url, metadata)
+        return await self.request("POST", "/transaction/initialize", json=payload)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_paystack():
+    """The process-wide client, so every request shares its connection pool
+    and circuit breaker."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Paystack()
+    return _client
+
+
+def reset_paystack():
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = None
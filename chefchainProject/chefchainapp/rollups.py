@@ -0,0 +1,177 @@
+"""
+Pre-aggregated sales tables for dashboards and admin reports.
+
+``DailyItemSales`` holds quantity, revenue and order count per day, menu
+item and order type for sold orders (confirmed onwards, not cancelled),
+dated by when the order was confirmed. ``HourlyStatusCount`` counts the
+orders that moved into each status per hour, with their value.
+
+Both are kept current by ``apply()``, which transitions.py calls for every
+status change, so reports read a few hundred rows instead of aggregating
+every line item ever sold. ``manage.py rebuild_sales_rollups`` recomputes
+them from history in chunks (e.g. after a bulk import).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+
+from .models import DailyItemSales, HourlyStatusCount, Order, OrderEvent, OrderItem
+
+SOLD_STATUSES = ("confirmed", "preparing", "ready", "delivered")
+CHUNK_SIZE = 5000
+
+
+def sold_on():
+    """Day an order was confirmed, falling back to when it was created for
+    orders older than the event log. For ``OrderItem`` querysets."""
+    confirmed = (
+        OrderEvent.objects.filter(order=OuterRef("order_id"), to_status="confirmed")
+        .values("order").annotate(first=Min("created_at")).values("first")
+    )
+    return TruncDate(Coalesce(Subquery(confirmed), F("order__created_at")))
+
+
+def item_sales(order_ids):
+    """``(day, item_id, order_type) -> [orders, quantity, revenue]`` for the
+    given orders, summed in SQL."""
+    line_total = ExpressionWrapper(
+        F("quantity") * Coalesce(F("unit_price"), F("item__price")),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .annotate(day=sold_on())
+        .values("day", "item_id", "order__order_type")
+        # Named apart from the fields, which line_total refers to
+        .annotate(orders=Count("order_id", distinct=True), units=Sum("quantity"), sales=Sum(line_total))
+        .order_by()
+    )
+    return {
+        (row["day"], row["item_id"], row["order__order_type"]): [row["orders"], row["units"], row["sales"]]
+        for row in rows
+    }
+
+
+def increment(model, key, **amounts):
+    """Add ``amounts`` to the rollup row for ``key``, creating it if needed."""
+    changes = {field: F(field) + value for field, value in amounts.items()}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **amounts)
+    except IntegrityError:
+        # Created by a concurrent request in the meantime
+        model.objects.filter(**key).update(**changes)
+
+
+def apply(moves, to_status, at, revenue):
+    """
+    Account for orders that moved to ``to_status`` at ``at``. ``moves`` maps
+    order id -> the status it came from and ``revenue`` is their combined
+    subtotal. Call inside the transaction that made the change.
+    """
+    if not moves:
+        return
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    increment(HourlyStatusCount, {"hour": hour, "status": to_status}, orders=len(moves), revenue=revenue)
+
+    sold = to_status in SOLD_STATUSES
+    changed = [pk for pk, from_status in moves.items() if (from_status in SOLD_STATUSES) != sold]
+    sign = 1 if sold else -1
+    for (day, item_id, order_type), (orders, quantity, revenue) in item_sales(changed).items():
+        increment(
+            DailyItemSales, {"day": day, "item_id": item_id, "order_type": order_type},
+            orders=sign * orders, quantity=sign * quantity, revenue=sign * revenue,
+        )
+
+
+def rebuild(chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Recompute both tables from orders and their events, ``chunk_size`` rows
+    per pass, and swap them in atomically. Returns the row counts.
+    """
+    sales = defaultdict(lambda: [0, 0, Decimal("0")])
+    order_ids = Order.objects.filter(status__in=SOLD_STATUSES).order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while True:
+        chunk = list(order_ids.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            break
+        for key, values in item_sales(chunk).items():
+            totals = sales[key]
+            for index, value in enumerate(values):
+                totals[index] += value
+        last = chunk[-1]
+        if progress:
+            progress("orders", last)
+
+    hourly = defaultdict(lambda: [0, Decimal("0")])
+    events = OrderEvent.objects.order_by("pk")
+    last = 0
+    while True:
+        bounds = list(events.filter(pk__gt=last).values_list("pk", flat=True)[:chunk_size])
+        if not bounds:
+            break
+        rows = (
+            events.filter(pk__gte=bounds[0], pk__lte=bounds[-1])
+            .values(hour=TruncHour("created_at"), status=F("to_status"))
+            .annotate(orders=Count("id"), revenue=Sum("order__subtotal"))
+            .order_by()
+        )
+        for row in rows:
+            totals = hourly[row["hour"], row["status"]]
+            totals[0] += row["orders"]
+            totals[1] += row["revenue"] or 0
+        last = bounds[-1]
+        if progress:
+            progress("events", last)
+
+    with transaction.atomic():
+        DailyItemSales.objects.all().delete()
+        DailyItemSales.objects.bulk_create(
+            (
+                DailyItemSales(day=day, item_id=item_id, order_type=order_type,
+                               orders=orders, quantity=quantity, revenue=revenue)
+                for (day, item_id, order_type), (orders, quantity, revenue) in sales.items()
+            ),
+            batch_size=CHUNK_SIZE,
+        )
+        HourlyStatusCount.objects.all().delete()
+        HourlyStatusCount.objects.bulk_create(
+            (
+                HourlyStatusCount(hour=hour, status=status, orders=orders, revenue=revenue)
+                for (hour, status), (orders, revenue) in hourly.items()
+            ),
+            batch_size=CHUNK_SIZE,
+        )
+    return len(sales), len(hourly)
+
+
+def sales_summary(start, end, top_items=10):
+    """Revenue by day, order type and top dish for days in ``[start, end]``,
+    read from the rollups."""
+    sales = DailyItemSales.objects.filter(day__gte=start, day__lte=end)
+    totals = {"sales": Sum("revenue"), "units": Sum("quantity")}
+    by_day = {row["day"]: row for row in sales.values("day").annotate(**totals).order_by()}
+    days = []
+    day = start
+    while day <= end:
+        row = by_day.get(day, {})
+        days.append({"day": day, "sales": row.get("sales") or Decimal("0"), "units": row.get("units") or 0})
+        day += timedelta(days=1)
+
+    return {
+        "start": start,
+        "end": end,
+        "sales": sum(day["sales"] for day in days),
+        "days": days,
+        "order_types": list(sales.values("order_type").annotate(**totals).order_by("-sales")),
+        "items": list(
+            sales.values("item_id", name=F("item__name")).annotate(**totals).order_by("-sales")[:top_items]
+        ),
+    }
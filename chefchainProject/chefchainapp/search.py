@@ -0,0 +1,248 @@
+"""
+Menu item search.
+
+Two interchangeable backends answer ``search(query, limit)`` with menu item
+ids, best match first:
+
+* ``SQLiteFTSBackend`` uses an FTS5 virtual table (created by migration 0009)
+  over item name, description and category name, ranked with bm25 and with
+  prefix indexes so type-ahead queries stay fast.
+* ``TrigramBackend`` is a pure-Python in-process trigram index for other
+  databases. It matches partial words and tolerates typos ("jolof" finds
+  "Jollof Rice").
+
+Both are told about writes through ``on_change`` from the MenuItem/Category
+signals (see signals.py), and ``manage.py rebuild_menu_search`` rebuilds
+them from scratch.
+"""
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "chefchainapp_menuitem_search"
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return WORD_RE.findall((text or "").lower())
+
+
+def _document_rows(item_ids=None):
+    """(id, name, description, category name) for the given items, or all."""
+    from .models import MenuItem
+
+    items = MenuItem.objects.all()
+    if item_ids is not None:
+        items = items.filter(pk__in=item_ids)
+    return items.values_list("id", "name", "description", "category__name")
+
+
+class SQLiteFTSBackend:
+    # bm25 column weights: name, description, category
+    weights = (10.0, 1.0, 3.0)
+
+    @staticmethod
+    def is_supported():
+        if connection.vendor != "sqlite":
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+            return cursor.fetchone() is not None
+
+    def search(self, query, limit=100):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Every word must match, the last one as a prefix (type-ahead);
+        # if that finds nothing, accept any word as a prefix.
+        strict = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        loose = " OR ".join(f'"{term}"*' for term in terms)
+        for match in (strict, loose):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                    f"ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s",
+                    [match, *self.weights, limit],
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                return ids
+        return []
+
+    def on_change(self, item_ids, deleted=False):
+        # Same transaction as the write, so the index commits or rolls back with it.
+        if deleted:
+            self.remove(item_ids)
+        else:
+            self.index(item_ids)
+
+    def index(self, item_ids):
+        rows = list(_document_rows(item_ids))
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in item_ids])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)",
+                [(pk, name, description or "", category or "") for pk, name, description, category in rows],
+            )
+
+    def remove(self, item_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in item_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        self.index([pk for pk, *_ in _document_rows()])
+
+
+class TrigramBackend:
+    """
+    In-memory trigram index. Each process keeps its own copy; it records the
+    menu version it was last synced to, and rebuilds itself (one query) when
+    another process has changed the menu since.
+    """
+    # Weight of a trigram found in each field: name, description, category
+    weights = (1.0, 0.4, 0.6)
+    # Share of the query's trigrams a document must contain to match
+    threshold = 0.6
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # trigram -> {item id: weight}
+        self._documents = {}  # item id -> (name, trigrams)
+        self._version = None
+
+    @staticmethod
+    def is_supported():
+        return True
+
+    @staticmethod
+    def trigrams(text, prefix=False):
+        grams = set()
+        for word in tokenize(text):
+            # Pad the start so short prefixes still produce trigrams; pad
+            # the end only for indexed text, so a partial word still matches.
+            padded = f"  {word}" if prefix else f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+
+    def search(self, query, limit=100):
+        grams = self.trigrams(query, prefix=True)
+        if not grams:
+            return []
+        with self._lock:
+            self._ensure_current()
+            hits = defaultdict(int)
+            scores = defaultdict(float)
+            for gram in grams:
+                for pk, weight in self._postings.get(gram, {}).items():
+                    hits[pk] += 1
+                    scores[pk] += weight
+            minimum = self.threshold * len(grams)
+            ranked = sorted(
+                (pk for pk, count in hits.items() if count >= minimum),
+                key=lambda pk: (-scores[pk], self._documents[pk][0]),
+            )
+        return ranked[:limit]
+
+    def on_change(self, item_ids, deleted=False):
+        from .menu_cache import get_menu_version
+
+        # The menu version is bumped when this write commits. Apply the change
+        # in place only if the index was current before it; otherwise some
+        # other change is missing too and the next search rebuilds.
+        version = get_menu_version()[0]
+
+        def apply():
+            with self._lock:
+                if self._version != version:
+                    return
+                if deleted:
+                    self.remove(item_ids)
+                else:
+                    self.index(item_ids)
+
+        transaction.on_commit(apply)
+
+    def index(self, item_ids):
+        rows = list(_document_rows(item_ids))
+        with self._lock:
+            self._remove(item_ids)
+            for row in rows:
+                self._add(*row)
+            self._mark_current()
+
+    def remove(self, item_ids):
+        with self._lock:
+            self._remove(item_ids)
+            self._mark_current()
+
+    def rebuild(self):
+        rows = list(_document_rows())
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            for row in rows:
+                self._add(*row)
+            self._mark_current()
+
+    def _add(self, pk, name, description, category):
+        fields = [self.trigrams(name), self.trigrams(description), self.trigrams(category)]
+        all_grams = set().union(*fields)
+        for gram in all_grams:
+            self._postings[gram][pk] = max(
+                weight for weight, grams in zip(self.weights, fields) if gram in grams
+            )
+        self._documents[pk] = (name.lower(), all_grams)
+
+    def _remove(self, item_ids):
+        for pk in item_ids:
+            document = self._documents.pop(pk, None)
+            if document is None:
+                continue
+            for gram in document[1]:
+                posting = self._postings.get(gram)
+                posting.pop(pk, None)
+                if not posting:
+                    del self._postings[gram]
+
+    def _mark_current(self):
+        from .menu_cache import get_menu_version
+
+        self._version = get_menu_version()[0]
+
+    def _ensure_current(self):
+        from .menu_cache import get_menu_version
+
+        if self._version != get_menu_version()[0]:
+            self.rebuild()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """The configured backend (``MENU_SEARCH_BACKEND``), or FTS5 when the
+    database is SQLite with FTS5 compiled in and trigrams otherwise."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, "MENU_SEARCH_BACKEND", None)
+                if path:
+                    _backend = import_string(path)()
+                elif SQLiteFTSBackend.is_supported():
+                    _backend = SQLiteFTSBackend()
+                else:
+                    _backend = TrigramBackend()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    _backend = None
@@ -1,7 +1,17 @@
+from operator import attrgetter
+
 from rest_framework import serializers
 from .models import *
+from .cart import merge_lines
+from .images import FORMATS, VARIANTS
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db.models.manager import BaseManager
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import ISO_8601, api_settings
 
 User = get_user_model()
 
@@ -42,72 +52,311 @@ class CustomTokenSerializer(TokenObtainPairSerializer):
         token["role"] = user.role
         token["username"] = user.username
         token["email"] = user.email   # optional, useful for frontend
+        # Lets read-only views authenticate from the token alone (authentication.py)
+        token["is_staff"] = user.is_staff
+        token["is_superuser"] = user.is_superuser
 
         return token
 
-class MenuItemSerializer(serializers.ModelSerializer): 
-    category = serializers.StringRelatedField() #
-
-    class Meta:
-        model = MenuItem
-        fields = ["id", "name", "description", "price", "image", "available", "category"]
-
-
-class CategorySerializer(serializers.ModelSerializer): 
-    items = MenuItemSerializer(many=True, read_only=True) 
+class ImageVariantsField(serializers.Field):
+    """
+    A menu item's resized photos (images.py) as URLs, plus a ``srcset`` per
+    format for ``<img srcset>``/``<source srcset>``:
+
+        {"thumb": {"width": 160, "height": 120, "webp": url, "jpeg": url}, ...,
+         "srcset": {"webp": "url 160w, url 480w, ...", "jpeg": "..."}}
+
+    None until they have been generated.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        if not variants or not any(name in variants for name in VARIANTS):
+            return None
+        request = self.context.get("request")
+
+        def url(path):
+            url = default_storage.url(path)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        data = {}
+        srcset = {fmt: {} for fmt in FORMATS}
+        for name in VARIANTS:
+            entry = variants.get(name)
+            if entry is None:
+                continue
+            data[name] = {"width": entry["width"], "height": entry["height"]}
+            for fmt in FORMATS:
+                data[name][fmt] = url(entry[fmt])
+                # Small photos give several variants the same width; list it once
+                srcset[fmt].setdefault(entry["width"], data[name][fmt])
+        data["srcset"] = {
+            fmt: ", ".join(f"{url} {width}w" for width, url in widths.items()) for fmt, widths in srcset.items()
+        }
+        return data
+
+
+def parse_field_paths(value):
+    """
+    ``"id,order_items.quantity,order_items.item"`` ->
+    ``{"id": {}, "order_items": {"quantity": {}, "item": {}}}``; an empty
+    dict means the whole field. Accepts a string or an already parsed dict.
+    """
+    if isinstance(value, dict):
+        return value
+    tree = {}
+    for path in (value or "").split(","):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split("."))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    Lets the caller pick a serializer's fields and expand related ones:
+
+        OrderSerializer(orders, many=True, fields="id,status,subtotal")
+        OrderSerializer(orders, many=True, expand="order_items.item")
+
+    ``fields`` keeps only the listed fields (dotted names reach into nested
+    serializers); ``expand`` swaps a field for the richer serializer in
+    ``expandable_fields``, e.g. an order line's ``item`` id for the menu
+    item. Unknown names are a ``ValidationError`` (a 400 in views). Both
+    come from ``?fields=`` and ``?expand=`` via ``SparseFieldsViewMixin``.
+
+    Also builds ``fast_representation()`` for ``FastListSerializer`` from
+    the selected fields.
+    """
+    # name -> serializer class used for ?expand=name
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.field_paths = parse_field_paths(fields) if fields is not None else None
+        self.expand_paths = parse_field_paths(expand)
+        self.path_prefix = ""
+        super().__init__(*args, **kwargs)
+
+    def select(self, fields, expand, prefix):
+        """Set the nested part of the parent's ``fields``/``expand``."""
+        self.field_paths = fields or None
+        self.expand_paths = expand
+        self.path_prefix = prefix
+
+    def get_fields(self):
+        fields = super().get_fields()
+        unknown = []
+        for name in self.expand_paths:
+            if name in self.expandable_fields:
+                fields[name] = self.expandable_fields[name](read_only=True)
+            elif not isinstance(nested_serializer(fields.get(name)), SparseFieldsMixin):
+                unknown.append(name)
+        if unknown:
+            raise serializers.ValidationError({"expand": [f"Can't expand {self.path_prefix}{name}." for name in unknown]})
+
+        if self.field_paths is not None:
+            unknown = [name for name in self.field_paths if name not in fields]
+            if unknown:
+                raise serializers.ValidationError({"fields": [f"Unknown field {self.path_prefix}{name}." for name in unknown]})
+            fields = {name: field for name, field in fields.items() if name in self.field_paths}
+
+        for name, field in fields.items():
+            nested = nested_serializer(field)
+            if isinstance(nested, SparseFieldsMixin):
+                nested.select(
+                    (self.field_paths or {}).get(name), self.expand_paths.get(name, {}), f"{self.path_prefix}{name}."
+                )
+        return fields
+
+    def selects(self, name):
+        """Whether field ``name`` is in the output."""
+        return name in self.fields
+
+    def model_columns(self):
+        """Names of the concrete model fields the selected fields read
+        directly, for ``QuerySet.only()``."""
+        concrete = {field.name for field in self.Meta.model._meta.concrete_fields}
+        return {
+            field.source_attrs[0] for field in self.fields.values()
+            if field.source_attrs and field.source_attrs[0] in concrete
+        }
+
+    @cached_property
+    def fast_fields(self):
+        return [(name, fast_getter(self, field)) for name, field in self.fields.items() if not field.write_only]
+
+    def fast_representation(self, instance):
+        return {name: get(instance) for name, get in self.fast_fields}
+
+
+def nested_serializer(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+def datetime_formatter(field):
+    """
+    ``field.to_representation`` for a ``DateTimeField``, with the timezone
+    looked up once rather than per value (that lookup is most of the cost).
+    Only ISO 8601 output of aware datetimes, the default, takes the short cut.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if not value or timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return to_representation
+
+
+# Fields whose to_representation() returns model values as they are
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField,
+    serializers.IntegerField, serializers.ReadOnlyField,
+)
+
+
+def fast_getter(serializer, field):
+    """
+    ``instance -> value`` for one field, the same value DRF's
+    ``Serializer.to_representation()`` produces for it, but with the field
+    type resolved once per list instead of once per row.
+    """
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+
+    source = field.source_attrs[0] if len(field.source_attrs) == 1 else None
+    if source is None:
+        if isinstance(field, PASSTHROUGH_FIELDS) and len(field.source_attrs) == 2:
+            # "item.name": None part way along gives None, as in get_attribute()
+            head, tail = map(attrgetter, field.source_attrs)
+            return lambda instance: None if (value := head(instance)) is None else tail(value)
+    elif isinstance(field, PASSTHROUGH_FIELDS):
+        return attrgetter(source)
+    elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return attrgetter(f"{source}_id")
+    elif isinstance(field, serializers.ListSerializer):
+        return lambda instance: field.to_representation(getattr(instance, source))
+    elif isinstance(field, (serializers.DateTimeField, serializers.DecimalField, SparseFieldsMixin)):
+        if isinstance(field, serializers.DateTimeField):
+            convert = datetime_formatter(field)
+        elif isinstance(field, SparseFieldsMixin):
+            convert = field.fast_representation
+        else:
+            convert = field.to_representation
+        return lambda instance: None if (value := getattr(instance, source)) is None else convert(value)
+
+    # Anything else: what Serializer.to_representation() does per field
+    def get(instance):
+        attribute = field.get_attribute(instance)
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+
+    return get
+
+
+class FastListSerializer(serializers.ListSerializer):
+    """
+    Lists (``many=True`` output, i.e. every list endpoint) built with the
+    child's ``fast_representation()``: plain per-field getters producing
+    exactly what ``to_representation()`` would, without DRF walking the
+    fields for every row. Field formatting (decimals, datetimes, URLs) is
+    still done by the child's own field instances, so the output can't
+    drift. Single objects keep the regular path.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        fast_representation = self.child.fast_representation
+        return [fast_representation(instance) for instance in iterable]
+
+
+class CategorySummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """A category without its items, for ``?expand=category``."""
 
     class Meta:
         model = Category
-        fields = ["id", "name", "description", "items"]
+        fields = ["id", "name", "description"]
+        list_serializer_class = FastListSerializer
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    item = MenuItemSerializer(read_only=True)
-    item_id = serializers.PrimaryKeyRelatedField(queryset=MenuItem.objects.all(), source="item", write_only=True)
+class MenuItemSerializer(SparseFieldsMixin, serializers.ModelSerializer): 
+    category = serializers.StringRelatedField() #
+    images = ImageVariantsField(source="image_variants")
+    expandable_fields = {"category": CategorySummarySerializer}
 
     class Meta:
-        model = OrderItem
-        fields = ["id", "item", "item_id", "quantity", "get_total_price"]
+        model = MenuItem
+        fields = ["id", "name", "description", "price", "image", "images", "available", "category"]
+        list_serializer_class = FastListSerializer
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    order_items = OrderItemSerializer(many=True)
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer): 
+    items = MenuItemSerializer(source="menu_items", many=True, read_only=True)
 
     class Meta:
-        model = Order
-        fields = ["id", "customer", "table_number", "order_type", "status", "created_at", "order_items"]
-
-    def create(self, validated_data):
-        items_data = validated_data.pop("order_items")
-        order = Order.objects.create(**validated_data)
-        for item in items_data:
-            OrderItem.objects.create(order=order, **item)
-        return order
-
-
+        model = Category
+        fields = ["id", "name", "description", "items"]
+        list_serializer_class = FastListSerializer
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     item_name = serializers.ReadOnlyField(source="item.name")
-    price = serializers.ReadOnlyField(source="item.price")
+    price = serializers.ReadOnlyField(source="unit_price")
     total_price = serializers.SerializerMethodField()
+    expandable_fields = {"item": MenuItemSerializer}
 
     class Meta:
         model = OrderItem
         fields = ["id", "item", "item_name", "price", "quantity", "total_price"]
+        list_serializer_class = FastListSerializer
 
     def get_total_price(self, obj):
         return obj.get_total_price()
 
 
+class CartQuantitySerializer(serializers.Serializer):
+    # 0 removes the line
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+
+class OrderLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
 
 
-        
 # orders/serializers.py
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True, read_only=True)
+    # Lines to create the order with: [{"item": id, "quantity": n}, ...]
+    items = OrderLineSerializer(many=True, write_only=True, required=False)
     
     class Meta:
         model = Order
-        fields = ["id", "customer", "table_number", "order_type", "status", "order_items", "created_at"]
-        read_only_fields = ["customer"]  # Customer will be set automatically
\ No newline at end of file
+        fields = ["id", "customer", "table_number", "order_type", "status", "order_items", "items",
+                  "subtotal", "item_count", "created_at", "updated_at"]
+        read_only_fields = ["customer", "subtotal", "item_count"]  # Customer will be set automatically
+        list_serializer_class = FastListSerializer
+
+    def validate_items(self, lines):
+        """Resolve the lines to ``(menu_item, quantity)`` pairs with one query."""
+        menu_items = MenuItem.objects.in_bulk({line["item"] for line in lines})
+        missing = sorted({line["item"] for line in lines} - set(menu_items))
+        if missing:
+            raise serializers.ValidationError(f"Items not found: {missing}")
+        return [(menu_items[line["item"]], line["quantity"]) for line in lines]
+
+    def create(self, validated_data):
+        lines = validated_data.pop("items", [])
+        order = super().create(validated_data)
+        if lines:
+            merge_lines(order, lines)
+            order.refresh_totals()
+        return order
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import images
+from .authentication import get_user_cache, user_changed
+from .menu_cache import bump_menu_version
+from .models import Category, MenuItem, User
+from .search import get_search_backend
+
+
+# Registered before the search receivers: the trigram index reads the bumped
+# version once the write commits.
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_menu_cache(sender, **kwargs):
+    # Bump after commit, otherwise a concurrent reader could cache the old
+    # rows under the new version.
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, **kwargs):
+    get_search_backend().on_change([instance.pk])
+
+
+@receiver(post_save, sender=MenuItem)
+def process_menu_item_image(sender, instance, **kwargs):
+    # Resized off the request thread; the job commits with the save.
+    if images.needs_processing(instance):
+        images.queue_processing(instance)
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, **kwargs):
+    get_search_backend().on_change([instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, **kwargs):
+    # Items are searchable by category name.
+    if not created:
+        item_ids = list(instance.menu_items.values_list("id", flat=True))
+        if item_ids:
+            get_search_backend().on_change(item_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        # Ids can be reused (e.g. after a rollback); never serve a stale one.
+        get_user_cache().discard(instance.pk)
+    elif update_fields is None or set(update_fields) - {"last_login"}:
+        user_changed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    user_changed(instance.pk)
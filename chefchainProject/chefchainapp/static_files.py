@@ -0,0 +1,272 @@
+"""
+Static and media file serving.
+
+``FileServingMiddleware`` answers GET/HEAD requests under ``STATIC_URL``
+(from ``STATIC_ROOT``) and ``MEDIA_URL`` (from ``MEDIA_ROOT``) before they
+reach URL routing:
+
+* files whose names carry a content hash (``app.3f2a9c1b7d4e.js`` from
+  collectstatic, the photo variants from images.py) are sent with a one
+  year ``Cache-Control: immutable``, so repeat visits don't even revalidate;
+  anything else gets a short max-age plus ETag/Last-Modified, and a 304
+  when the browser already has it;
+* a precompressed ``.br`` or ``.gz`` sibling is sent instead of the file
+  when the client accepts it (``CompressedManifestStaticFilesStorage``
+  writes them at collectstatic time);
+* single ``Range: bytes=...`` requests get a 206 with just that part;
+* full files go out as a ``FileResponse``, which WSGI servers hand to
+  ``sendfile()`` via ``wsgi.file_wrapper``.
+
+Requests for files that don't exist fall through to the URLconf.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip siblings are written
+    brotli = None
+
+DEFAULTS = {
+    "MEDIA": True,  # serve MEDIA_ROOT as well as STATIC_ROOT
+    "MAX_AGE": 60,  # seconds, for files without a hash in their name
+    "IMMUTABLE_MAX_AGE": 365 * 24 * 60 * 60,
+}
+# name.<12 hex digits>.ext, as written by ManifestStaticFilesStorage and images.py
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".xml", ".ico"}
+# Not worth compressing
+MIN_COMPRESS_SIZE = 200
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "FILE_SERVING", {})}
+
+
+def accepted_encodings(request):
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """``(first, last)`` byte positions for a single ``bytes=`` range, None
+    to ignore the header (malformed or multiple ranges), or ``False`` if it
+    can't be satisfied."""
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        return (max(0, size - length), size - 1) if length and size else False
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or (end and int(end) < first):
+        return False
+    return first, last
+
+
+class FileRange:
+    """A read-only file-like view of ``length`` bytes of ``file`` from
+    ``offset``, for ``FileResponse``."""
+
+    def __init__(self, file, offset, length):
+        file.seek(offset)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class FileServingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.roots = []
+        if settings.STATIC_ROOT:
+            self.roots.append((self.prefix(settings.STATIC_URL), str(settings.STATIC_ROOT)))
+        if get_options()["MEDIA"] and settings.MEDIA_ROOT:
+            self.roots.append((self.prefix(settings.MEDIA_URL), str(settings.MEDIA_ROOT)))
+
+    @staticmethod
+    def prefix(url):
+        return "/" + url.strip("/") + "/"
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD"):
+            for prefix, root in self.roots:
+                if request.path_info.startswith(prefix):
+                    response = self.serve(request, root, request.path_info[len(prefix):])
+                    if response is not None:
+                        return response
+        return self.get_response(request)
+
+    def find(self, root, name):
+        try:
+            path = safe_join(root, name)
+        except SuspiciousFileOperation:  # escapes the root
+            return None, None
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None, None
+        if not os.path.isfile(path):
+            return None, None
+        return path, stat
+
+    def serve(self, request, root, name):
+        path, stat = self.find(root, name)
+        if path is None:
+            return None
+
+        options = get_options()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = {
+            "Last-Modified": http_date(stat.st_mtime),
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+        }
+        if HASHED_NAME.search(name):
+            headers["Cache-Control"] = f"public, max-age={options['IMMUTABLE_MAX_AGE']}, immutable"
+        else:
+            headers["Cache-Control"] = f"public, max-age={options['MAX_AGE']}"
+
+        if self.not_modified(request, etag, stat):
+            response = HttpResponseNotModified()
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        status, offset, length, encoding = 200, 0, stat.st_size, None
+        byte_range = request.META.get("HTTP_RANGE")
+        if byte_range and self.range_applies(request, etag, stat):
+            positions = parse_range(byte_range, stat.st_size)
+            if positions is False:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{stat.st_size}"
+                return response
+            if positions is not None:
+                status, offset = 206, positions[0]
+                length = positions[1] - positions[0] + 1
+                headers["Content-Range"] = f"bytes {positions[0]}-{positions[1]}/{stat.st_size}"
+
+        compressed = {}
+        for coding, suffix in ENCODINGS:
+            found = self.find(root, name + suffix)
+            if found[0] is not None:
+                compressed[coding] = found
+        if status == 200 and compressed:
+            accepted = accepted_encodings(request)
+            encoding = next((coding for coding in compressed if coding in accepted), None)
+            if encoding:
+                path, length = compressed[encoding][0], compressed[encoding][1].st_size
+                headers["ETag"] = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding}"'
+
+        if request.method == "HEAD":
+            response = HttpResponse(status=status, content_type=content_type)
+        elif status == 206:
+            response = FileResponse(FileRange(open(path, "rb"), offset, length), status=status,
+                                    content_type=content_type)
+        else:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+        for header, value in headers.items():
+            response[header] = value
+        response["Content-Length"] = str(length)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if compressed:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    @staticmethod
+    def not_modified(request, etag, stat):
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            # Compressed responses carry the same tag with an encoding suffix
+            tags = [tag.rsplit("-", 1)[0] + '"' if tag.endswith(('-br"', '-gzip"')) else tag
+                    for tag in parse_etags(if_none_match)]
+            return etag in tags or "*" in tags
+        if_modified_since = request.META.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since:
+            try:
+                return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def range_applies(request, etag, stat):
+        """A Range with ``If-Range`` only applies if the file is unchanged."""
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/"')):
+            return if_range == etag
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+def compress(content):
+    """``{suffix: bytes}`` for the encodings that make ``content`` smaller."""
+    results = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        results[".br"] = brotli.compress(content)
+    return {suffix: data for suffix, data in results.items() if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` that also writes ``.gz`` (and ``.br``
+    when brotli is installed) next to each text asset at collectstatic time,
+    so the server never compresses them per request."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                self.write_compressed(name)
+                self.write_compressed(hashed_name)
+            yield name, hashed_name, processed
+
+    def write_compressed(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+            return
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, data in compress(content).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
@@ -1,3 +1,1895 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import FileResponse
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    analytics, exports, feed, images, jobs, menu_cache, payments, search, static_files, throttling, transitions,
+)
+from .authentication import CHANGED_KEY, get_user_cache, reset_user_cache
+from .fake_paystack import FakePaystackServer
+from .models import (
+    Category, DailyItemSales, HourlyStatusCount, Job, MenuItem, Order, OrderEvent, OrderItem, PaymentEvent,
+    RateLimitBucket, User,
+)
+from .paystack import Paystack, PaystackUnavailable, reset_paystack
+from .renderers import ORJSONRenderer
+from .serializers import (
+    CategorySerializer, CustomTokenSerializer, FastListSerializer, MenuItemSerializer, OrderSerializer,
+)
+from .views import OrderStreamView, update_menu_item
+
+
+class OrderFixturesMixin:
+    """Shared helpers for building customers, menu items and orders."""
+
+    def make_menu(self, count=3):
+        category = Category.objects.create(name="Mains")
+        return [
+            MenuItem.objects.create(category=category, name=f"Dish {n}", price=10 + n)
+            for n in range(count)
+        ]
+
+    def make_order(self, customer, items, status="confirmed", quantity=1):
+        order = Order.objects.create(customer=customer, status=status)
+        for item in items:
+            OrderItem.objects.create(order=order, item=item, quantity=quantity)
+        return order
+
+
+class OrderQueryCountTests(OrderFixturesMixin, TestCase):
+    """Order endpoints must cost the same number of queries however many
+    orders and line items they return."""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(6)
+
+    def grow(self):
+        for _ in range(5):
+            self.make_order(self.customer, self.menu)
+
+    def test_order_list_query_count_is_constant(self):
+        self.make_order(self.customer, self.menu[:1])
+        with self.assertNumQueries(3):
+            self.client.get(reverse("order-list"))
+        self.grow()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("order-list"))
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_order_history_query_count_is_constant(self):
+        self.make_order(self.customer, self.menu[:1])
+        with self.assertNumQueries(3):
+            self.client.get(reverse("order-history"))
+        self.grow()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("order-history"))
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_order_detail_query_count_is_constant(self):
+        small = self.make_order(self.customer, self.menu[:1])
+        large = self.make_order(self.customer, self.menu, quantity=4)
+        with self.assertNumQueries(2):
+            self.client.get(reverse("order-detail", args=[small.pk]))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("order-detail", args=[large.pk]))
+        self.assertEqual(len(response.data["order_items"]), 6)
+
+    def test_order_create_query_count_is_constant(self):
+        def create(menu):
+            lines = [{"item": item.pk, "quantity": 2} for item in menu]
+            # The sales rollups upsert a row per dish sold, by design; leave them out
+            with mock.patch("chefchainapp.rollups.apply"), CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse("order-create"), {"table_number": "3", "items": lines}, format="json")
+            self.assertEqual(response.status_code, 201)
+            return response, len(queries)
+
+        _, small = create(self.menu[:1])
+        response, large = create(self.menu + self.menu[:2])
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data["order_items"]), 6)
+        self.assertEqual(response.data["item_count"], 16)
+        self.assertEqual(Decimal(response.data["subtotal"]), sum(2 * item.price for item in self.menu + self.menu[:2]))
+
+    def test_order_create_rejects_unknown_items(self):
+        response = self.client.post(
+            reverse("order-create"), {"items": [{"item": self.menu[0].pk}, {"item": 999}]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999", str(response.data["items"]))
+        self.assertFalse(Order.objects.exists())
+
+    def test_cart_query_count_is_constant(self):
+        cart = self.make_order(self.customer, self.menu[:1], status="pending")
+        with self.assertNumQueries(2):
+            self.client.get(reverse("cart-detail"))
+        for item in self.menu[1:]:
+            OrderItem.objects.create(order=cart, item=item)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("cart-detail"))
+        self.assertEqual(len(response.data["order_items"]), 6)
+
+
+class KitchenQueueTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user(username="chef", password="pass", role="chef")
+        self.client = APIClient()
+        self.client.force_authenticate(self.chef)
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.jollof, self.waakye = self.make_menu(2)
+        drinks = Category.objects.create(name="Drinks")
+        self.sobolo = MenuItem.objects.create(category=drinks, name="Sobolo", price=3)
+
+    def test_only_open_orders_grouped_by_status(self):
+        confirmed = self.make_order(self.customer, [self.jollof], status="confirmed")
+        preparing = self.make_order(self.customer, [self.waakye], status="preparing")
+        self.make_order(self.customer, [self.jollof], status="delivered")
+        self.make_order(self.customer, [self.jollof], status="pending")
+
+        data = self.client.get(reverse("kitchen-queue")).data
+        self.assertEqual(data["counts"], {"confirmed": 1, "preparing": 1, "ready": 0})
+        self.assertEqual([t["id"] for t in data["tickets"]["confirmed"]], [confirmed.pk])
+        self.assertEqual([t["id"] for t in data["tickets"]["preparing"]], [preparing.pk])
+
+    def test_item_quantities_are_summed_per_station(self):
+        for quantity in (4, 10):
+            self.make_order(self.customer, [self.jollof, self.sobolo], quantity=quantity)
+        self.make_order(self.customer, [self.waakye], quantity=2)
+        self.make_order(self.customer, [self.jollof], status="delivered", quantity=50)
+
+        stations = self.client.get(reverse("kitchen-queue")).data["stations"]
+        self.assertEqual(stations["confirmed"], [
+            {"category_id": self.sobolo.category_id, "category": "Drinks", "items": [
+                {"item_id": self.sobolo.pk, "name": "Sobolo", "quantity": 14, "orders": 2},
+            ]},
+            {"category_id": self.jollof.category_id, "category": "Mains", "items": [
+                {"item_id": self.jollof.pk, "name": "Dish 0", "quantity": 14, "orders": 2},
+                {"item_id": self.waakye.pk, "name": "Dish 1", "quantity": 2, "orders": 1},
+            ]},
+        ])
+        self.assertEqual(stations["ready"], [])
+
+    def test_query_count_is_constant(self):
+        # Orders, their line items, and the per-item totals
+        self.make_order(self.customer, [self.jollof])
+        with self.assertNumQueries(3):
+            self.client.get(reverse("kitchen-queue"))
+        for _ in range(5):
+            self.make_order(self.customer, [self.jollof, self.waakye, self.sobolo], status="preparing")
+        with self.assertNumQueries(3):
+            self.client.get(reverse("kitchen-queue"))
+
+
+
+class TokenAuthenticationTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        caches["auth"].clear()
+        reset_user_cache()
+        self.addCleanup(reset_user_cache)
+        self.menu = self.make_menu(1)
+        self.boss = User.objects.create_user(username="boss", password="pass", role="admin")
+        self.make_order(self.boss, self.menu)
+        self.client = APIClient()
+
+    def login(self, user):
+        token = CustomTokenSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_read_only_views_skip_the_user_query(self):
+        self.login(self.boss)
+        with self.assertNumQueries(3):  # orders, line items, station totals
+            self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 200)
+
+    def test_tokens_without_claims_load_the_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.boss)}")
+        with self.assertNumQueries(4):
+            self.client.get(reverse("kitchen-queue"))
+        with self.assertNumQueries(3):  # then it's cached
+            self.client.get(reverse("kitchen-queue"))
+
+    def test_other_views_cache_the_user(self):
+        self.login(self.boss)
+        url = reverse("cart-add")
+        user_queries = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {"item": self.menu[0].pk}, format="json")
+            user_queries.append([q for q in queries.captured_queries if 'FROM "chefchainapp_user"' in q["sql"]])
+        self.assertEqual(response.data["order_items"][0]["quantity"], 2)
+        self.assertEqual([len(queries) for queries in user_queries], [1, 0])
+
+    def test_role_change_and_deactivation_apply_immediately(self):
+        self.login(self.boss)
+        self.assertEqual(self.client.get(reverse("analytics-sales")).status_code, 200)
+        self.client.post(reverse("cart-add"), {"item": self.menu[0].pk}, format="json")  # cached now
+
+        self.boss.role = "customer"
+        self.boss.save()
+        self.assertEqual(self.client.get(reverse("analytics-sales")).status_code, 403)
+
+        self.boss.is_active = False
+        self.boss.save()
+        self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 401)
+        self.assertEqual(self.client.post(reverse("cart-add"), {"item": self.menu[0].pk}).status_code, 401)
+
+    def test_changes_in_another_worker_apply_immediately(self):
+        self.login(self.boss)
+        self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 200)
+        # Another worker deactivates the user, through its own cache client
+        User.objects.filter(pk=self.boss.pk).update(is_active=False)
+        caches.create_connection("auth").set(CHANGED_KEY.format(self.boss.pk), time.time())
+        self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE={**settings.AUTH_USER_CACHE, "CACHE": "default"})
+    def test_per_process_changes_expire_the_claims(self):
+        caches["default"].clear()
+        self.login(self.boss)
+        self.boss.is_active = False
+        self.boss.save()
+        caches["default"].clear()  # another worker, which never saw the change
+        self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 200)
+        later = time.time() + get_user_cache().ttl + 1
+        with mock.patch("chefchainapp.authentication.time.time", return_value=later):
+            self.assertEqual(self.client.get(reverse("kitchen-queue")).status_code, 401)
+
+
+class OrderTotalsTests(OrderFixturesMixin, TestCase):
+    """Stored order totals track line item changes and survive menu edits."""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="kofi", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(2)
+
+    def test_cart_changes_update_stored_totals(self):
+        self.client.post(reverse("cart-add"), {"item": self.menu[0].pk, "quantity": 2})
+        response = self.client.post(reverse("cart-add"), {"item": self.menu[1].pk, "quantity": 1})
+        self.assertEqual(response.data["subtotal"], "31.00")
+        self.assertEqual(response.data["item_count"], 3)
+
+        line = OrderItem.objects.get(item=self.menu[0])
+        response = self.client.patch(reverse("cart-item-update", args=[line.pk]), {"quantity": 0})
+        self.assertEqual(response.data["subtotal"], "11.00")
+        self.assertEqual(response.data["item_count"], 1)
+
+    def test_invalid_cart_quantity_is_rejected(self):
+        self.client.post(reverse("cart-add"), {"item": self.menu[0].pk, "quantity": 2})
+        line = OrderItem.objects.get(item=self.menu[0])
+        for quantity in ("two", "1.5", -1, None):
+            response = self.client.patch(
+                reverse("cart-item-update", args=[line.pk]), {"quantity": quantity}, format="json")
+            self.assertEqual(response.status_code, 400, quantity)
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 2)
+
+    def test_menu_price_change_does_not_alter_past_orders(self):
+        order = self.make_order(self.customer, self.menu, quantity=2)
+        order.refresh_totals()
+        MenuItem.objects.filter(pk=self.menu[0].pk).update(price=99)
+
+        response = self.client.get(reverse("order-detail", args=[order.pk]))
+        self.assertEqual(response.data["subtotal"], "42.00")
+        self.assertEqual(response.data["order_items"][0]["total_price"], 20)
+
+    def test_backfill_command_snapshots_prices_and_totals(self):
+        order = self.make_order(self.customer, self.menu, quantity=3)
+        OrderItem.objects.update(unit_price=None)
+        Order.objects.update(subtotal=0, item_count=0)
+
+        call_command("backfill_order_totals", stdout=StringIO())
+
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, 63)
+        self.assertEqual(order.item_count, 6)
+        self.assertFalse(OrderItem.objects.filter(unit_price__isnull=True).exists())
+
+
+class OrderFeedTests(OrderFixturesMixin, TestCase):
+    """Order changes reach the live feed and the SSE stream replays them."""
+
+    def setUp(self):
+        feed.reset_channel_layer()
+        self.layer = feed.get_channel_layer()
+        self.customer = User.objects.create_user(username="esi", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(1)
+
+    def open_stream(self, **headers):
+        token = AccessToken.for_user(self.customer)
+        client = APIClient()
+        response = client.get(reverse("order-stream"), {"token": str(token)}, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return iter(response.streaming_content)
+
+    def test_order_create_publishes_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("order-create"), {"table_number": "4"})
+        event = self.layer.events_after(0)[-1]
+        self.assertEqual(event.type, "order.created")
+        self.assertEqual(json.loads(event.data)["id"], response.data["id"])
+
+    def test_order_update_publishes_status_change(self):
+        order = self.make_order(self.customer, self.menu)
+        self.client.force_authenticate(User.objects.create_user(username="chef", password="pass", role="chef"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse("order-update", args=[order.pk]), {"status": "preparing"})
+        event = self.layer.events_after(0)[-1]
+        self.assertEqual(event.type, "order.updated")
+        self.assertEqual(json.loads(event.data), {"id": order.pk, "status": "preparing"})
+
+    def test_admin_status_action_publishes_events(self):
+        orders = [self.make_order(self.customer, self.menu) for _ in range(2)]
+        admin_user = User.objects.create_superuser(username="boss", password="pass")
+        self.client.force_login(admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin:chefchainapp_order_changelist"), {
+                "action": "mark_as_preparing",
+                "_selected_action": [order.pk for order in orders],
+            })
+        published = {json.loads(event.data)["id"] for event in self.layer.events_after(0)}
+        self.assertEqual(published, {order.pk for order in orders})
+
+    def test_stream_resumes_after_last_event_id(self):
+        for n in range(3):
+            self.layer.publish("order.updated", {"id": n})
+        stream = self.open_stream(HTTP_LAST_EVENT_ID="1")
+        self.assertEqual(next(stream), b"retry: 3000\n\n")
+        chunk = next(stream).decode()
+        self.assertNotIn("id: 1\n", chunk)
+        self.assertIn('id: 2\nevent: order.updated\ndata: {"id":1}\n\n', chunk)
+        self.assertIn("id: 3\n", chunk)
+
+    @override_settings(ORDER_FEED={"OPTIONS": {"buffer_size": 2}})
+    def test_stream_sends_reset_when_client_fell_behind(self):
+        feed.reset_channel_layer()
+        layer = feed.get_channel_layer()
+        for n in range(5):
+            layer.publish("order.updated", {"id": n})
+        stream = self.open_stream(HTTP_LAST_EVENT_ID="1")
+        next(stream)
+        self.assertEqual(next(stream), b"id: 5\nevent: reset\ndata: {}\n\n")
+
+    def test_stream_sends_reset_after_a_restart(self):
+        feed.reset_channel_layer()  # the restarted process starts from id 0
+        layer = feed.get_channel_layer()
+        self.assertIsNone(layer.events_after(500))
+        stream = self.open_stream(HTTP_LAST_EVENT_ID="500")
+        next(stream)
+        self.assertEqual(next(stream), b"id: 0\nevent: reset\ndata: {}\n\n")
+        layer.publish("order.updated", {"id": 1})
+        self.assertIn(b"id: 1\nevent: order.updated", next(stream))
+
+    def test_sync_stream_closes_after_its_lifetime(self):
+        self.layer.publish("order.updated", {"id": 1})
+        view = OrderStreamView()
+        view.sync_lifetime = 0.2
+        started = time.monotonic()
+        chunks = list(view.sync_stream(self.layer, self.layer.last_id))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(chunks[0], "retry: 3000\n\n")
+        self.assertEqual(chunks[-1], "id: 1\n\n")
+
+        # The reconnect picks up what was published in between
+        self.layer.publish("order.updated", {"id": 2})
+        stream = self.open_stream(HTTP_LAST_EVENT_ID="1")
+        next(stream)
+        self.assertIn(b'id: 2\nevent: order.updated\ndata: {"id":2}', next(stream))
+
+    def test_async_stream_wakes_on_publish(self):
+        async def first_event():
+            stream = OrderStreamView().async_stream(self.layer, self.layer.last_id)
+            await stream.__anext__()
+            threading.Timer(0.05, self.layer.publish, ("order.updated", {"id": 7})).start()
+            return await asyncio.wait_for(stream.__anext__(), timeout=5)
+
+        chunk = async_to_sync(first_event)()
+        self.assertIn('data: {"id":7}', chunk)
+
+
+class OrderTransitionTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.chef = User.objects.create_user(username="chef", password="pass", role="chef")
+        self.rider = User.objects.create_user(username="rider", password="pass", role="rider")
+        self.menu = self.make_menu(1)
+        self.client = APIClient()
+
+    def move(self, user, ids, status, **extra):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("order-transition"), {"ids": ids, "status": status, **extra}, format="json")
+
+    def test_ids_must_be_a_list(self):
+        orders = [self.make_order(self.customer, self.menu) for _ in range(2)]
+        for ids in (f"{orders[0].pk}{orders[1].pk}", orders[0].pk, {"id": orders[0].pk}):
+            self.assertEqual(self.move(self.chef, ids, "preparing").status_code, 400, ids)
+        self.assertFalse(Order.objects.filter(status="preparing").exists())
+
+    def test_bulk_transition_moves_eligible_orders_and_logs_them(self):
+        confirmed = [self.make_order(self.customer, self.menu) for _ in range(3)]
+        ready = self.make_order(self.customer, self.menu, status="ready")
+        ids = [order.pk for order in confirmed] + [ready.pk, 9999]
+
+        # savepoint, select, update, insert events, hourly rollup (update,
+        # then savepoint/insert/release for the hour's first change), release
+        with self.assertNumQueries(9):
+            response = self.move(self.chef, ids, "preparing")
+        self.assertEqual(response.data["moved"], [order.pk for order in confirmed])
+        self.assertEqual(response.data["skipped"], {ready.pk: "ready", 9999: None})
+        self.assertEqual(Order.objects.filter(status="preparing").count(), 3)
+
+        events = OrderEvent.objects.order_by("order_id")
+        self.assertEqual(
+            [(e.order_id, e.from_status, e.to_status, e.actor) for e in events],
+            [(order.pk, "confirmed", "preparing", self.chef) for order in confirmed],
+        )
+
+    def test_from_status_guards_against_concurrent_changes(self):
+        order = self.make_order(self.customer, self.menu, status="preparing")
+        response = self.move(self.chef, [order.pk], "cancelled", **{"from": "confirmed"})
+        self.assertEqual(response.data, {"moved": [], "skipped": {order.pk: "preparing"}})
+
+    def test_roles_limit_transitions(self):
+        order = self.make_order(self.customer, self.menu, status="ready")
+        self.assertEqual(self.move(self.chef, [order.pk], "delivered").status_code, 403)
+        self.assertEqual(self.move(self.customer, [order.pk], "delivered").status_code, 403)
+        self.assertEqual(self.move(self.rider, [order.pk], "delivered").data["moved"], [order.pk])
+        # Only admins may cancel an order that is already being prepared
+        cooking = self.make_order(self.customer, self.menu, status="preparing")
+        self.assertEqual(self.move(self.chef, [cooking.pk], "cancelled").data["moved"], [])
+        admin_user = User.objects.create_user(username="boss", password="pass", role="admin")
+        self.assertEqual(self.move(admin_user, [cooking.pk], "cancelled").data["moved"], [cooking.pk])
+
+    def test_patch_goes_through_the_state_machine(self):
+        order = self.make_order(self.customer, self.menu)
+        self.client.force_authenticate(self.chef)
+        url = reverse("order-update", args=[order.pk])
+        self.assertEqual(self.client.patch(url, {"status": "delivered"}).status_code, 400)
+        self.assertEqual(self.client.patch(url, {"status": "Completed"}).status_code, 400)
+        response = self.client.patch(url, {"status": "preparing", "table_number": "7"})
+        self.assertEqual((response.data["status"], response.data["table_number"]), ("preparing", "7"))
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.patch(url, {"status": "ready"}).status_code, 403)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "preparing")
+
+    def test_checkout_logs_confirmation(self):
+        order = self.make_order(self.customer, self.menu, status="pending")
+        self.client.force_authenticate(self.customer)
+        self.client.post(reverse("order-create"), {"order_type": "takeaway"}, format="json")
+        event = OrderEvent.objects.get(order=order)
+        self.assertEqual((event.from_status, event.to_status, event.actor), ("pending", "confirmed", self.customer))
+
+    def test_admin_actions_use_valid_statuses(self):
+        orders = [self.make_order(self.customer, self.menu) for _ in range(2)]
+        self.client.force_login(User.objects.create_superuser(username="boss", password="pass"))
+        self.client.post(reverse("admin:chefchainapp_order_changelist"), {
+            "action": "mark_as_cancelled",
+            "_selected_action": [order.pk for order in orders],
+        })
+        self.assertEqual(set(Order.objects.values_list("status", flat=True)), {"cancelled"})
+        self.assertEqual(OrderEvent.objects.filter(to_status="cancelled").count(), 2)
+
+    def test_events_are_append_only(self):
+        order = self.make_order(self.customer, self.menu)
+        event = OrderEvent.objects.create(order=order, from_status="pending", to_status="confirmed")
+        event.to_status = "delivered"
+        with self.assertRaises(ValueError):
+            event.save()
+
+
+@override_settings(THROTTLING={
+    "STORE": "local",
+    "RATES": {"login": "3/min", "menu": "5/min"},
+    "CONCURRENCY": {"auth": 2},
+    "CONCURRENCY_WAIT": 0,
+})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        throttling.reset_throttling()
+        self.addCleanup(throttling.reset_throttling)
+        self.user = User.objects.create_user(username="kofi", password="pass")
+        self.boss = User.objects.create_user(username="boss", password="pass", role="admin")
+        self.client = APIClient()
+
+    def login(self, **extra):
+        return self.client.post(reverse("token_obtain_pair"), {"username": "kofi", "password": "pass"}, **extra)
+
+    def test_login_is_limited_per_ip(self):
+        self.assertEqual([self.login().status_code for _ in range(4)], [200, 200, 200, 429])
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.login(REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    def test_forwarded_for_is_not_trusted_without_proxies(self):
+        statuses = [self.login(HTTP_X_FORWARDED_FOR=f"203.0.113.{n}").status_code for n in range(5)]
+        self.assertEqual(statuses, [200, 200, 200, 429, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_forwarded_for_is_used_behind_a_proxy(self):
+        statuses = [self.login(HTTP_X_FORWARDED_FOR=f"203.0.113.{n}").status_code for n in range(5)]
+        self.assertEqual(statuses, [200] * 5)
+
+    def test_menu_is_limited_per_user(self):
+        url = reverse("category-list")
+        self.assertEqual([self.client.get(url).status_code for _ in range(6)], [200] * 5 + [429])
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_auth_requests_are_shed_when_busy(self):
+        limiter = throttling.get_limiter("auth")
+        for _ in range(2):
+            self.assertTrue(limiter.acquire(timeout=0))
+        response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+        limiter.release()
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(limiter.in_flight, 1)  # the request gave its slot back
+
+    def test_metrics_count_rejections(self):
+        for _ in range(4):
+            self.login()
+        self.client.force_authenticate(self.boss)
+        response = self.client.get(reverse("analytics-throttling"))
+        self.assertEqual(response.data["login"], {"throttled": 1, "shed": 0, "in_flight": 0})
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse("analytics-throttling")).status_code, 403)
+
+    def test_database_store_shares_buckets(self):
+        first, second = throttling.DatabaseBucketStore(), throttling.DatabaseBucketStore()
+        self.assertTrue(first.take("login:1.2.3.4", 2, 1 / 60)[0])
+        self.assertTrue(second.take("login:1.2.3.4", 2, 1 / 60)[0])
+        allowed, wait = first.take("login:1.2.3.4", 2, 1 / 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 60, delta=1)
+        self.assertEqual(RateLimitBucket.objects.count(), 1)
+
+
+class PrepTimeAnalyticsTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.menu = self.make_menu(2)
+        self.start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+    def make_timeline(self, items, ready_after, delivered_after=None):
+        order = self.make_order(self.customer, items, status="delivered" if delivered_after else "ready")
+        steps = [("confirmed", 0), ("preparing", 1), ("ready", ready_after)]
+        if delivered_after:
+            steps.append(("delivered", ready_after + delivered_after))
+        OrderEvent.objects.bulk_create(
+            OrderEvent(order=order, to_status=status, created_at=self.start + timedelta(minutes=offset))
+            for status, offset in steps
+        )
+        return order
+
+    def test_percentiles_interpolate_like_numpy(self):
+        self.assertEqual(analytics.percentiles([1, 2, 3, 4]), {"p50": 2.5, "p90": 3.7, "p99": 3.97})
+        self.assertEqual(analytics.percentiles([]), {"p50": None, "p90": None, "p99": None})
+
+    def test_report_covers_stages_hours_and_items(self):
+        slow, fast = self.menu
+        for minutes in (10, 20, 30):
+            self.make_timeline([fast], minutes, delivered_after=5)
+        self.make_timeline([slow, fast], 60)
+
+        start, end = analytics.date_range(days=3)
+        report = analytics.prep_time_report(start, end)
+
+        self.assertEqual(report["orders"], 4)
+        prep = report["stages"]["confirm_to_ready"]
+        self.assertEqual((prep["count"], prep["p50"], prep["mean"]), (4, 25 * 60, 30 * 60))
+        self.assertEqual(report["stages"]["ready_to_delivered"]["p99"], 5 * 60)
+        self.assertEqual(report["stages"]["confirm_to_delivered"]["count"], 3)
+
+        hour = timezone.localtime(self.start).hour
+        self.assertEqual(report["by_hour"][hour]["orders"], 4)
+        self.assertEqual(sum(row["orders"] for row in report["by_hour"]), 4)
+
+        self.assertEqual([item["name"] for item in report["items"]], [slow.name, fast.name])
+        self.assertEqual(report["items"][0]["slowdown"], 30 * 60)
+
+    def test_range_excludes_orders_confirmed_outside_it(self):
+        self.make_timeline(self.menu, 15)
+        start, end = analytics.date_range(end=timezone.localdate() - timedelta(days=5), days=1)
+        self.assertEqual(analytics.prep_time_report(start, end)["orders"], 0)
+
+    def test_api_is_for_managers(self):
+        self.make_timeline(self.menu, 15)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get(reverse("analytics-prep-times")).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username="boss", password="pass", role="admin"))
+        response = client.get(reverse("analytics-prep-times"), {"start": "2020-13-01"})
+        self.assertEqual(response.status_code, 400)
+        with self.assertNumQueries(3):  # order timelines, their items, dish names
+            response = client.get(reverse("analytics-prep-times"))
+        self.assertEqual(response.data["stages"]["confirm_to_ready"]["p50"], 15 * 60)
+
+    def test_command_prints_report(self):
+        self.make_timeline(self.menu, 15, delivered_after=5)
+        out = StringIO()
+        call_command("prep_time_report", "--days", "3", stdout=out)
+        self.assertIn("confirm_to_ready", out.getvalue())
+        self.assertIn(self.menu[0].name, out.getvalue())
+
+        out = StringIO()
+        call_command("prep_time_report", "--start", "2026-10-01", "--end", "2026-10-07", stdout=out)
+        self.assertIn("confirmed 2026-10-01 to 2026-10-07\n", out.getvalue())
+
+
+class SalesRollupTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.chef = User.objects.create_user(username="chef", password="pass", role="chef")
+        self.menu = self.make_menu(2)  # priced 10 and 11
+        self.client = APIClient()
+
+    def checkout(self, quantity=2, order_type="takeaway"):
+        cart = self.make_order(self.customer, self.menu, status="pending", quantity=quantity)
+        cart.refresh_totals()
+        self.client.force_authenticate(self.customer)
+        self.client.post(reverse("order-create"), {"order_type": order_type}, format="json")
+        return cart
+
+    def sales(self):
+        return sorted(DailyItemSales.objects.values_list("day", "item__name", "order_type", "orders", "quantity", "revenue"))
+
+    def hourly(self):
+        return sorted(HourlyStatusCount.objects.values_list("hour", "status", "orders", "revenue"))
+
+    def test_admin_status_change_counts_the_edited_lines(self):
+        order = self.make_order(self.customer, self.menu[:1], status="pending")
+        line = order.order_items.get()
+        admin_user = User.objects.create_superuser(username="boss", password="pass")
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse("admin:chefchainapp_order_change", args=[order.pk]), {
+            "customer": self.customer.pk, "order_type": "takeaway", "status": "confirmed",
+            "subtotal": "0", "item_count": "0",
+            "order_items-TOTAL_FORMS": "2", "order_items-INITIAL_FORMS": "1",
+            "order_items-0-id": line.pk, "order_items-0-order": order.pk,
+            "order_items-0-item": self.menu[0].pk, "order_items-0-quantity": "3",
+            "order_items-1-order": order.pk, "order_items-1-item": self.menu[1].pk, "order_items-1-quantity": "2",
+            "events-TOTAL_FORMS": "0", "events-INITIAL_FORMS": "0",
+        })
+        self.assertEqual(response.status_code, 302)
+        today = timezone.localdate()
+        self.assertEqual(self.sales(), [
+            (today, "Dish 0", "takeaway", 1, 3, Decimal("30.00")),
+            (today, "Dish 1", "takeaway", 1, 2, Decimal("22.00")),
+        ])
+        self.assertEqual(self.hourly()[-1][2:], (1, Decimal("52.00")))
+
+    def test_confirming_and_cancelling_update_rollups(self):
+        order = self.checkout()
+        self.checkout(quantity=1, order_type="dine_in")
+        today = timezone.localdate()
+        self.assertEqual(self.sales(), [
+            (today, "Dish 0", "dine_in", 1, 1, Decimal("10.00")),
+            (today, "Dish 0", "takeaway", 1, 2, Decimal("20.00")),
+            (today, "Dish 1", "dine_in", 1, 1, Decimal("11.00")),
+            (today, "Dish 1", "takeaway", 1, 2, Decimal("22.00")),
+        ])
+        self.assertEqual(HourlyStatusCount.objects.get(status="confirmed").orders, 2)
+
+        self.client.force_authenticate(self.chef)
+        self.client.post(reverse("order-transition"), {"ids": [order.pk], "status": "cancelled"}, format="json")
+        self.assertEqual([row[-3:] for row in self.sales() if row[2] == "takeaway"], [(0, 0, 0), (0, 0, 0)])
+        cancelled = HourlyStatusCount.objects.get(status="cancelled")
+        self.assertEqual((cancelled.orders, cancelled.revenue), (1, Decimal("42.00")))
+
+        # Moving on through the kitchen doesn't count the sale again
+        self.client.post(reverse("order-transition"), {"ids": [order.pk + 1], "status": "preparing"}, format="json")
+        self.assertEqual(sum(row[4] for row in self.sales()), 2)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        first = self.checkout()
+        self.checkout(quantity=3, order_type="delivery")
+        self.client.force_authenticate(self.chef)
+        self.client.post(reverse("order-transition"), {"ids": [first.pk], "status": "cancelled"}, format="json")
+        sales = [row for row in self.sales() if row[4]]
+        hourly = self.hourly()
+
+        out = StringIO()
+        call_command("rebuild_sales_rollups", "--chunk-size", "1", stdout=out)
+        self.assertEqual(self.sales(), sales)
+        self.assertEqual(self.hourly(), hourly)
+        self.assertIn("Rebuilt 2 daily sales row(s)", out.getvalue())
+
+    def test_sales_report_reads_rollups(self):
+        self.checkout()
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get(reverse("analytics-sales")).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username="boss", password="pass", is_staff=True))
+        with self.assertNumQueries(3):  # by day, by order type, by dish
+            response = client.get(reverse("analytics-sales"), {"start": str(timezone.localdate() - timedelta(days=6))})
+        self.assertEqual(len(response.data["days"]), 7)
+        self.assertEqual(response.data["sales"], Decimal("42.00"))
+        self.assertEqual(response.data["days"][-1]["units"], 4)
+        self.assertEqual(response.data["order_types"], [{"order_type": "takeaway", "sales": Decimal("42.00"), "units": 4}])
+        self.assertEqual([item["name"] for item in response.data["items"]], ["Dish 1", "Dish 0"])
+
+
+class OrderExportTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass", email="ama@example.com")
+        self.menu = self.make_menu(2)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="boss", password="pass", role="admin"))
+
+    def export(self, **params):
+        response = self.client.get(reverse("order-export"), params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_line_item(self):
+        order = self.make_order(self.customer, self.menu, quantity=2)
+        self.make_order(self.customer, self.menu[:1], status="pending")
+        response = self.client.get(reverse("order-export"))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        with self.assertNumQueries(1):
+            lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(lines[0].split(","), exports.CSV_HEADER)
+        self.assertEqual(len(lines), 3)
+        row = dict(zip(exports.CSV_HEADER, lines[1].split(",")))
+        self.assertEqual(
+            (row["order_id"], row["customer_email"], row["item"], row["quantity"], row["line_total"]),
+            (str(order.pk), "ama@example.com", "Dish 0", "2", "20.00"),
+        )
+
+    def test_csv_cells_cannot_run_as_formulas(self):
+        customer = User.objects.create_user(username="=HYPERLINK(\"http://x\")", password="pass")
+        order = self.make_order(customer, self.menu[:1])
+        Order.objects.filter(pk=order.pk).update(table_number="-2+3")
+        row = next(csv.DictReader(io.StringIO(self.export())))
+        self.assertEqual((row["customer"], row["table_number"]), ("'=HYPERLINK(\"http://x\")", "'-2+3"))
+        self.assertEqual(row["subtotal"], "0.00")
+
+    def test_ndjson_has_an_object_per_order(self):
+        orders = [self.make_order(self.customer, self.menu), self.make_order(self.customer, [])]
+        exported = [json.loads(line) for line in self.export(format="ndjson").splitlines()]
+        self.assertEqual([order["order_id"] for order in exported], [order.pk for order in orders])
+        self.assertEqual([item["item"] for item in exported[0]["items"]], ["Dish 0", "Dish 1"])
+        self.assertEqual(exported[0]["items"][1]["line_total"], "11.00")
+        self.assertEqual(exported[1]["items"], [])
+
+    def test_filters(self):
+        old = self.make_order(self.customer, self.menu)
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        cancelled = self.make_order(self.customer, self.menu, status="cancelled")
+        self.make_order(self.customer, self.menu)
+
+        def order_ids(**params):
+            return {json.loads(line)["order_id"] for line in self.export(format="ndjson", **params).splitlines()}
+
+        self.assertNotIn(old.pk, order_ids())
+        self.assertIn(old.pk, order_ids(start=str(timezone.localdate() - timedelta(days=45))))
+        self.assertEqual(order_ids(status="cancelled"), {cancelled.pk})
+        self.assertEqual(self.client.get(reverse("order-export"), {"status": "lost"}).status_code, 400)
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(reverse("order-export")).status_code, 403)
+
+    def test_command(self):
+        order = self.make_order(self.customer, self.menu)
+        out = StringIO()
+        call_command("export_orders", "--format", "ndjson", "--status", "confirmed", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["order_id"], order.pk)
+
+
+class OrderSyncTests(OrderFixturesMixin, TestCase):
+    """Cursor pagination and ``?since=`` incremental sync on order lists."""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="yaw", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(1)
+        self.orders = [self.make_order(self.customer, self.menu) for _ in range(5)]
+
+    def test_since_returns_only_changed_orders(self):
+        sync = self.client.get(reverse("order-list")).data["sync"]
+        response = self.client.get(reverse("order-list"), {"since": sync})
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["sync"], sync)
+
+        changed = self.orders[1]
+        chef = APIClient()
+        chef.force_authenticate(User.objects.create_user(username="chef", password="pass", role="chef"))
+        chef.patch(reverse("order-update", args=[changed.pk]), {"status": "preparing"})
+        created = self.make_order(self.customer, self.menu)
+
+        response = self.client.get(reverse("order-list"), {"since": sync})
+        ids = [order["id"] for order in response.data["results"]]
+        self.assertEqual(ids, [changed.pk, created.pk])
+        self.assertFalse(response.data["has_more"])
+
+        response = self.client.get(reverse("order-list"), {"since": response.data["sync"]})
+        self.assertEqual(response.data["results"], [])
+
+    def test_since_pages_through_changes(self):
+        seen = []
+        cursor = ""
+        while True:
+            data = self.client.get(reverse("order-history"), {"since": cursor, "page_size": 2}).data
+            seen += [order["id"] for order in data["results"]]
+            cursor = data["sync"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(seen, [order.pk for order in self.orders])
+
+    def test_since_includes_changes_committed_late(self):
+        sync = self.client.get(reverse("order-history")).data["sync"]
+        # Stamped before the last change served, but committed after it
+        late = self.make_order(self.customer, self.menu)
+        Order.objects.filter(pk=late.pk).update(updated_at=self.orders[-1].updated_at - timedelta(seconds=1))
+
+        response = self.client.get(reverse("order-history"), {"since": sync})
+        self.assertEqual([order["id"] for order in response.data["results"]], [late.pk])
+        response = self.client.get(reverse("order-history"), {"since": response.data["sync"]})
+        self.assertEqual(response.data["results"], [])
+
+    def test_history_sync_includes_cancellations(self):
+        sync = self.client.get(reverse("order-history")).data["sync"]
+        cancelled = self.orders[2]
+        transitions.transition([cancelled.pk], "cancelled", User.objects.create_user(username="boss", role="admin"))
+        self.assertNotIn(cancelled.pk, [order["id"] for order in self.client.get(reverse("order-history")).data["results"]])
+
+        response = self.client.get(reverse("order-history"), {"since": sync})
+        self.assertEqual([(order["id"], order["status"]) for order in response.data["results"]], [(cancelled.pk, "cancelled")])
+
+    def test_invalid_since_cursor_is_rejected(self):
+        response = self.client.get(reverse("order-list"), {"since": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_pages_do_not_shift_when_orders_arrive(self):
+        first = self.client.get(reverse("order-list"), {"page_size": 3}).data
+        self.make_order(self.customer, self.menu)
+        second = self.client.get(first["next"]).data
+        ids = [order["id"] for order in first["results"] + second["results"]]
+        self.assertEqual(ids, [order.pk for order in reversed(self.orders)])
+
+
+class MenuCacheTests(OrderFixturesMixin, TestCase):
+    """Menu endpoints serve from cache until a write bumps the menu version."""
+
+    def setUp(self):
+        menu_cache.clear_menu_cache()
+        self.client = APIClient()
+        self.menu = self.make_menu(3)
+        self.category = self.menu[0].category
+
+    def assert_refreshed(self, url, write):
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        fresh = self.client.get(url)
+        self.assertNotEqual(cached["ETag"], fresh["ETag"])
+        return fresh
+
+    def test_steady_state_serves_without_queries(self):
+        for url in (reverse("menu-list"), reverse("category-list")):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.data, second.data)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(reverse("menu-list"))
+        with self.assertNumQueries(0):
+            again = self.client.get(reverse("menu-list"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        again = self.client.get(reverse("menu-list"), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_viewset_write_invalidates(self):
+        item = self.menu[0]
+        fresh = self.assert_refreshed(reverse("menu-list"), lambda: self.client.patch(
+            reverse("menu-detail", args=[item.pk]), {"name": "Waakye"}))
+        self.assertIn("Waakye", [row["name"] for row in fresh.data["results"]])
+
+    def test_update_menu_item_invalidates(self):
+        item = self.menu[0]
+        request = APIRequestFactory().patch("/", {"available": False}, format="json")
+        fresh = self.assert_refreshed(reverse("menu-list"), lambda: update_menu_item(request, item.pk))
+        self.assertNotIn(item.pk, [row["id"] for row in fresh.data["results"]])
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "menu.example.com"])
+    def test_cache_is_per_host(self):
+        MenuItem.objects.filter(pk=self.menu[0].pk).update(image="menu_images/jollof.jpg")
+        url = reverse("menu-detail", args=[self.menu[0].pk])
+        self.assertTrue(self.client.get(url).data["image"].startswith("http://testserver/"))
+        other = self.client.get(url, HTTP_HOST="menu.example.com")
+        self.assertTrue(other.data["image"].startswith("http://menu.example.com/"))
+
+    def test_shared_cache_keeps_the_version(self):
+        self.assertEqual(menu_cache.get_timeouts(), (None, settings.MENU_CACHE_TIMEOUT))
+
+    def test_warm_hit_stays_in_process(self):
+        url = reverse("menu-list")
+        self.client.get(url)
+        with mock.patch.object(caches["menu"], "get", side_effect=AssertionError), self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_other_workers_bump_is_seen_after_revalidating(self):
+        url = reverse("menu-list")
+        etag = self.client.get(url)["ETag"]
+        # Another process bumps the shared version; this one's copy is stale
+        caches["menu"].set(menu_cache.VERSION_KEY, menu_cache._new_version())
+        self.assertEqual(self.client.get(url)["ETag"], etag)
+        later = time.monotonic() + settings.MENU_CACHE_REVALIDATE + 1
+        with mock.patch("chefchainapp.menu_cache.time.monotonic", return_value=later):
+            self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    @override_settings(
+        CACHES={**settings.CACHES, "menu": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        MENU_CACHE_LOCAL_TIMEOUT=5,
+        MENU_CACHE_REVALIDATE=0,
+    )
+    def test_per_process_cache_expires_the_version(self):
+        # Other workers never see this process's bumps, so they must expire
+        self.assertEqual(menu_cache.get_timeouts(), (5, 5))
+        version, _ = menu_cache.get_menu_version()
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=time.time() + 6):
+            self.assertNotEqual(menu_cache.get_menu_version()[0], version)
+
+    def test_admin_edits_invalidate(self):
+        admin_user = User.objects.create_superuser(username="boss", password="pass")
+        admin_client = APIClient()
+        admin_client.force_login(admin_user)
+        item = self.menu[0]
+        self.assert_refreshed(reverse("menu-list"), lambda: admin_client.post(
+            reverse("admin:chefchainapp_menuitem_change", args=[item.pk]),
+            {"name": "Banku", "price": "12.00", "category": self.category.pk, "available": "on"}))
+        fresh = self.assert_refreshed(reverse("category-list"), lambda: admin_client.post(
+            reverse("admin:chefchainapp_category_change", args=[self.category.pk]),
+            {"name": "Local dishes"}))
+        self.assertEqual(fresh.data["results"][0]["name"], "Local dishes")
+
+
+class MenuImageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        menu_cache.clear_menu_cache()
+        self.category = Category.objects.create(name="Mains")
+
+    def photo(self, size=(2000, 1500), name="jollof.jpg"):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"  # camera make
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "orange").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def make_item(self, **kwargs):
+        return MenuItem.objects.create(category=self.category, name="Jollof", price=10, **kwargs)
+
+    def test_upload_queues_processing(self):
+        item = self.make_item(image=self.photo())
+        self.assertEqual(list(Job.objects.values_list("name", "kwargs")),
+                         [(images.process_menu_item_image.job_name, {"item_id": item.pk})])
+        item.name = "Jollof rice"
+        item.save()  # same photo: nothing more to do
+        self.assertEqual(Job.objects.count(), 1)
+        self.make_item()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_variants_are_resized_stripped_and_hashed(self):
+        item = self.make_item(image=self.photo())
+        images.process_menu_item_image(item.pk)
+        item.refresh_from_db()
+        variants = item.image_variants
+        self.assertEqual(variants["source"], item.image.name)
+        self.assertEqual([variants[name]["width"] for name in images.VARIANTS], [160, 480, 1200])
+        self.assertEqual(variants["card"]["height"], 360)
+        for name in images.VARIANTS:
+            for fmt in images.FORMATS:
+                path = variants[name][fmt]
+                self.assertRegex(path, r"^menu_images/variants/jollof\.\d+w\.[0-9a-f]{12}\.(webp|jpg)$")
+                with default_storage.open(path) as stored, Image.open(stored) as image:
+                    self.assertEqual(image.format, fmt.upper())
+                    self.assertEqual(len(image.getexif()), 0)
+
+        data = self.client.get(reverse("menu-detail", args=[item.pk])).data["images"]
+        self.assertTrue(data["thumb"]["webp"].endswith(variants["thumb"]["webp"]))
+        self.assertEqual(len(data["srcset"]["webp"].split(", ")), 3)
+        self.assertIn(f'{variants["full"]["jpeg"]} 1200w', data["srcset"]["jpeg"])
+
+    def test_small_photos_are_not_upscaled(self):
+        item = self.make_item(image=self.photo(size=(300, 200)))
+        images.process_menu_item_image(item.pk)
+        item.refresh_from_db()
+        self.assertEqual([item.image_variants[name]["width"] for name in images.VARIANTS], [160, 300, 300])
+        # Identical card and full renders are stored once
+        self.assertEqual(item.image_variants["card"]["webp"], item.image_variants["full"]["webp"])
+        srcset = self.client.get(reverse("menu-detail", args=[item.pk])).data["images"]["srcset"]["webp"]
+        self.assertEqual(len(srcset.split(", ")), 2)
+
+    def test_items_without_variants_serialize_none(self):
+        item = self.make_item(image=self.photo())
+        self.assertIsNone(self.client.get(reverse("menu-detail", args=[item.pk])).data["images"])
+
+    def test_stale_job_does_not_overwrite_a_newer_photo(self):
+        item = self.make_item(image=self.photo())
+        self.assertFalse(images.save_variants(item.pk, "menu_images/old.jpg", {"source": "menu_images/old.jpg"}))
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants, {})
+
+    def test_backfill_command_uses_a_process_pool(self):
+        items = [self.make_item(image=self.photo(name=f"dish{n}.jpg")) for n in range(3)]
+        MenuItem.objects.filter(pk=items[0].pk).update(image="menu_images/missing.jpg")
+        out, err = StringIO(), StringIO()
+        call_command("process_menu_images", processes=2, stdout=out, stderr=err)
+        self.assertIn("Processed 2 image(s), 1 failed.", out.getvalue())
+        self.assertIn("missing.jpg", err.getvalue())
+        for item in items[1:]:
+            item.refresh_from_db()
+            self.assertEqual(item.image_variants["source"], item.image.name)
+
+        out = StringIO()
+        call_command("process_menu_images", processes=1, stdout=out, stderr=StringIO())
+        self.assertIn("Processed 0 image(s), 1 failed.", out.getvalue())
+
+
+class FileServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.storage = FileSystemStorage(location=media.name)
+        self.body = b"body { color: #c0392b; }\n" * 40
+
+    def save(self, name, content):
+        self.storage.save(name, ContentFile(content))
+        return f"/media/{name}"
+
+    def get(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_hashed_names_are_immutable(self):
+        response, content = self.get(self.save("menu_images/variants/rice.160w.0123456789ab.webp", b"RIFF"))
+        self.assertEqual(content, b"RIFF")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIsInstance(response, FileResponse)
+
+    def test_other_files_revalidate(self):
+        url = self.save("menu_images/rice.jpg", b"jpeg bytes")
+        response, _ = self.get(url)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(self.get(url, if_none_match=response["ETag"])[0].status_code, 304)
+        self.assertEqual(self.get(url, if_modified_since=response["Last-Modified"])[0].status_code, 304)
+        self.assertEqual(self.get(url, if_none_match='"other"')[0].status_code, 200)
+
+    def test_precompressed_siblings(self):
+        url = self.save("site.css", self.body)
+        self.save("site.css.gz", gzip.compress(self.body))
+        self.save("site.css.br", b"brotli bytes")
+
+        response, content = self.get(url, accept_encoding="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(content), self.body)
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(self.get(url, accept_encoding="gzip, br")[0]["Content-Encoding"], "br")
+        self.assertEqual(self.get(url, accept_encoding="gzip;q=0")[1], self.body)
+        # A compressed copy's tag still matches the file
+        self.assertEqual(self.get(url, if_none_match=response["ETag"])[0].status_code, 304)
+
+    def test_range_requests(self):
+        url = self.save("video.mp4", bytes(range(100)))
+        response, content = self.get(url, range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(content, bytes(range(10, 20)))
+        self.assertEqual((response["Content-Range"], response["Content-Length"]), ("bytes 10-19/100", "10"))
+        self.assertEqual(self.get(url, range="bytes=-5")[1], bytes(range(95, 100)))
+        self.assertEqual(self.get(url, range="bytes=90-")[1], bytes(range(90, 100)))
+        self.assertEqual(self.get(url, range="bytes=200-")[0].status_code, 416)
+        self.assertEqual(self.get(url, range="bytes=0-1,5-6")[0].status_code, 200)
+        stale, content = self.get(url, range="bytes=10-19", if_range='"old"')
+        self.assertEqual((stale.status_code, len(content)), (200, 100))
+
+    def test_head_and_missing_files(self):
+        url = self.save("menu_images/rice.jpg", b"jpeg bytes")
+        response = self.client.head(url)
+        self.assertEqual((response.status_code, response["Content-Length"], response.content), (200, "10", b""))
+        self.assertEqual(self.client.get("/media/menu_images/missing.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+
+    def test_collectstatic_writes_compressed_copies(self):
+        source = tempfile.TemporaryDirectory()
+        target = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(target.cleanup)
+        FileSystemStorage(location=source.name).save("app.css", ContentFile(self.body))
+        storage = static_files.CompressedManifestStaticFilesStorage(location=target.name)
+        storage.save("app.css", ContentFile(self.body))
+
+        processed = list(storage.post_process({"app.css": (FileSystemStorage(location=source.name), "app.css")}))
+        hashed = processed[0][1]
+        self.assertRegex(hashed, static_files.HASHED_NAME)
+        with storage.open(hashed + ".gz") as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.body)
+
+
+class RenderingTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        menu_cache.clear_menu_cache()
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.menu = self.make_menu(5)
+        for _ in range(20):
+            self.make_order(self.customer, self.menu, quantity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_orjson_matches_the_default_renderer(self):
+        def numbers(value):
+            # Decimals come out as exact strings rather than floats
+            if isinstance(value, dict):
+                return {key: numbers(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [numbers(item) for item in value]
+            return Decimal(str(value)) if isinstance(value, float) or str(value).replace(".", "").isdigit() else value
+
+        orders = OrderSerializer(Order.objects.with_items(), many=True).data
+        fast, default = ORJSONRenderer().render(orders), JSONRenderer().render(orders)
+        self.assertEqual(numbers(json.loads(fast)), numbers(json.loads(default)))
+
+        data = {
+            "at": timezone.now(),
+            "day": timezone.localdate(),
+            "id": uuid.uuid4(),
+            "label": gettext_lazy("Pending"),
+            "nested": [{"line": "\u2028"}, None, 1.5],
+            3: "non-string key",
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimals_are_exact(self):
+        self.assertEqual(ORJSONRenderer().render({"price": Decimal("1234567890.10")}), b'{"price":"1234567890.10"}')
+
+    def test_indented_output_falls_back(self):
+        rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=2")
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+    def test_large_responses_are_compressed(self):
+        url = reverse("order-list")
+        plain = self.client.get(url)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(plain.content))
+        self.assertNotIn("Content-Encoding", self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0"))
+
+    def test_small_and_streamed_responses_are_left_alone(self):
+        response = self.client.get(reverse("cart-detail"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertLess(len(response.content), 1024)
+        self.assertNotIn("Content-Encoding", response)
+        snapshot = self.client.get(reverse("menu-snapshot"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(json.loads(gzip.decompress(snapshot.content))["categories"][0]["name"], "Mains")
+
+    def test_compressed_menu_still_revalidates(self):
+        with override_settings(COMPRESSION={"MIN_SIZE": 100}):
+            response = self.client.get(reverse("menu-list"), HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertTrue(response["ETag"].startswith("W/"))
+            again = self.client.get(reverse("menu-list"), HTTP_ACCEPT_ENCODING="gzip",
+                                    HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+
+class FastListSerializerTests(OrderFixturesMixin, TestCase):
+    """The list fast path must produce exactly what DRF's generic path does."""
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.menu = self.make_menu(4)
+        MenuItem.objects.create(name="Off menu", price=Decimal("7.5"), description=None, available=False)
+        MenuItem.objects.filter(pk=self.menu[0].pk).update(
+            image="menu_images/jollof.jpg",
+            image_variants={"source": "menu_images/jollof.jpg",
+                            "thumb": {"width": 160, "height": 90, "webp": "v/j.webp", "jpeg": "v/j.jpg"}},
+        )
+        self.make_order(self.customer, self.menu, quantity=3)
+        order = self.make_order(self.customer, self.menu[:2], status="delivered")
+        Order.objects.filter(pk=order.pk).update(table_number="T4")
+        OrderItem.objects.filter(order=order).update(unit_price=None)  # priced from the menu
+        Order.objects.create(customer=self.customer, status="pending")
+        self.context = {"request": APIRequestFactory().get("/api/menu/")}
+
+    def assert_parity(self, serializer_class, queryset):
+        fast = serializer_class(queryset, many=True, context=self.context).data
+        with mock.patch.object(FastListSerializer, "to_representation", serializers.ListSerializer.to_representation):
+            generic = serializer_class(queryset, many=True, context=self.context).data
+        self.assertEqual(fast, generic)
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(generic))
+        return fast
+
+    def test_orders(self):
+        orders = self.assert_parity(OrderSerializer, Order.objects.with_items().order_by("id"))
+        self.assertEqual([len(order["order_items"]) for order in orders], [4, 2, 0])
+
+    def test_menu_items(self):
+        items = self.assert_parity(MenuItemSerializer, MenuItem.objects.select_related("category").order_by("id"))
+        self.assertTrue(items[0]["image"].startswith("http://testserver/"))
+        self.assertIsNone(items[-1]["category"])
+
+    def test_categories(self):
+        self.assert_parity(CategorySerializer, Category.objects.prefetch_related("menu_items"))
+
+    def test_list_endpoints_use_the_fast_path(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        with mock.patch.object(OrderSerializer, "fast_representation", autospec=True,
+                               side_effect=OrderSerializer.fast_representation) as fast:
+            self.assertEqual(client.get(reverse("order-history")).status_code, 200)
+        self.assertEqual(fast.call_count, 2)
+
+
+class SparseFieldsTests(OrderFixturesMixin, TestCase):
+    """``?fields=`` and ``?expand=`` shape the output and the queries."""
+
+    def setUp(self):
+        menu_cache.clear_menu_cache()
+        self.customer = User.objects.create_user(username="ama", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(3)
+        for _ in range(3):
+            self.make_order(self.customer, self.menu).refresh_totals()
+
+    def test_orders_without_lines_skip_the_prefetch(self):
+        for name in ("order-list", "order-history"):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name), {"fields": "id,status,subtotal"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["results"][0], {
+                "id": response.data["results"][0]["id"], "status": "confirmed", "subtotal": "33.00",
+            })
+            sql = " ".join(query["sql"] for query in queries)
+            self.assertNotIn("chefchainapp_orderitem", sql)
+            self.assertNotIn("table_number", sql)
+
+    def test_nested_fields_and_expand(self):
+        response = self.client.get(reverse("order-list"), {
+            "fields": "id,order_items.quantity,order_items.item", "expand": "order_items.item",
+        })
+        line = response.data["results"][0]["order_items"][0]
+        self.assertEqual(set(line), {"quantity", "item"})
+        self.assertEqual(line["item"]["name"], "Dish 0")
+        self.assertEqual(line["item"]["category"], "Mains")
+
+        response = self.client.get(reverse("menu-list"), {"fields": "id,name,category", "expand": "category"})
+        self.assertEqual(response.data["results"][0], {
+            "id": self.menu[0].pk, "name": "Dish 0",
+            "category": {"id": self.menu[0].category_id, "name": "Mains", "description": None},
+        })
+
+    def test_menu_without_category_skips_the_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("menu-list"), {"fields": "id,price"})
+        self.assertEqual(response.data["results"][0], {"id": self.menu[0].pk, "price": "10.00"})
+        self.assertNotIn("chefchainapp_category", " ".join(query["sql"] for query in queries))
+
+    def test_categories_without_items_skip_the_prefetch(self):
+        with self.assertNumQueries(2):  # count and page
+            response = self.client.get(reverse("category-list"), {"fields": "id,name"})
+        self.assertEqual(response.data["results"], [{"id": self.menu[0].category_id, "name": "Mains"}])
+        response = self.client.get(reverse("category-list"), {"fields": "items.name"})
+        self.assertEqual(response.data["results"], [{"items": [{"name": f"Dish {n}"} for n in range(3)]}])
+
+    def test_unknown_names_are_rejected(self):
+        for params in ({"fields": "id,secret"}, {"fields": "order_items.nope"}, {"expand": "status"}):
+            response = self.client.get(reverse("order-list"), params)
+            self.assertEqual(response.status_code, 400, params)
+        self.assertEqual(self.client.get(reverse("menu-list"), {"fields": "nope"}).status_code, 400)
+
+    def test_sparse_output_matches_the_generic_path(self):
+        serializer = OrderSerializer(
+            Order.objects.with_items().order_by("id"), many=True, fields="id,created_at,order_items.item_name",
+            expand="order_items.item",
+        )
+        fast = serializer.data
+        with mock.patch.object(FastListSerializer, "to_representation", serializers.ListSerializer.to_representation):
+            generic = OrderSerializer(
+                Order.objects.with_items().order_by("id"), many=True, fields="id,created_at,order_items.item_name",
+                expand="order_items.item",
+            ).data
+        self.assertEqual(fast, generic)
+        self.assertEqual(set(fast[0]["order_items"][0]), {"item_name"})
+
+    def test_default_output_is_unchanged(self):
+        response = self.client.get(reverse("order-list"), {"fields": ""})
+        readable = {name for name, field in OrderSerializer().fields.items() if not field.write_only}
+        self.assertEqual(set(response.data["results"][0]), readable)
+
+
+class MenuSnapshotTests(OrderFixturesMixin, TestCase):
+    """The snapshot returns the whole menu in one response, served from memory."""
+
+    def setUp(self):
+        menu_cache.clear_menu_cache()
+        self.client = APIClient()
+        self.menu = self.make_menu(3)
+        drinks = Category.objects.create(name="Drinks")
+        MenuItem.objects.create(category=drinks, name="Sobolo", price=5, available=False)
+        Category.objects.create(name="Empty")
+        self.loose = MenuItem.objects.create(name="Water", price=2)
+
+    def test_snapshot_nests_available_items_under_categories(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("menu-snapshot"))
+        data = json.loads(response.content)
+        self.assertEqual([category["name"] for category in data["categories"]], ["Mains"])
+        self.assertEqual(
+            [item["id"] for item in data["categories"][0]["items"]],
+            [item.pk for item in self.menu],
+        )
+        self.assertEqual([item["name"] for item in data["uncategorized"]], ["Water"])
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("menu-snapshot"))
+
+    def test_snapshot_is_served_precompressed(self):
+        plain = self.client.get(reverse("menu-snapshot"))
+        packed = self.client.get(reverse("menu-snapshot"), HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(packed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(packed.content), plain.content)
+        self.assertNotEqual(packed["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", packed["Vary"])
+
+        again = self.client.get(reverse("menu-snapshot"), HTTP_IF_NONE_MATCH=plain["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_snapshot_rebuilds_after_menu_change(self):
+        self.client.get(reverse("menu-snapshot"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.loose.delete()
+        data = json.loads(self.client.get(reverse("menu-snapshot")).content)
+        self.assertEqual(data["uncategorized"], [])
+
+    def test_category_list_includes_available_items(self):
+        response = self.client.get(reverse("category-list"))
+        mains = response.data["results"][0]
+        self.assertEqual(len(mains["items"]), 3)
+        drinks = response.data["results"][1]
+        self.assertEqual(drinks["items"], [])
+
+
+class MenuSearchTests(TestCase):
+    """Ranked, prefix-aware menu search on both index backends."""
+
+    def setUp(self):
+        menu_cache.clear_menu_cache()
+        search.reset_search_backend()
+        self.client = APIClient()
+        rice = Category.objects.create(name="Rice dishes")
+        soups = Category.objects.create(name="Soups")
+        self.jollof = MenuItem.objects.create(category=rice, name="Jollof Rice", description="Smoky party rice")
+        self.waakye = MenuItem.objects.create(category=rice, name="Waakye", description="Rice and beans")
+        self.light = MenuItem.objects.create(category=soups, name="Light Soup", description="Goat, pepper")
+        self.banku = MenuItem.objects.create(category=soups, name="Banku with Okro")
+
+    def search(self, query):
+        response = self.client.get(reverse("menu-list"), {"search": query})
+        return [row["id"] for row in response.data["results"]]
+
+    def test_fts_backend_is_used_on_sqlite(self):
+        self.assertIsInstance(search.get_search_backend(), search.SQLiteFTSBackend)
+
+    def test_search_ranks_name_matches_first(self):
+        self.assertEqual(self.search("rice"), [self.jollof.pk, self.waakye.pk])
+
+    def test_search_matches_prefix_and_category(self):
+        self.assertEqual(self.search("jol"), [self.jollof.pk])
+        self.assertCountEqual(self.search("soups"), [self.light.pk, self.banku.pk])
+
+    def test_index_follows_writes(self):
+        self.waakye.name = "Waakye Special"
+        self.waakye.save()
+        self.assertEqual(self.search("special"), [self.waakye.pk])
+        self.banku.delete()
+        self.assertEqual(self.search("banku"), [])
+
+    def test_rebuild_command(self):
+        MenuItem.objects.filter(pk=self.banku.pk).update(name="Kenkey")
+        self.assertEqual(self.search("kenkey"), [])
+        call_command("rebuild_menu_search", stdout=StringIO())
+        self.assertEqual(self.search("kenkey"), [self.banku.pk])
+
+    @override_settings(MENU_SEARCH_BACKEND="chefchainapp.search.TrigramBackend")
+    def test_trigram_backend_tolerates_typos_and_follows_writes(self):
+        search.reset_search_backend()
+        self.assertEqual(self.search("jolof"), [self.jollof.pk])
+        self.assertEqual(self.search("wa"), [self.waakye.pk])
+        self.assertEqual(self.search("beans"), [self.waakye.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light.name = "Groundnut Soup"
+            self.light.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(search.get_search_backend().search("groundnut"), [self.light.pk])
+
+
+class CartConcurrencyTests(LiveServerTestCase):
+    """Parallel add-to-cart requests against a threaded server must neither
+    duplicate the cart nor lose increments."""
+
+    threads = 8
+    requests_per_thread = 5
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="abena", password="pass")
+        category = Category.objects.create(name="Mains")
+        self.items = [
+            MenuItem.objects.create(category=category, name=name, price=10)
+            for name in ("Jollof", "Waakye")
+        ]
+        self.token = str(AccessToken.for_user(self.customer))
+
+    def add_to_cart(self, item):
+        request = urllib.request.Request(
+            self.live_server_url + reverse("cart-add"),
+            data=json.dumps({"item": item.pk, "quantity": 1}).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status
+
+    def test_parallel_adds_keep_exact_quantities(self):
+        def worker(n):
+            item = self.items[n % 2]
+            return [self.add_to_cart(item) for _ in range(self.requests_per_thread)]
+
+        with ThreadPoolExecutor(self.threads) as pool:
+            statuses = [code for codes in pool.map(worker, range(self.threads)) for code in codes]
+
+        self.assertEqual(set(statuses), {200})
+        cart = Order.objects.get(customer=self.customer, status="pending")
+        quantities = dict(cart.order_items.values_list("item_id", "quantity"))
+        expected = self.threads // 2 * self.requests_per_thread
+        self.assertEqual(quantities, {item.pk: expected for item in self.items})
+        self.assertEqual(cart.item_count, expected * 2)
+        self.assertEqual(cart.subtotal, expected * 2 * 10)
+
+
+class CartConstraintTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="kwame", password="pass")
+        self.menu = self.make_menu(1)
+
+    def test_only_one_pending_order_per_customer(self):
+        Order.objects.create(customer=self.customer, status="pending")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(customer=self.customer, status="pending")
+        Order.objects.create(customer=self.customer, status="confirmed")
+
+    def test_only_one_line_per_item(self):
+        order = self.make_order(self.customer, self.menu)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OrderItem.objects.create(order=order, item=self.menu[0])
+
+    def test_confirming_cart_returns_the_confirmed_order(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        client.post(reverse("cart-add"), {"item": self.menu[0].pk, "quantity": 2})
+        response = client.post(reverse("order-create"), {"table_number": "7"})
+        self.assertEqual(response.data["status"], "confirmed")
+        self.assertEqual(response.data["item_count"], 2)
+        self.assertFalse(Order.objects.filter(customer=self.customer, status="pending").exists())
+
+
+class BatchAddToCartTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username="efua", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.menu = self.make_menu(12)
+
+    def add(self, lines):
+        return self.client.post(reverse("cart-add"), {"items": lines}, format="json")
+
+    def test_batch_is_applied_in_constant_queries(self):
+        self.add([{"item": self.menu[0].pk, "quantity": 1}])
+        lines = [{"item": item.pk, "quantity": 2} for item in self.menu]
+        # lookup, savepoint, cart, lines, update, insert, totals x2, release, reload x2
+        with self.assertNumQueries(11):
+            response = self.add(lines)
+        self.assertEqual(response.status_code, 200)
+        quantities = {line["item"]: line["quantity"] for line in response.data["order_items"]}
+        self.assertEqual(quantities[self.menu[0].pk], 3)
+        self.assertEqual(len(quantities), 12)
+        self.assertEqual(response.data["item_count"], 25)
+
+    def test_repeated_items_in_one_batch_are_merged(self):
+        item = self.menu[0].pk
+        response = self.add([{"item": item, "quantity": 1}, {"item": item, "quantity": 4}])
+        self.assertEqual(len(response.data["order_items"]), 1)
+        self.assertEqual(response.data["order_items"][0]["quantity"], 5)
+
+    def test_unknown_items_reject_the_whole_batch(self):
+        response = self.add([{"item": self.menu[0].pk, "quantity": 1}, {"item": 9999, "quantity": 1}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["items"], [9999])
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_invalid_quantities_are_rejected(self):
+        response = self.add([{"item": self.menu[0].pk, "quantity": 0}])
+        self.assertEqual(response.status_code, 400)
+        response = self.add([{"quantity": 1}])
+        self.assertEqual(response.status_code, 400)
+
+
+class PaystackClientTests(TestCase):
+    def setUp(self):
+        self.gateway = FakePaystackServer().start()
+        self.addCleanup(self.gateway.stop)
+
+    def client_for(self, **options):
+        options = {"BASE_URL": self.gateway.url, "BACKOFF": 0, **options}
+        client = Paystack("sk_test", **options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_initialize_and_verify_reuse_one_connection(self):
+        client = self.client_for()
+        ok, data = client.initialize_payment("ama@example.com", Decimal("12.50"), "ref-1")
+        self.assertTrue(ok)
+        self.assertEqual(data["reference"], "ref-1")
+        ok, data = client.verify_payment("ref-1")
+        self.assertEqual((ok, data["status"], data["amount"]), (True, "success", 1250))
+        self.assertEqual(self.gateway.connections, 1)
+
+    def test_rejections_are_returned_not_raised(self):
+        ok, message = self.client_for().verify_payment("unknown")
+        self.assertFalse(ok)
+        self.assertEqual(message, "Transaction reference not found")
+
+    def test_server_errors_are_retried(self):
+        self.gateway.fail_next(2)
+        ok, _ = self.client_for(RETRIES=2).initialize_payment("ama@example.com", 5, "ref-2")
+        self.assertTrue(ok)
+        self.assertEqual(self.gateway.requests, 3)
+
+    def test_gives_up_after_bounded_retries(self):
+        self.gateway.fail_next(5)
+        with self.assertRaises(PaystackUnavailable):
+            self.client_for(RETRIES=1).verify_payment("ref")
+        self.assertEqual(self.gateway.requests, 2)
+
+    def test_slow_gateway_times_out(self):
+        self.gateway.latency = 0.5
+        with self.assertRaises(PaystackUnavailable):
+            self.client_for(TIMEOUT=(1, 0.1), RETRIES=0).verify_payment("ref")
+
+    def test_circuit_opens_and_recovers(self):
+        client = self.client_for(RETRIES=0, CIRCUIT_BREAKER={"FAILURES": 2, "RESET_TIMEOUT": 0.2})
+        self.gateway.fail_next(2)
+        for _ in range(2):
+            with self.assertRaises(PaystackUnavailable):
+                client.verify_payment("ref")
+        # Open: fails fast without reaching the gateway
+        with self.assertRaises(PaystackUnavailable):
+            client.verify_payment("ref")
+        self.assertEqual(self.gateway.requests, 2)
+
+        time.sleep(0.25)
+        ok, _ = client.verify_payment("unknown")
+        self.assertFalse(ok)
+        self.assertFalse(client.breaker.is_open)
+
+
+    def test_unexpected_error_in_trial_call_does_not_jam_the_circuit(self):
+        client = self.client_for(RETRIES=0, CIRCUIT_BREAKER={"FAILURES": 1, "RESET_TIMEOUT": 0.05})
+        self.gateway.fail_next(1)
+        with self.assertRaises(PaystackUnavailable):
+            client.verify_payment("ref")
+        time.sleep(0.1)
+        with mock.patch.object(client.session, "request", side_effect=RuntimeError("bug")):
+            with self.assertRaises(RuntimeError):
+                client.verify_payment("ref")
+        ok, _ = client.verify_payment("unknown")  # the next call gets a trial
+        self.assertFalse(ok)
+        self.assertFalse(client.breaker.is_open)
+
+
+class PaymentViewTests(OrderFixturesMixin, TestCase):
+    def setUp(self):
+        self.gateway = FakePaystackServer(secret_key=settings.PAYSTACK_SECRET_KEY).start()
+        self.addCleanup(self.gateway.stop)
+        overrides = override_settings(PAYSTACK={"BASE_URL": self.gateway.url, "BACKOFF": 0})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(reset_paystack)
+        reset_paystack()
+
+        self.customer = User.objects.create_user(username="ama", email="ama@example.com", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.order = self.make_order(self.customer, self.make_menu(2), quantity=2)
+        self.order.refresh_totals()
+
+    def initialize(self):
+        response = self.client.post(reverse("payment-initialize"), {"order_id": self.order.pk}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data["reference"]
+
+    def deliver(self, event, reference, signature=None):
+        body, valid_signature = self.gateway.signed_event(event, reference)
+        return APIClient().post(
+            reverse("payment-webhook"), body, content_type="application/json",
+            HTTP_X_PAYSTACK_SIGNATURE=signature or valid_signature,
+        )
+
+    def verify(self, reference):
+        return self.client.get(reverse("payment-verify", args=[reference])).data
+
+    def test_initialize_sends_amount_and_order_metadata(self):
+        reference = self.initialize()
+        transaction = self.gateway.transactions[reference]
+        self.assertEqual(transaction["amount"], 4200)
+        self.assertEqual(transaction["metadata"], {"order_id": self.order.pk})
+
+    def test_initialize_queues_a_follow_up_check(self):
+        reference = self.initialize()
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.kwargs), ("chefchainapp.payments.follow_up_payment", {"order_id": self.order.pk}))
+        self.assertGreater(job.run_after, timezone.now())
+
+        # No webhook arrived; the follow-up verifies the payment itself.
+        payments.follow_up_payment(order_id=self.order.pk)
+        self.assertEqual(self.verify(reference)["status"], "success")
+
+    def test_webhook_marks_order_paid_and_verify_reads_it(self):
+        reference = self.initialize()
+        self.assertEqual(self.verify(reference)["status"], "pending")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.deliver("charge.success", reference)
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.paid_at)
+
+        # Verification is a database read, not a gateway round trip.
+        requests_made = self.gateway.requests
+        self.assertEqual(self.verify(reference), {"status": "success", "message": "Payment successful", "order_id": self.order.pk})
+        self.assertEqual(self.gateway.requests, requests_made)
+
+    def test_duplicate_deliveries_are_recorded_once(self):
+        reference = self.initialize()
+        for _ in range(3):
+            self.assertEqual(self.deliver("charge.success", reference).status_code, 200)
+        self.assertEqual(PaymentEvent.objects.filter(reference=reference).count(), 1)
+
+    def test_forged_webhook_is_rejected(self):
+        reference = self.initialize()
+        response = self.deliver("charge.success", reference, signature="0" * 128)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(PaymentEvent.objects.exists())
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.paid_at)
+
+    def test_signed_non_object_bodies_are_rejected(self):
+        for body in (b"[]", b'"x"', b'{"event": "charge.success", "data": [1]}'):
+            signature = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+            response = APIClient().post(
+                reverse("payment-webhook"), body, content_type="application/json", HTTP_X_PAYSTACK_SIGNATURE=signature,
+            )
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_underpayment_is_recorded_but_not_marked_paid(self):
+        reference = self.initialize()
+        self.gateway.transactions[reference]["amount"] = 100
+        self.deliver("charge.success", reference)
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.paid_at)
+        self.assertTrue(PaymentEvent.objects.filter(reference=reference).exists())
+
+    def test_success_for_an_earlier_attempt_still_pays_the_order(self):
+        first = self.initialize()
+        self.initialize()  # customer retried; the order now has a new reference
+        self.deliver("charge.success", first)
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.paid_at)
+
+    def test_reconcile_confirms_payments_without_webhooks(self):
+        paid = self.initialize()
+        self.gateway.transaction_status = "failed"
+        other_order = self.make_order(self.customer, self.make_menu(1))
+        other_order.refresh_totals()
+        response = self.client.post(reverse("payment-initialize"), {"order_id": other_order.pk}, format="json")
+        declined = response.data["reference"]
+
+        out = StringIO()
+        call_command("reconcile_payments", "--min-age", "0", stdout=out)
+        self.assertIn("Checked 2 payment(s): 1 confirmed, 0 unreachable", out.getvalue())
+        self.order.refresh_from_db()
+        self.assertIsNotNone(self.order.paid_at)
+        self.assertEqual(self.verify(paid)["status"], "success")
+        self.assertEqual(self.verify(declined)["status"], "failed")
+
+        # Nothing left to check on the next run
+        out = StringIO()
+        call_command("reconcile_payments", "--min-age", "0", stdout=out)
+        self.assertIn("Checked 1 payment(s)", out.getvalue())
+
+    def test_reconcile_window_follows_payment_start_not_edits(self):
+        self.initialize()
+        Order.objects.filter(pk=self.order.pk).update(payment_started_at=timezone.now() - timedelta(hours=2))
+        self.order.refresh_from_db()
+        self.order.save()  # e.g. a kitchen status change; bumps updated_at
+        started = payments.unconfirmed_orders(timedelta(minutes=5), timedelta(days=1))
+        self.assertEqual(list(started), [self.order])
+        self.assertFalse(payments.unconfirmed_orders(timedelta(minutes=5), timedelta(hours=1)).exists())
+
+    def test_other_customers_orders_are_not_found(self):
+        other = User.objects.create_user(username="kofi", password="pass")
+        self.client.force_authenticate(other)
+        response = self.client.post(reverse("payment-initialize"), {"order_id": self.order.pk}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+calls = []
+
+
+@jobs.task
+def record_call(value):
+    calls.append(value)
+
+
+@jobs.task(max_attempts=2)
+def fail_once(key):
+    if key not in calls:
+        calls.append(key)
+        raise RuntimeError("first attempt fails")
+
+
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = jobs.Worker(concurrency=4, poll_interval=0.01, backoff=0)
+
+    def test_jobs_run_and_record_timings(self):
+        for n in range(10):
+            jobs.enqueue(record_call, value=n)
+        self.assertEqual(self.worker.run(once=True), 10)
+        self.assertCountEqual(calls, range(10))
+        job = Job.objects.first()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ("done", 1, ""))
+        self.assertIsNotNone(job.wait_ms)
+        self.assertIsNotNone(job.duration_ms)
+
+    def test_failed_attempts_are_retried_with_backoff(self):
+        job = jobs.enqueue(fail_once, key="a")
+        worker = jobs.Worker(poll_interval=0.01, backoff=60)
+        with self.assertLogs("chefchainapp.jobs", "ERROR"):
+            worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("queued", 1))
+        self.assertIn("first attempt fails", job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+
+        Job.objects.update(run_after=timezone.now())
+        worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("done", 2))
+
+    def test_job_fails_after_max_attempts(self):
+        job = jobs.enqueue(fail_once, key="b")
+        Job.objects.filter(pk=job.pk).update(max_attempts=1)
+        with self.assertLogs("chefchainapp.jobs", "ERROR"):
+            self.worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+
+    def test_future_jobs_wait(self):
+        jobs.enqueue(record_call, delay=timedelta(minutes=5), value=1)
+        self.assertEqual(self.worker.run(once=True), 0)
+
+    def test_enqueue_rolls_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                jobs.enqueue(record_call, value=1)
+                raise RuntimeError
+        self.assertFalse(Job.objects.exists())
+
+    def test_concurrent_workers_claim_each_job_once(self):
+        for n in range(40):
+            jobs.enqueue(record_call, value=n)
+        workers = [jobs.Worker(concurrency=2, poll_interval=0.01) for _ in range(3)]
+        with ThreadPoolExecutor(3) as pool:
+            processed = list(pool.map(lambda worker: worker.run(once=True), workers))
+        self.assertEqual(sum(processed), 40)
+        self.assertEqual(sorted(calls), list(range(40)))
+
+    def abandon(self, job, attempts):
+        """Make ``job`` look claimed by a worker that died an hour ago."""
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(
+            status="running", locked_by="dead-worker", attempts=attempts, started_at=an_hour_ago,
+            heartbeat_at=an_hour_ago,
+        )
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue(record_call, value=1)
+        self.abandon(job, attempts=1)
+        self.worker.run(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("done", 2))
+        self.assertEqual(calls, [1])
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        job = jobs.enqueue(fail_once, key="c")  # max_attempts=2
+        self.abandon(job, attempts=2)
+        self.assertEqual(self.worker.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("heartbeats", job.last_error)
+        self.assertEqual(calls, [])
+
+    def test_long_jobs_keep_their_heartbeat(self):
+        job = jobs.enqueue(record_call, value=1)
+        claimed, = self.worker.claim(1)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.worker.heartbeat(force=True)  # what run() does while the job is in hand
+        self.assertEqual(self.worker.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ("running", self.worker.id))
@@ -0,0 +1,258 @@
+"""
+Rate limiting and load shedding for the public and auth endpoints.
+
+Rates are token buckets: ``"120/min"`` allows a burst of 120 requests and
+refills at two a second, so a steady client is never blocked but a bot or
+a stuck kiosk is. Buckets are keyed by scope (the endpoint group) and
+client, either the IP (``IPThrottle``) or the signed-in user
+(``UserThrottle``). The ``local`` store keeps them in process memory;
+``database`` shares them between processes in ``RateLimitBucket`` rows.
+
+Login and registration also go through a ``ConcurrencyLimiter``: password
+hashing is CPU bound, so only a few run at once per process and the rest
+are shed with a 503 straight away rather than queueing behind the hasher
+and starving every other request of CPU.
+
+Rejections are counted per scope (``get_metrics()``); see the throttling
+metrics endpoint.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from .models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "STORE": "local",
+    "RATES": {},
+    "CONCURRENCY": {},
+    "CONCURRENCY_WAIT": 0.1,
+}
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, "THROTTLING", {})}
+
+
+def parse_rate(rate):
+    """``"120/min"`` -> ``(capacity 120, refill 2.0 tokens per second)``."""
+    count, period = rate.split("/")
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """Buckets in process memory; the least recently used are dropped past
+    ``max_keys``."""
+
+    def __init__(self, max_keys=10_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill):
+        """Take a token. Returns ``(allowed, seconds until one is available)``."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / refill
+
+
+class DatabaseBucketStore:
+    """Buckets in ``RateLimitBucket`` rows, shared by every process. Rows
+    idle for longer than ``idle_after`` seconds are deleted now and then."""
+
+    def __init__(self, idle_after=24 * 60 * 60, prune_every=1000):
+        self.idle_after = idle_after
+        self.prune_every = prune_every
+        self._calls = 0
+
+    def take(self, key, capacity, refill):
+        now = time.time()
+        with transaction.atomic():
+            bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+                key=key, defaults={"tokens": capacity, "updated_at": now}
+            )
+            tokens = min(capacity, bucket.tokens + max(0, now - bucket.updated_at) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            RateLimitBucket.objects.filter(pk=bucket.pk).update(tokens=tokens, updated_at=now)
+
+        self._calls += 1
+        if self._calls % self.prune_every == 0:
+            RateLimitBucket.objects.filter(updated_at__lt=now - self.idle_after).delete()
+        return allowed, 0 if allowed else (1 - tokens) / refill
+
+
+STORES = {"local": LocalBucketStore, "database": DatabaseBucketStore}
+
+_store = None
+_limiters = {}
+_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = STORES[get_options()["STORE"]]()
+    return _store
+
+
+def get_limiter(scope):
+    """The process-wide limiter for ``scope``, or None if it has no limit."""
+    if scope not in _limiters:
+        limit = get_options()["CONCURRENCY"].get(scope)
+        with _lock:
+            _limiters.setdefault(scope, ConcurrencyLimiter(limit) if limit else None)
+    return _limiters[scope]
+
+
+def reset_throttling():
+    global _store
+    with _lock:
+        _store = None
+        _limiters.clear()
+        _metrics.clear()
+
+
+# ----------------------------
+# Metrics
+# ----------------------------
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def record_rejection(scope, reason):
+    with _metrics_lock:
+        _metrics[scope, reason] += 1
+    logger.info("Rejected a request to %s (%s)", scope, reason)
+
+
+def get_metrics():
+    """``{scope: {"throttled": n, "shed": n, "in_flight": n}}`` for this process."""
+    with _metrics_lock:
+        counts = dict(_metrics)
+    scopes = {scope for scope, _ in counts} | {scope for scope, limiter in _limiters.items() if limiter}
+    return {
+        scope: {
+            "throttled": counts.get((scope, "throttled"), 0),
+            "shed": counts.get((scope, "shed"), 0),
+            "in_flight": _limiters[scope].in_flight if _limiters.get(scope) else 0,
+        }
+        for scope in sorted(scopes)
+    }
+
+
+# ----------------------------
+# Throttles
+# ----------------------------
+class TokenBucketThrottle(BaseThrottle):
+    """Limits each client to the rate configured for the view's
+    ``throttle_scope`` in ``THROTTLING['RATES']`` (no limit if unset)."""
+
+    def get_client_key(self, request):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = get_options()["RATES"].get(scope)
+        if rate is None:
+            return True
+        capacity, refill = parse_rate(rate)
+        allowed, self.retry_after = get_store().take(f"{scope}:{self.get_client_key(request)}", capacity, refill)
+        if not allowed:
+            record_rejection(scope, "throttled")
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPThrottle(TokenBucketThrottle):
+    pass
+
+
+class UserThrottle(TokenBucketThrottle):
+    """Per user when signed in, per IP otherwise."""
+
+    def get_client_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return self.get_ident(request)
+
+
+# ----------------------------
+# Load shedding
+# ----------------------------
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many requests are being processed, please retry shortly."
+    default_code = "overloaded"
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class ConcurrencyLimitMixin:
+    """
+    Runs at most ``THROTTLING['CONCURRENCY'][concurrency_scope]`` requests of
+    a view at once per process; others wait ``CONCURRENCY_WAIT`` seconds for
+    a slot and are then shed with a 503. Checked after authentication and
+    throttling, so throttled clients never take a slot.
+    """
+    concurrency_scope = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        limiter = get_limiter(self.concurrency_scope)
+        if limiter is None:
+            return
+        if not limiter.acquire(timeout=get_options()["CONCURRENCY_WAIT"]):
+            record_rejection(self.concurrency_scope, "shed")
+            raise Overloaded()
+        self._concurrency_slot = limiter
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        limiter = getattr(self, "_concurrency_slot", None)
+        if limiter is not None:
+            self._concurrency_slot = None
+            limiter.release()
+        return super().finalize_response(request, response, *args, **kwargs)
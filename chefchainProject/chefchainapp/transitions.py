@@ -0,0 +1,103 @@
+"""
+Order status state machine.
+
+``TRANSITIONS`` lists every allowed status change and the roles that may
+make it; admins (``role="admin"`` or staff users) may make any of them.
+``transition()`` moves a batch of orders with a single
+``UPDATE ... WHERE status IN (...)``: orders whose status no longer allows
+the move (someone else got there first) are skipped rather than
+overwritten, and every change is appended to the ``OrderEvent`` log,
+counted in the sales rollups and published to the live order feed.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import feed, rollups
+from .models import Order, OrderEvent
+
+# (from, to) -> roles allowed to make the change
+TRANSITIONS = {
+    ("pending", "confirmed"): {"customer"},
+    ("confirmed", "preparing"): {"chef"},
+    ("preparing", "ready"): {"chef"},
+    ("ready", "delivered"): {"rider"},
+    ("confirmed", "cancelled"): {"chef"},
+    ("preparing", "cancelled"): set(),
+}
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+class TransitionNotPermitted(InvalidTransition):
+    pass
+
+
+def is_admin(user):
+    return user.is_staff or user.is_superuser or user.role == "admin"
+
+
+def sources(to_status, user=None):
+    """Statuses ``user`` may move an order from into ``to_status``
+    (any role when ``user`` is None)."""
+    return {
+        from_status
+        for (from_status, target), roles in TRANSITIONS.items()
+        if target == to_status and (user is None or is_admin(user) or user.role in roles)
+    }
+
+
+def check(user, from_status, to_status):
+    """Raise unless ``user`` may move an order from ``from_status`` to ``to_status``."""
+    if (from_status, to_status) not in TRANSITIONS:
+        raise InvalidTransition(f"Cannot move a {from_status} order to {to_status}")
+    if from_status not in sources(to_status, user):
+        raise TransitionNotPermitted(f"Your role cannot move orders from {from_status} to {to_status}")
+
+
+class TransitionResult:
+    def __init__(self, moved, skipped):
+        self.moved = moved  # ids that changed status
+        self.skipped = skipped  # id -> current status (None if not found)
+
+
+def transition(order_ids, to_status, user=None, from_status=None):
+    """
+    Move the given orders to ``to_status``. Only orders currently in a status
+    ``user`` may move from (narrowed to ``from_status`` when given, for
+    optimistic concurrency) are changed; the rest are reported as skipped.
+    """
+    allowed = sources(to_status, user)
+    if from_status is not None:
+        allowed &= {from_status}
+    order_ids = list(dict.fromkeys(order_ids))
+    now = timezone.now()
+
+    orders = Order.objects.filter(pk__in=order_ids)
+    if user is not None and not is_admin(user) and user.role == "customer":
+        orders = orders.filter(customer=user)
+
+    with transaction.atomic():
+        rows = orders.select_for_update().values_list("id", "status", "subtotal")
+        current, subtotals = {}, {}
+        for pk, status, subtotal in rows:
+            current[pk], subtotals[pk] = status, subtotal
+        movable = {pk: status for pk, status in current.items() if status in allowed}
+        if movable:
+            Order.objects.filter(pk__in=movable, status__in=allowed).update(status=to_status, updated_at=now)
+            OrderEvent.objects.bulk_create(
+                OrderEvent(order_id=pk, from_status=status, to_status=to_status, actor=user, created_at=now)
+                for pk, status in movable.items()
+            )
+            rollups.apply(movable, to_status, now, sum(subtotals[pk] for pk in movable))
+            feed.publish_order_updated(movable, status=to_status)
+
+    skipped = {pk: current.get(pk) for pk in order_ids if pk not in movable}
+    return TransitionResult([pk for pk in order_ids if pk in movable], skipped)
+
+
+def record(order, from_status, actor=None):
+    """Log a status change made outside ``transition()`` (e.g. checkout)."""
+    event = OrderEvent.objects.create(order=order, from_status=from_status, to_status=order.status, actor=actor)
+    rollups.apply({order.pk: from_status}, order.status, event.created_at, order.subtotal)
@@ -2,11 +2,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # from .views import MenuItemViewSet, RegisterView, CustomLoginView, CategoryListView, OrderListView, OrderCreateView, CartView, AddToCartView, UpdateCartItemView , OrderUpdateView , OrderHistoryView , OrderDetailView
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     MenuItemViewSet, RegisterView, CustomLoginView, CategoryListView, 
     OrderListView, OrderCreateView, CartView, AddToCartView, 
-    UpdateCartItemView, OrderUpdateView, OrderHistoryView, OrderDetailView, update_menu_item
+    UpdateCartItemView, OrderUpdateView, OrderHistoryView, OrderDetailView, update_menu_item,
+    OrderStreamView, OrderTransitionView, KitchenQueueView, PrepTimeReportView, SalesReportView, ThrottlingMetricsView, OrderExportView, InitializePaymentView, VerifyPaymentView, PaystackWebhookView,
 )
 
 router = DefaultRouter()
@@ -16,13 +17,20 @@ urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomLoginView.as_view(), name='token_obtain_pair'),
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', CustomLoginView.as_view(), name='token_obtain_pair'),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("categories/", CategoryListView.as_view(), name="category-list"),
     path("orders/", OrderListView.as_view(), name="order-list"),
     path("orders/create/", OrderCreateView.as_view(), name="order-create"),
     path("orders/<int:pk>/", OrderUpdateView.as_view(), name="order-update"),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path("orders/transition/", OrderTransitionView.as_view(), name="order-transition"),
+    path("orders/stream/", OrderStreamView.as_view(), name="order-stream"),
+    path("orders/export/", OrderExportView.as_view(), name="order-export"),
+    path("kitchen/queue/", KitchenQueueView.as_view(), name="kitchen-queue"),
+    path("analytics/prep-times/", PrepTimeReportView.as_view(), name="analytics-prep-times"),
+    path("analytics/sales/", SalesReportView.as_view(), name="analytics-sales"),
+    path("analytics/throttling/", ThrottlingMetricsView.as_view(), name="analytics-throttling"),
+    path('api/token/', CustomLoginView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     #Order History endpoints
@@ -33,6 +41,10 @@ urlpatterns = [
     path("cart/", CartView.as_view(), name="cart-detail"),
     path("cart/add/", AddToCartView.as_view(), name="cart-add"),
     path("cart/item/<int:pk>/", UpdateCartItemView.as_view(), name="cart-item-update"),
+
+    path("payment/paystack/initialize/", InitializePaymentView.as_view(), name="payment-initialize"),
+    path("payment/paystack/verify/<str:reference>/", VerifyPaymentView.as_view(), name="payment-verify"),
+    path("payment/paystack/webhook/", PaystackWebhookView.as_view(), name="payment-webhook"),
 ]
 
 
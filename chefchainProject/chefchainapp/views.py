@@ -1,12 +1,31 @@
-from django.shortcuts import render
-from rest_framework.decorators import api_view, permission_classes
+import json
+import secrets
+import time
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Case, Count, Prefetch, Sum, When
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import generics, status, permissions, viewsets
 
+from . import analytics, cart, exports, feed, jobs, payments, rollups, throttling, transitions
+from .authentication import QueryParamJWTAuthentication, TokenUserAuthentication
+from .menu_cache import MenuCacheMixin, menu_snapshot_response
 from .models import Category, MenuItem, Order, User, OrderItem
+from .pagination import OrderCursorPagination
+from .paystack import PaystackUnavailable, get_paystack
+from .search import get_search_backend
+from .throttling import ConcurrencyLimitMixin, IPThrottle, UserThrottle
 from .serializers import (
     MenuItemSerializer,
     RegisterSerializer,
@@ -15,13 +34,65 @@ from .serializers import (
     CategorySerializer,
     OrderSerializer,
     OrderItemSerializer,
+    CartQuantitySerializer,
 )
 
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Conflict"
+
+
+# Read-only views take the user from the JWT's claims instead of a query
+TOKEN_USER_AUTHENTICATION = [TokenUserAuthentication, SessionAuthentication]
+
+
+class SparseFieldsViewMixin:
+    """
+    ``?fields=`` and ``?expand=`` on GET (see ``SparseFieldsMixin``), e.g.
+    ``/api/orders/?fields=id,status,subtotal`` or ``?expand=order_items.item``.
+    Views build their queryset from ``get_sparse_serializer()`` so joins,
+    prefetches and columns the response won't show are never loaded.
+    """
+
+    def get_sparse_params(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return {}
+        params = {name: self.request.query_params.get(name) for name in ("fields", "expand")}
+        return {name: value for name, value in params.items() if value}
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **{**self.get_sparse_params(), **kwargs})
+
+    def get_sparse_serializer(self):
+        """The serializer with the requested fields (a 400 for unknown
+        names), or None when the request doesn't ask for any."""
+        if not self.get_sparse_params():
+            return None
+        serializer = self.get_serializer()
+        serializer.fields  # validates ?fields= and ?expand=
+        return serializer
+
+    def get_orders(self):
+        """Orders with their lines and menu items, or only what the
+        selected fields need (the sort columns are always loaded)."""
+        serializer = self.get_sparse_serializer()
+        if serializer is None:
+            return Order.objects.with_items()
+        columns = {*serializer.model_columns(), "created_at", "updated_at"}
+        if serializer.selects("order_items"):
+            return Order.objects.with_items().only(*columns, "customer")
+        return Order.objects.only(*columns)
+
+
 # ----------------------------
 # ✅ Register (Public)
 # ----------------------------
-class RegisterView(APIView):
+class RegisterView(ConcurrencyLimitMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPThrottle]
+    throttle_scope = "register"
+    concurrency_scope = "auth"
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -35,17 +106,37 @@ class RegisterView(APIView):
 # ✅ Login (Public - JWT)
 # ----------------------------
 
-class CustomLoginView(TokenObtainPairView):
+class CustomLoginView(ConcurrencyLimitMixin, TokenObtainPairView):
     serializer_class = CustomTokenSerializer
+    throttle_classes = [IPThrottle]
+    throttle_scope = "login"
+    concurrency_scope = "auth"
 
 
 # ----------------------------
 # ✅ Categories (Public)
 # ----------------------------
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all()
+class CategoryListView(SparseFieldsViewMixin, MenuCacheMixin, generics.ListAPIView):
+    queryset = Category.objects.order_by("id").prefetch_related(
+        Prefetch("menu_items", queryset=MenuItem.objects.filter(available=True).order_by("id"))
+    )
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    throttle_classes = [UserThrottle]
+    throttle_scope = "menu"
+
+    def get_queryset(self):
+        serializer = self.get_sparse_serializer()
+        if serializer is None:
+            return super().get_queryset()
+        queryset = Category.objects.order_by("id").only(*serializer.model_columns())
+        if serializer.selects("items"):
+            items = serializer.fields["items"].child
+            queryset = queryset.prefetch_related(Prefetch(
+                "menu_items",
+                queryset=MenuItem.objects.filter(available=True).order_by("id").only(*items.model_columns(), "category"),
+            ))
+        return queryset
 
 
 # ----------------------------
@@ -55,15 +146,25 @@ class MenuItemListCreateView(generics.ListCreateAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [UserThrottle]
+    throttle_scope = "menu"
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(SparseFieldsViewMixin, MenuCacheMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [UserThrottle]
+    throttle_scope = "menu"
+    search_limit = 200
 
     def get_queryset(self):
         # Start with only available items
         queryset = MenuItem.objects.filter(available=True)
+        serializer = self.get_sparse_serializer()
+        if serializer is None or serializer.selects("category"):
+            queryset = queryset.select_related("category")
+        if serializer is not None:
+            queryset = queryset.only(*serializer.model_columns())
         
         category_id = self.request.query_params.get("category")
         search = self.request.query_params.get("search")
@@ -72,9 +173,20 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(category__id=category_id)
 
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            # Ranked ids from the search index, kept in that order
+            ids = get_search_backend().search(search, limit=self.search_limit)
+            if not ids:
+                return queryset.none()
+            queryset = queryset.filter(id__in=ids).order_by(
+                Case(*[When(id=pk, then=position) for position, pk in enumerate(ids)])
+            )
 
         return queryset
+
+    @action(detail=False, methods=["get"])
+    def snapshot(self, request):
+        """Every available category with its items, in one response."""
+        return menu_snapshot_response(request)
 # class MenuItemViewSet(viewsets.ModelViewSet):
 #     queryset = MenuItem.objects.all()
 #     serializer_class = MenuItemSerializer
@@ -100,9 +212,11 @@ class OrderCreateView(generics.CreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        # Check if user has a pending cart order
-        pending_order = Order.objects.filter(
+        # Check if user has a pending cart order (locked, so a concurrent
+        # add-to-cart can't slip a line in while it's being confirmed)
+        pending_order = Order.objects.select_for_update().filter(
             customer=self.request.user, 
             status="pending"
         ).first()
@@ -113,22 +227,35 @@ class OrderCreateView(generics.CreateAPIView):
             pending_order.order_type = serializer.validated_data.get('order_type', 'dine_in')
             pending_order.status = 'confirmed'
             pending_order.save()
+            lines = serializer.validated_data.get('items')
+            if lines:
+                cart.merge_lines(pending_order, lines)
+                pending_order.refresh_totals()
+            transitions.record(pending_order, "pending", self.request.user)
+            serializer.instance = Order.objects.with_items().get(pk=pending_order.pk)
+            feed.publish_order_created(serializer.instance)
             return pending_order
         else:
             # Create new order
-            serializer.save(
+            order = serializer.save(
                 customer=self.request.user,
                 status='confirmed'
             )
+            transitions.record(order, "", self.request.user)
+            # Reload with its lines, so the response doesn't query per line
+            serializer.instance = Order.objects.with_items().get(pk=order.pk)
+            feed.publish_order_created(serializer.instance)
 
 
 # In your views.py - Update OrderListView to include all orders for kitchen staff
-class OrderListView(generics.ListAPIView):
+class OrderListView(SparseFieldsViewMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
+    authentication_classes = TOKEN_USER_AUTHENTICATION
     permission_classes = [IsAuthenticated]  # You might want to add kitchen staff permission
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.all().order_by('-created_at')
+        return self.get_orders().order_by('-created_at')
 
 # Add order update view
 class OrderUpdateView(generics.UpdateAPIView):
@@ -139,13 +266,288 @@ class OrderUpdateView(generics.UpdateAPIView):
     def patch(self, request, *args, **kwargs):
         return super().patch(request, *args, **kwargs)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # Status changes go through the state machine; other fields save as usual.
+        new_status = serializer.validated_data.pop("status", None)
+        order = serializer.save()
+        changes = {field: getattr(order, field) for field in serializer.validated_data}
+        if changes:
+            feed.publish_order_updated([order.pk], **changes)
+        if new_status is not None and new_status != order.status:
+            try:
+                transitions.check(self.request.user, order.status, new_status)
+            except transitions.TransitionNotPermitted as exc:
+                raise PermissionDenied(str(exc))
+            except transitions.InvalidTransition as exc:
+                raise ValidationError({"status": str(exc)})
+            result = transitions.transition([order.pk], new_status, self.request.user, from_status=order.status)
+            if not result.moved:
+                raise Conflict("The order's status changed in the meantime; reload and try again.")
+            order.status = new_status
+
+
+class OrderTransitionView(APIView):
+    """
+    Move many orders to one status at once:
+    ``{"ids": [...], "status": "ready", "from": "preparing"}``. ``from`` is
+    optional; orders not in a status the user may move them from (or no
+    longer in ``from``) are returned under ``skipped`` with their current status.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        new_status = request.data.get("status")
+        from_status = request.data.get("from")
+        ids = request.data.get("ids") or []
+        # A string would be read digit by digit
+        if not isinstance(ids, (list, tuple)):
+            return Response({"error": "ids must be a list of order ids"}, status=400)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a list of order ids"}, status=400)
+        if new_status not in dict(Order.STATUS_CHOICES) or not ids:
+            return Response({"error": "Give a list of order ids and a valid status"}, status=400)
+        if not transitions.sources(new_status, request.user):
+            return Response({"error": f"Your role cannot move orders to {new_status}"}, status=403)
+
+        result = transitions.transition(ids, new_status, request.user, from_status=from_status)
+        return Response({"moved": result.moved, "skipped": result.skipped})
+
+# ----------------------------
+# ✅ Kitchen display queue
+# ----------------------------
+class KitchenQueueView(APIView):
+    """
+    Open tickets for the kitchen screen grouped by status, plus how many of
+    each dish are waiting per station (menu category), summed in SQL.
+    """
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        orders = Order.objects.with_items().active().order_by("created_at", "id")
+        tickets = {status: [] for status in Order.ACTIVE_STATUSES}
+        for ticket in OrderSerializer(orders, many=True).data:
+            tickets[ticket["status"]].append(ticket)
+
+        totals = (
+            OrderItem.objects.filter(order__status__in=Order.ACTIVE_STATUSES)
+            .values("order__status", "item__category_id", "item__category__name", "item_id", "item__name")
+            .annotate(quantity=Sum("quantity"), orders=Count("order_id", distinct=True))
+            .order_by("order__status", "item__category__name", "item__category_id", "-quantity", "item__name")
+        )
+        stations = {status: [] for status in Order.ACTIVE_STATUSES}
+        for row in totals:
+            groups = stations[row["order__status"]]
+            if not groups or groups[-1]["category_id"] != row["item__category_id"]:
+                groups.append({
+                    "category_id": row["item__category_id"],
+                    "category": row["item__category__name"] or "Uncategorized",
+                    "items": [],
+                })
+            groups[-1]["items"].append({
+                "item_id": row["item_id"],
+                "name": row["item__name"],
+                "quantity": row["quantity"],
+                "orders": row["orders"],
+            })
+
+        return Response({
+            "counts": {status: len(tickets[status]) for status in Order.ACTIVE_STATUSES},
+            "tickets": tickets,
+            "stations": stations,
+        })
+
+# ----------------------------
+# ✅ Analytics (managers)
+# ----------------------------
+class IsManager(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and transitions.is_admin(request.user))
+
+
+class PrepTimeReportView(APIView):
+    """
+    Prep-time percentiles, orders per hour and the slowest dishes for orders
+    confirmed between ``?start=`` and ``?end=`` (ISO dates, inclusive;
+    the last 30 days by default). See analytics.py.
+    """
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsManager]
+
+    def get(self, request):
+        try:
+            start, end = analytics.date_range(request.query_params.get("start"), request.query_params.get("end"))
+            top_items = int(request.query_params.get("items", 20))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(analytics.prep_time_report(start, end, top_items=top_items))
+
+
+class SalesReportView(APIView):
+    """
+    Sales by day, order type and dish between ``?start=`` and ``?end=``
+    (ISO dates, inclusive; the last 30 days by default), read from the
+    daily rollup table rather than the line items.
+    """
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsManager]
+
+    def get(self, request):
+        try:
+            start, end = analytics.day_range(request.query_params.get("start"), request.query_params.get("end"))
+            top_items = int(request.query_params.get("items", 10))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(rollups.sales_summary(start, end, top_items=top_items))
+
+
+class ThrottlingMetricsView(APIView):
+    """Requests this process has rejected per endpoint group, throttled
+    (429) or shed under load (503), and auth requests in flight."""
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsManager]
+
+    def get(self, request):
+        return Response(throttling.get_metrics())
+
+# ----------------------------
+# ✅ Order export (accounting)
+# ----------------------------
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses get here; exports are streamed.
+        return JSONRenderer().render(data)
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class OrderExportView(APIView):
+    """
+    Orders with their line items created between ``?start=`` and ``?end=``
+    (ISO dates, inclusive; the last 30 days by default), optionally only
+    ``?status=delivered,cancelled``. ``?format=csv`` (the default) gives a
+    row per line item, ``?format=ndjson`` an object per order. The export
+    is streamed as it's read, so a year of orders starts downloading
+    straight away and never sits in memory.
+    """
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsManager]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request):
+        try:
+            start, end = analytics.day_range(request.query_params.get("start"), request.query_params.get("end"))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+        statuses = [status for status in request.query_params.get("status", "").split(",") if status]
+        if set(statuses) - dict(Order.STATUS_CHOICES).keys():
+            return Response({"error": "Unknown status"}, status=400)
+
+        rows = exports.export_rows(*analytics.date_range(start, end), statuses=statuses)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(exports.STREAMS[renderer.format](rows), content_type=renderer.media_type)
+        response["Content-Disposition"] = f'attachment; filename="orders-{start}-{end}.{renderer.format}"'
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+# ----------------------------
+# ✅ Live order feed (Server-Sent Events)
+# ----------------------------
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses get here; the stream itself bypasses renderers.
+        return JSONRenderer().render(data)
+
+
+class OrderStreamView(APIView):
+    """
+    Push order create/update events to kitchen and rider screens.
+    Reconnecting clients resume from ``Last-Event-ID`` (or ``?last_event_id=``);
+    a ``reset`` event means they fell too far behind and should refetch /orders/.
+    Under WSGI a stream holds a worker thread, so it ends after ``sync_lifetime``
+    seconds and the client reconnects, possibly to another worker.
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [QueryParamJWTAuthentication]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+    heartbeat = 15  # seconds between keep-alive comments
+    retry = 3000  # client reconnect delay in milliseconds
+    sync_lifetime = 300  # seconds a WSGI stream is kept open
+
+    def get(self, request):
+        layer = feed.get_channel_layer()
+        last_id = self.get_last_event_id(request, layer)
+        if isinstance(request._request, ASGIRequest):
+            stream = self.async_stream(layer, last_id)
+        else:
+            stream = self.sync_stream(layer, last_id)
+        response = StreamingHttpResponse(stream, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def get_last_event_id(self, request, layer):
+        value = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id")
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return layer.last_id
+
+    def drain(self, layer, last_id):
+        events = layer.events_after(last_id)
+        if events is None:
+            last_id = layer.last_id
+            return [f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"], last_id
+        if events:
+            last_id = events[-1].id
+        return [event.encode() for event in events], last_id
+
+    def sync_stream(self, layer, last_id):
+        deadline = time.monotonic() + self.sync_lifetime
+        yield f"retry: {self.retry}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            chunks, last_id = self.drain(layer, last_id)
+            if not chunks:
+                layer.wait(last_id, min(self.heartbeat, remaining))
+                chunks, last_id = self.drain(layer, last_id)
+            yield "".join(chunks) or ": keep-alive\n\n"
+        # An id without data sets the client's Last-Event-ID without firing
+        # an event, so the reconnect resumes here even if nothing was sent.
+        yield f"id: {last_id}\n\n"
+
+    async def async_stream(self, layer, last_id):
+        yield f"retry: {self.retry}\n\n"
+        while True:
+            chunks, last_id = self.drain(layer, last_id)
+            if not chunks:
+                await layer.await_event(last_id, self.heartbeat)
+                chunks, last_id = self.drain(layer, last_id)
+            yield "".join(chunks) or ": keep-alive\n\n"
+
+
 # Get current cart
 class CartView(APIView):
+    authentication_classes = TOKEN_USER_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        order, created = Order.objects.get_or_create(
-            customer=request.user, status="pending"
+        order, created = Order.objects.with_items().get_or_create(
+            customer_id=request.user.id, status="pending"
         )
         return Response(OrderSerializer(order).data)
 
@@ -155,23 +557,25 @@ class AddToCartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        order, created = Order.objects.get_or_create(
-            customer=request.user, status="pending"
-        )
-        item_id = request.data.get("item")
-        quantity = int(request.data.get("quantity", 1))
+        # Either a single {"item", "quantity"} or {"items": [{"item", "quantity"}, ...]}
+        lines = request.data.get("items")
+        if lines is None:
+            lines = [{"item": request.data.get("item"), "quantity": request.data.get("quantity", 1)}]
         try:
-            menu_item = MenuItem.objects.get(id=item_id)
-        except MenuItem.DoesNotExist:
-            return Response({"error": "Item not found"}, status=404)
+            lines = [(int(line["item"]), int(line.get("quantity", 1))) for line in lines]
+        except (KeyError, TypeError, ValueError):
+            return Response({"error": "Each line needs an item id and a quantity"}, status=400)
+        if not lines or any(quantity <= 0 for _, quantity in lines):
+            return Response({"error": "Quantities must be positive"}, status=400)
 
-        order_item, created = OrderItem.objects.get_or_create(order=order, item=menu_item)
-        if not created:
-            order_item.quantity += quantity
-        else:
-            order_item.quantity = quantity
-        order_item.save()
+        menu_items = MenuItem.objects.in_bulk({item_id for item_id, _ in lines})
+        missing = sorted({item_id for item_id, _ in lines} - set(menu_items))
+        if missing:
+            return Response({"error": "Item not found", "items": missing}, status=404)
+
+        order = cart.add_items(request.user, [(menu_items[item_id], quantity) for item_id, quantity in lines])
 
+        order = Order.objects.with_items().get(pk=order.pk)
         return Response(OrderSerializer(order).data)
 
 
@@ -180,37 +584,41 @@ class UpdateCartItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def patch(self, request, pk):
+        serializer = CartQuantitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"error": "Quantity must be a whole number, 0 or more"}, status=400)
+        quantity = serializer.validated_data["quantity"]
         try:
-            order_item = OrderItem.objects.get(pk=pk, order__customer=request.user, order__status="pending")
+            order = cart.set_quantity(request.user, pk, quantity)
         except OrderItem.DoesNotExist:
             return Response({"error": "Item not found in cart"}, status=404)
 
-        quantity = int(request.data.get("quantity", 1))
-        if quantity <= 0:
-            order_item.delete()
-        else:
-            order_item.quantity = quantity
-            order_item.save()
-
-        return Response(OrderSerializer(order_item.order).data)
+        order = Order.objects.with_items().get(pk=order.pk)
+        return Response(OrderSerializer(order).data)
 
 
 
 # Add this to your existing views.py file
 
-class OrderHistoryView(generics.ListAPIView):
+class OrderHistoryView(SparseFieldsViewMixin, generics.ListAPIView):
     """
     Get order history for the authenticated customer
     Only shows completed orders (not pending cart items)
     """
     serializer_class = OrderSerializer
+    authentication_classes = TOKEN_USER_AUTHENTICATION
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
         # Only return orders for the authenticated user that are not pending
-        return Order.objects.filter(
-            customer=self.request.user,
-            status__in=['confirmed', 'preparing', 'ready', 'delivered']
+        statuses = ['confirmed', 'preparing', 'ready', 'delivered']
+        if 'since' in self.request.query_params:
+            # Syncing clients need cancellations too, to drop those orders
+            statuses.append('cancelled')
+        return self.get_orders().filter(
+            customer_id=self.request.user.id,
+            status__in=statuses
         ).order_by('-created_at')
 
 
@@ -219,11 +627,80 @@ class OrderDetailView(generics.RetrieveAPIView):
     Get detailed view of a specific order for the authenticated customer
     """
     serializer_class = OrderSerializer
+    authentication_classes = TOKEN_USER_AUTHENTICATION
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # Only allow customers to see their own orders
-        return Order.objects.filter(customer=self.request.user)
+        return Order.objects.with_items().filter(customer_id=self.request.user.id)
+
+
+
+# ----------------------------
+# ✅ Payments (Paystack)
+# ----------------------------
+class InitializePaymentView(APIView):
+    """Start a Paystack transaction for one of the customer's orders."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        order = get_object_or_404(Order, pk=request.data.get("order_id"), customer=request.user)
+        if order.paid_at:
+            return Response({"error": "Order is already paid"}, status=400)
+
+        # A fresh reference per attempt; Paystack rejects reused ones.
+        reference = f"order-{order.pk}-{secrets.token_hex(6)}"
+        now = timezone.now()
+        Order.objects.filter(pk=order.pk).update(payment_reference=reference, payment_started_at=now, updated_at=now)
+        try:
+            ok, data = get_paystack().initialize_payment(
+                request.user.email, order.subtotal, reference, request.data.get("callback_url"),
+                metadata={"order_id": order.pk},
+            )
+        except PaystackUnavailable:
+            return Response({"error": "Payment gateway unavailable, please try again"}, status=503)
+        if not ok:
+            return Response({"error": data}, status=400)
+        jobs.enqueue(payments.follow_up_payment, delay=payments.FOLLOW_UP_DELAY, order_id=order.pk)
+        return Response(data)
+
+
+class VerifyPaymentView(APIView):
+    """
+    Payment status of an order, for the page Paystack redirects back to.
+    Orders are confirmed by the webhook below (or the reconcile_payments
+    command), so this only reads the database; clients poll while pending.
+    """
+    authentication_classes = TOKEN_USER_AUTHENTICATION
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, reference):
+        order = get_object_or_404(Order, payment_reference=reference, customer_id=request.user.id)
+        if order.paid_at:
+            return Response({"status": "success", "message": "Payment successful", "order_id": order.pk})
+        failed = order.payment_events.filter(reference=reference, event="charge.failed").exists()
+        if failed:
+            return Response({"status": "failed", "message": "Payment was not completed", "order_id": order.pk})
+        return Response({"status": "pending", "message": "Waiting for payment confirmation", "order_id": order.pk})
+
+
+class PaystackWebhookView(APIView):
+    """Paystack event notifications, signed with HMAC-SHA512 of the body."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        if not payments.valid_signature(request.body, request.headers.get("X-Paystack-Signature")):
+            return Response({"error": "Invalid signature"}, status=401)
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return Response({"error": "Invalid JSON"}, status=400)
+        if not isinstance(payload, dict) or not isinstance(payload.get("data") or {}, dict):
+            return Response({"error": "Expected an event object"}, status=400)
+        payments.record_event(payload.get("event"), payload.get("data") or {})
+        # Duplicates are acknowledged too, so Paystack stops retrying them.
+        return Response(status=200)
 
 
 @api_view(['PATCH'])
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { Link } from "react-router-dom";
 import { 
   Clock, 
@@ -21,6 +21,7 @@ import {
 
 export default function Kitchen() {
   const [orders, setOrders] = useState([]);
+  const [stations, setStations] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [filterStatus, setFilterStatus] = useState('all');
@@ -119,12 +120,13 @@ export default function Kitchen() {
     setOrders([]);
   };
 
-  // Fetch orders
+  // Fetch the open tickets and per-station dish totals
   const fetchOrders = async () => {
     try {
       setLoading(true);
-      const data = await apiCall('/orders/');
-      setOrders(data.results || data);
+      const data = await apiCall('/kitchen/queue/');
+      setOrders([...data.tickets.confirmed, ...data.tickets.preparing, ...data.tickets.ready]);
+      setStations(data.stations);
       setLastUpdate(new Date());
       setError(null);
     } catch (err) {
@@ -152,21 +154,56 @@ export default function Kitchen() {
     }
   };
 
-  // Auto-refresh effect
+  // Totals are summed by the server; refresh them (at most once a second)
+  // when the live feed reports changes
+  const totalsTimer = useRef(null);
+  const refreshTotals = () => {
+    clearTimeout(totalsTimer.current);
+    totalsTimer.current = setTimeout(async () => {
+      try {
+        const data = await apiCall('/kitchen/queue/');
+        setStations(data.stations);
+      } catch (err) {
+        console.error('Error refreshing totals:', err);
+      }
+    }, 1000);
+  };
+
+  // Live updates: the server pushes order changes instead of us polling
   useEffect(() => {
     if (isAuthenticated) {
       fetchOrders();
-      
-      let interval;
-      if (autoRefresh) {
-        interval = setInterval(fetchOrders, 30000); // Refresh every 30 seconds
+
+      let source;
+      if (autoRefresh && token) {
+        source = new EventSource(`http://127.0.0.1:8000/api/orders/stream/?token=${token}`);
+
+        source.addEventListener('order.created', (e) => {
+          const order = JSON.parse(e.data);
+          setOrders(prev => [order, ...prev.filter(o => o.id !== order.id)]);
+          setLastUpdate(new Date());
+          refreshTotals();
+        });
+
+        source.addEventListener('order.updated', (e) => {
+          const changes = JSON.parse(e.data);
+          setOrders(prev => prev
+            .map(o => (o.id === changes.id ? { ...o, ...changes } : o))
+            .filter(o => o.status !== 'cancelled'));
+          setLastUpdate(new Date());
+          if (changes.status) refreshTotals();
+        });
+
+        // We missed too many events while disconnected; reload everything
+        source.addEventListener('reset', fetchOrders);
       }
-      
+
       return () => {
-        if (interval) clearInterval(interval);
+        if (source) source.close();
+        clearTimeout(totalsTimer.current);
       };
     }
-  }, [autoRefresh, isAuthenticated]);
+  }, [autoRefresh, isAuthenticated, token]);
 
   // Show login form if not authenticated
   if (!isAuthenticated) {
@@ -447,6 +484,28 @@ export default function Kitchen() {
           </div>
         )}
 
+        {/* Batch totals: dishes waiting across open orders, per station */}
+        {[['confirmed', 'To start'], ['preparing', 'Cooking']].some(([status]) => stations[status]?.length) && (
+          <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mb-6">
+            {[['confirmed', 'To start'], ['preparing', 'Cooking']].map(([status, label]) => (
+              <div key={status} className="bg-white rounded-xl shadow-sm p-4">
+                <h3 className="text-sm font-semibold text-gray-700 mb-3">{label}</h3>
+                {(stations[status] || []).map(station => (
+                  <div key={station.category_id ?? 'none'} className="mb-2">
+                    <div className="text-xs uppercase tracking-wide text-gray-400">{station.category}</div>
+                    {station.items.map(item => (
+                      <div key={item.item_id} className="flex justify-between text-sm text-gray-800">
+                        <span>{item.quantity} × {item.name}</span>
+                        <span className="text-gray-400">{item.orders} order{item.orders === 1 ? '' : 's'}</span>
+                      </div>
+                    ))}
+                  </div>
+                ))}
+              </div>
+            ))}
+          </div>
+        )}
+
         {/* Orders List */}
         {loading ? (
           <div className="flex justify-center items-center py-12">
@@ -8,6 +8,7 @@ export default function Ordering() {
   const [categories, setCategories] = useState([]);
   const [selectedCategory, setSelectedCategory] = useState(null);
   const [menuItems, setMenuItems] = useState([]);
+  const [snapshot, setSnapshot] = useState(null);
   const [searchQuery, setSearchQuery] = useState("");
   const [searchResults, setSearchResults] = useState([]);
 
@@ -34,17 +35,19 @@ const [showPaymentPopup, setShowPaymentPopup] = useState(false);
   const [currentPage, setCurrentPage] = useState(1);
   const itemsPerPage = 6;
   
-  // Fetch categories on load
+  // Load the whole menu (categories with their items) in one request
+  const fetchMenuItems = async () => {
+    try {
+      const res = await api.get("/menu/snapshot/");
+      setSnapshot(res.data);
+      setCategories(res.data.categories);
+    } catch (err) {
+      console.error("Error fetching menu", err);
+    }
+  };
+
   useEffect(() => {
-    const fetchCategories = async () => {
-      try {
-        const res = await api.get("/categories/");
-        setCategories(res.data.results);
-      } catch (err) {
-        console.error("Error fetching categories", err);
-      }
-    };
-    fetchCategories();
+    fetchMenuItems();
   }, []);
 
   // Fetch items when category changes (or load all if none selected)
@@ -68,36 +71,16 @@ const [showPaymentPopup, setShowPaymentPopup] = useState(false);
   //   fetchItems();
   // }, [selectedCategory]);
 
+  // Show the selected category's items (or everything) from the snapshot
   useEffect(() => {
-  const fetchItems = async () => {
-    try {
-      let res;
-      if (selectedCategory) {
-        res = await api.get(`/menu/?category=${selectedCategory.id}&available=true`);
-      } else {
-        res = await api.get("/menu/?available=true");
-      }
-      setMenuItems(res.data.results ? res.data.results : res.data);
-    } catch (err) {
-      console.error("Error fetching items", err);
+    if (!snapshot) return;
+    if (selectedCategory) {
+      const category = snapshot.categories.find((cat) => cat.id === selectedCategory.id);
+      setMenuItems(category ? category.items : []);
+    } else {
+      setMenuItems([...snapshot.categories.flatMap((cat) => cat.items), ...snapshot.uncategorized]);
     }
-  };
-
-  fetchItems();
-}, [selectedCategory]);
-
-  useEffect(() => {
-    fetchMenuItems();
-  }, []);
-
-  const fetchMenuItems = async () => {
-  try {
-    const res = await api.get("/menu/?available=true");
-    setMenuItems(res.data.results ? res.data.results : res.data);
-  } catch (err) {
-    console.error("Error fetching menu items", err);
-  }
-};
+  }, [snapshot, selectedCategory]);
   // const fetchMenuItems = async () => {
   //   try {
   //     const res = await api.get("/menu/");
@@ -194,13 +177,9 @@ const placeOrder = async (paymentDetails) => {
   try {
     // Step 1: Add all items to the backend cart first
     console.log("Adding items to cart...");
-    for (const cartItem of cart) {
-      console.log("Adding item:", cartItem);
-      await api.post("/cart/add/", {
-        item: cartItem.id,
-        quantity: cartItem.quantity
-      });
-    }
+    await api.post("/cart/add/", {
+      items: cart.map((cartItem) => ({ item: cartItem.id, quantity: cartItem.quantity }))
+    });
 
     // Step 2: Create the order with payment details
     console.log("Creating order...");
@@ -303,13 +282,9 @@ const placeOrder = async (paymentDetails) => {
     try {
       // Step 1: Add all items to the backend cart first
       console.log("Adding items to cart...");
-      for (const cartItem of cart) {
-        console.log("Adding item:", cartItem);
-        await api.post("/cart/add/", {
-          item: cartItem.id,
-          quantity: cartItem.quantity
-        });
-      }
+      await api.post("/cart/add/", {
+        items: cart.map((cartItem) => ({ item: cartItem.id, quantity: cartItem.quantity }))
+      });
 
       // Step 2: Create the order
       console.log("Creating order...");
@@ -13,10 +13,18 @@ const PaymentVerification = () => {
   const [orderId, setOrderId] = useState(null);
 
   useEffect(() => {
+    let attempts = 0;
+    let retryTimer;
+
     const verifyPayment = async () => {
       if (reference) {
         try {
           const response = await paystackAPI.verifyPayment(reference);
+          // The backend confirms payments from Paystack's webhook, so keep
+          // checking for a while if it hasn't arrived yet
+          if (response.data.status === 'pending' && attempts++ < 30) {
+            retryTimer = setTimeout(verifyPayment, 2000);
+          }
           setStatus(response.data.status);
           setMessage(response.data.message);
           setOrderId(response.data.order_id);
@@ -35,6 +43,7 @@ const PaymentVerification = () => {
     };
 
     verifyPayment();
+    return () => clearTimeout(retryTimer);
   }, [reference, navigate]);
 
   const getStatusIcon = () => {
@@ -37,9 +37,9 @@ API.interceptors.request.use((req) => {
 });
 
 // Payment API functions - Use the API instance you created
-// export const paystackAPI = {
-//   initializePayment: (data) => API.post('/payment/paystack/initialize/', data),
-//   verifyPayment: (reference) => API.get(`/payment/paystack/verify/${reference}/`),
-// };
+export const paystackAPI = {
+  initializePayment: (data) => API.post('/payment/paystack/initialize/', data),
+  verifyPayment: (reference) => API.get(`/payment/paystack/verify/${reference}/`),
+};
 
 export default API;
\ No newline at end of file